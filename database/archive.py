@@ -0,0 +1,153 @@
+"""Content-addressed archive of raw API payloads.
+
+Every successful response returned by `get_with_retry` can be kept on local
+disk. Each body is stored once under its SHA-256 digest as
+`objects/<2 hex>/<digest>.zst`, compressed with zstandard. It falls back to
+`.gz` when the `zstandard` package is missing. `index.sqlite` records which
+URL produced which digest and when it was fetched.
+
+In offline mode the archive answers `get_with_retry` itself: each URL gets its
+latest payload fetched at or before `as_of`. Parsing fixes can then be
+replayed over the whole history without any requests (see `scripts/reparse.py`).
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is slower and larger but always available
+    zstandard = None
+
+ZSTD_LEVEL = 10
+
+
+class ArchiveMiss(requests.ConnectionError):
+    """Raised offline for a URL that was never archived (before `as_of`)."""
+
+
+def _compress(body):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), ".zst"
+    return gzip.compress(body), ".gz"
+
+
+def _decompress(data, suffix):
+    if suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("archive object is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ResponseArchive:
+    def __init__(self, root, offline=False, as_of=None):
+        self.root = root
+        self.offline = offline
+        self.as_of = as_of
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS fetches (
+                    url TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    status INTEGER NOT NULL,
+                    content_type TEXT,
+                    digest TEXT NOT NULL,
+                    suffix TEXT NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS fetches_url_time ON fetches (url, fetched_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS fetches_digest ON fetches (digest)")
+
+    def _object_path(self, digest, suffix):
+        return os.path.join(self.root, "objects", digest[:2], digest + suffix)
+
+    def put(self, url, resp):
+        """Archive a response body (stored once per distinct content)."""
+        body = resp.content or b""
+        digest = hashlib.sha256(body).hexdigest()
+
+        with self._lock:
+            row = self._db.execute("SELECT suffix FROM fetches WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if row is not None and os.path.exists(self._object_path(digest, row[0])):
+            suffix = row[0]
+        else:
+            data, suffix = _compress(body)
+            path = self._object_path(digest, suffix)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO fetches (url, fetched_at, status, content_type, digest, suffix) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, time.time(), resp.status_code, resp.headers.get("Content-Type"), digest, suffix),
+            )
+
+    def replay(self, url):
+        """Rebuild the latest archived response for `url` as a `requests.Response`."""
+        as_of = self.as_of if self.as_of is not None else float("inf")
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT status, content_type, digest, suffix FROM fetches
+                WHERE url = ? AND fetched_at <= ?
+                ORDER BY fetched_at DESC LIMIT 1
+                """,
+                (url, as_of),
+            ).fetchone()
+        if row is None:
+            raise ArchiveMiss(f"archive has no payload for {url}")
+        status, content_type, digest, suffix = row
+        with open(self._object_path(digest, suffix), "rb") as f:
+            body = _decompress(f.read(), suffix)
+
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict({"Content-Type": content_type} if content_type else {})
+        resp._content = body
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = url
+        return resp
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_archive = None
+_archive_configured = False
+_archive_lock = threading.Lock()
+
+
+def configure_archive(root, offline=False, as_of=None):
+    """Archive payloads under `root`, or serve them from it when `offline` (None disables it)."""
+    global _archive, _archive_configured
+    with _archive_lock:
+        if _archive is not None:
+            _archive.close()
+        _archive = ResponseArchive(root, offline, as_of) if root else None
+        _archive_configured = True
+    return _archive
+
+
+def get_archive():
+    """Return the process-wide archive, creating it from `NHL_ARCHIVE_DIR` on first use."""
+    if not _archive_configured:
+        configure_archive(os.getenv("NHL_ARCHIVE_DIR"))
+    return _archive
@@ -0,0 +1,282 @@
+"""Upsert helpers shared by the `insert_*_into_db` functions.
+
+`upsert_rows` writes a list of row tuples into a table with
+`INSERT ... ON CONFLICT` semantics using one of the write modes:
+
+- "copy" (default): stream the rows with `COPY FROM STDIN` into a temporary
+  staging table, then run one set-based `INSERT ... SELECT ... ON CONFLICT`.
+- "batch": multi-row `INSERT ... VALUES (...), (...) ON CONFLICT`, sent
+  `page_size` rows per statement. Use it where COPY is blocked, e.g. behind
+  a pooler.
+- "row": one `INSERT ... ON CONFLICT` per row (the original path), executed
+  as a prepared statement (see `database/prepared.py`).
+- "pipeline": the row statements sent through psycopg 3 pipeline mode, so
+  they are queued without waiting on each round trip. Needs the psycopg3
+  backend (`--db-backend psycopg3`).
+
+COPY, batch and row work on either backend.
+
+All modes give the same result. When a batch holds duplicate keys, the last
+row wins for DO UPDATE and the first row wins for DO NOTHING. That matches
+running the rows one at a time. The mode comes from `set_write_mode`, the
+`NHL_DB_WRITE_MODE` environment variable or the `--write-mode` flag. The
+batch page size comes from `set_page_size`, `NHL_DB_PAGE_SIZE` or `--page-size`.
+
+A conflicting row is only rewritten when its content differs: the DO UPDATE
+is guarded by `IS DISTINCT FROM`, so unchanged rows leave no dead tuple or
+WAL behind. `RETURNING (xmax = 0)` tells fresh inserts from updates, and
+`upsert_rows` reports inserted, updated and unchanged counts.
+"""
+import hashlib
+import io
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from .db_utils import PSYCOPG3, get_db_backend, is_psycopg3
+from .metrics import DB_ROWS, DB_WRITE_SECONDS, db_timer
+from .prepared import execute_prepared, register_statement
+
+ROW = "row"
+BATCH = "batch"
+COPY = "copy"
+PIPELINE = "pipeline"
+WRITE_MODES = (COPY, BATCH, ROW, PIPELINE)
+
+DEFAULT_PAGE_SIZE = 1000
+
+_write_mode = None
+_page_size = None
+
+
+def set_write_mode(mode):
+    global _write_mode
+    if mode not in WRITE_MODES:
+        raise ValueError(f"write mode must be one of {WRITE_MODES}, got {mode!r}")
+    _write_mode = mode
+
+
+def get_write_mode():
+    if _write_mode is None:
+        set_write_mode(os.getenv("NHL_DB_WRITE_MODE", COPY))
+    return _write_mode
+
+
+def check_write_mode():
+    """Raise ValueError if the configured write mode can't run on the configured backend."""
+    if get_write_mode() == PIPELINE and get_db_backend() != PSYCOPG3:
+        raise ValueError("pipeline write mode needs the psycopg3 backend (--db-backend psycopg3)")
+
+
+def set_page_size(page_size):
+    global _page_size
+    if int(page_size) < 1:
+        raise ValueError(f"page size must be at least 1, got {page_size!r}")
+    _page_size = int(page_size)
+
+
+def get_page_size():
+    if _page_size is None:
+        set_page_size(os.getenv("NHL_DB_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+    return _page_size
+
+
+def _conflict_clause(table, conflict_columns, update_columns):
+    conflict = ", ".join(conflict_columns)
+    if not update_columns:
+        return f"ON CONFLICT ({conflict}) DO NOTHING RETURNING (xmax = 0)"
+    assignments = ",\n                ".join(f"{col} = EXCLUDED.{col}" for col in update_columns)
+    current = ", ".join(f"{table}.{col}" for col in update_columns)
+    incoming = ", ".join(f"EXCLUDED.{col}" for col in update_columns)
+    return (f"ON CONFLICT ({conflict}) DO UPDATE SET\n                {assignments}\n"
+            f"            WHERE ROW({current}) IS DISTINCT FROM ROW({incoming})\n"
+            f"            RETURNING (xmax = 0)")
+
+
+def _copy_value(value):
+    """Format one value for COPY's text format."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)  # H:MM:SS, valid input for both interval and time
+    text = str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def row_upsert_sql(table, columns, conflict_columns, update_columns):
+    """The single-row upsert run by the row and pipeline modes."""
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES ({placeholders})
+        {_conflict_clause(table, conflict_columns, update_columns)}
+    """
+
+
+def _row_upsert(cur, table, columns, rows, conflict_columns, update_columns):
+    sql = row_upsert_sql(table, columns, conflict_columns, update_columns)
+    # one prepared statement per distinct upsert shape, parsed once per connection
+    name = register_statement(f"upsert_{table}_{hashlib.sha1(sql.encode()).hexdigest()[:8]}", sql)
+    written = []
+    for row in rows:
+        execute_prepared(cur, name, row)
+        result = cur.fetchone()
+        if result is not None:
+            written.append(result[0])
+    return written
+
+
+def _pipeline_upsert(cur, table, columns, rows, conflict_columns, update_columns):
+    if not is_psycopg3(cur):
+        raise RuntimeError("pipeline write mode needs the psycopg3 backend (--db-backend psycopg3)")
+    sql = row_upsert_sql(table, columns, conflict_columns, update_columns)
+    with cur.connection.pipeline():
+        cur.executemany(sql, rows, returning=True)
+
+    # one result set per row; skipped rows return nothing
+    written = []
+    while True:
+        result = cur.fetchone()
+        if result is not None:
+            written.append(result[0])
+        if not cur.nextset():
+            break
+    return written
+
+
+def insert_values(cur, sql, rows, page_size=None):
+    """Run `sql` (with a single `VALUES %s`) over `rows`, `page_size` rows per
+    statement, and return every row it RETURNs, on either backend."""
+    page_size = page_size or get_page_size()
+    if not is_psycopg3(cur):
+        return execute_values(cur, sql, rows, page_size=page_size, fetch=True)
+
+    returned = []
+    for start in range(0, len(rows), page_size):
+        page = rows[start:start + page_size]
+        values = ", ".join("(" + ", ".join(["%s"] * len(row)) + ")" for row in page)
+        cur.execute(sql.replace("VALUES %s", f"VALUES {values}", 1), [value for row in page for value in row])
+        returned.extend(cur.fetchall())
+    return returned
+
+
+def _dedupe(columns, rows, conflict_columns, update_columns):
+    """One row per key: the last for DO UPDATE, the first for DO NOTHING.
+
+    A single multi-row statement may not touch the same key twice, so this
+    reproduces what applying the rows one at a time would have left behind.
+    """
+    key_index = [columns.index(col) for col in conflict_columns]
+    kept = {}
+    for row in rows:
+        key = tuple(row[i] for i in key_index)
+        if update_columns or key not in kept:
+            kept[key] = row
+    return list(kept.values())
+
+
+def _batch_upsert(cur, table, columns, rows, conflict_columns, update_columns, page_size=None):
+    page_size = page_size or get_page_size()
+    sql = f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES %s
+        {_conflict_clause(table, conflict_columns, update_columns)}
+    """
+    rows = _dedupe(columns, rows, conflict_columns, update_columns)
+    written = insert_values(cur, sql, rows, page_size=page_size)
+    return [result[0] for result in written]
+
+
+def _copy_upsert(cur, table, columns, rows, conflict_columns, update_columns):
+    column_list = ", ".join(columns)
+    staging = f"_staging_{table}"
+
+    cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    cur.execute(f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {table} WITH NO DATA")
+    cur.execute(f"ALTER TABLE {staging} ADD COLUMN _staging_ord bigint")
+
+    buf = io.StringIO()
+    for ordinal, row in enumerate(rows):
+        buf.write("\t".join(_copy_value(value) for value in row))
+        buf.write(f"\t{ordinal}\n")
+    copy_sql = f"COPY {staging} ({column_list}, _staging_ord) FROM STDIN"
+    if is_psycopg3(cur):
+        with cur.copy(copy_sql) as copy:
+            copy.write(buf.getvalue())
+    else:
+        buf.seek(0)
+        cur.copy_expert(copy_sql, buf)
+
+    # keep one row per key, ordered like the row-at-a-time path would apply them
+    conflict = ", ".join(conflict_columns)
+    keep = "DESC" if update_columns else "ASC"
+    cur.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON ({conflict}) {column_list}
+        FROM {staging}
+        ORDER BY {conflict}, _staging_ord {keep}
+        {_conflict_clause(table, conflict_columns, update_columns)}
+    """)
+    written = [result[0] for result in cur.fetchall()]
+    cur.execute(f"DROP TABLE {staging}")
+    return written
+
+
+_UPSERTS = {
+    ROW: _row_upsert,
+    BATCH: _batch_upsert,
+    COPY: _copy_upsert,
+    PIPELINE: _pipeline_upsert,
+}
+
+
+def empty_counts():
+    return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+
+def add_counts(total, counts):
+    """Accumulate one `upsert_rows` result into `total` (returned)."""
+    for key in total:
+        total[key] += counts[key]
+    return total
+
+
+def format_counts(counts):
+    return f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+
+
+def upsert_rows(cur, table, columns, rows, conflict_columns, update_columns=None, mode=None):
+    """Upsert `rows` (tuples ordered like `columns`) into `table`.
+
+    `update_columns` are overwritten from the incoming row on conflict when
+    any of them differ; when empty the conflict is ignored (DO NOTHING).
+    Returns a dict of inserted, updated and unchanged row counts. Rows that
+    were skipped or superseded by a later duplicate count as unchanged. The
+    caller owns the transaction.
+    """
+    counts = empty_counts()
+    if not rows:
+        return counts
+    mode = mode or get_write_mode()
+    started = time.perf_counter()
+    with db_timer():
+        written = _UPSERTS[mode](cur, table, columns, rows, conflict_columns, update_columns)
+    elapsed = time.perf_counter() - started
+
+    counts["inserted"] = sum(1 for inserted in written if inserted)
+    counts["updated"] = len(written) - counts["inserted"]
+    counts["unchanged"] = max(0, len(rows) - len(written))
+    for result, count in counts.items():
+        DB_ROWS.inc(count, table=table, result=result)
+    DB_WRITE_SECONDS.inc(elapsed, table=table)
+    rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+    print(f"{table}: {format_counts(counts)} "
+          f"({len(rows)} rows via {mode} in {elapsed:.2f}s, {rate:,.0f} rows/s)")
+    return counts
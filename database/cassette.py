@@ -0,0 +1,144 @@
+"""Record/replay of NHL API traffic for repeatable, offline runs.
+
+In record mode every response returned by `get_with_retry` is appended to a
+gzip-compressed JSON-lines cassette. This includes failures, which are stored
+as errors. In replay mode the same calls are answered from the cassette in
+their recorded order without touching the network. Replay can add a fixed
+delay or the latency measured while recording.
+"""
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+RECORD = "record"
+REPLAY = "replay"
+RECORDED_LATENCY = "recorded"
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Raised in replay mode for a URL the cassette never saw."""
+
+
+class Cassette:
+    def __init__(self, path, mode, latency=None):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"cassette mode must be '{RECORD}' or '{REPLAY}', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        # None, seconds as a float, or RECORDED_LATENCY
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._interactions = defaultdict(deque)
+        self._file = None
+
+        if mode == RECORD:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    self._interactions[interaction["url"]].append(interaction)
+            print(f"cassette: loaded {sum(map(len, self._interactions.values()))} interactions from {path}")
+
+    def _write(self, interaction):
+        line = json.dumps(interaction, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def record(self, url, resp, elapsed):
+        body = resp.content or b""
+        try:
+            text, encoded = body.decode("utf-8"), False
+        except UnicodeDecodeError:
+            text, encoded = base64.b64encode(body).decode("ascii"), True
+        self._write({
+            "url": url,
+            "status": resp.status_code,
+            "headers": dict(resp.headers),
+            "body": text,
+            "b64": encoded,
+            "elapsed": round(elapsed, 4),
+        })
+
+    def record_error(self, url, error, elapsed):
+        self._write({"url": url, "error": str(error), "elapsed": round(elapsed, 4)})
+
+    def replay(self, url):
+        """Return the next recorded response for `url`, repeating the last one."""
+        with self._lock:
+            queue = self._interactions.get(url)
+            if not queue:
+                raise CassetteMiss(f"cassette has no recording for {url}")
+            interaction = queue.popleft() if len(queue) > 1 else queue[0]
+
+        if self.latency == RECORDED_LATENCY:
+            time.sleep(interaction.get("elapsed", 0))
+        elif self.latency:
+            time.sleep(self.latency)
+
+        if "error" in interaction:
+            raise requests.ConnectionError(f"(replayed) {interaction['error']}")
+
+        resp = requests.Response()
+        resp.status_code = interaction["status"]
+        resp.headers = CaseInsensitiveDict(interaction["headers"])
+        body = interaction["body"]
+        resp._content = base64.b64decode(body) if interaction["b64"] else body.encode("utf-8")
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = url
+        return resp
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_cassette = None
+_cassette_configured = False
+_cassette_lock = threading.Lock()
+
+
+def parse_latency(value):
+    """Turn a CLI/env latency ("250" ms or "recorded") into a `Cassette` latency."""
+    if not value:
+        return None
+    if value == RECORDED_LATENCY:
+        return RECORDED_LATENCY
+    return float(value) / 1000
+
+
+def configure_cassette(path, mode, latency=None):
+    """Record to or replay from the cassette at `path` (None disables it)."""
+    global _cassette, _cassette_configured
+    with _cassette_lock:
+        if _cassette is not None:
+            _cassette.close()
+        _cassette = Cassette(path, mode, latency) if path else None
+        _cassette_configured = True
+    if _cassette is not None:
+        atexit.register(_cassette.close)
+    return _cassette
+
+
+def get_cassette():
+    """Return the process-wide cassette, creating it from `NHL_CASSETTE` on first use."""
+    if not _cassette_configured:
+        configure_cassette(
+            os.getenv("NHL_CASSETTE"),
+            os.getenv("NHL_CASSETTE_MODE", REPLAY),
+            parse_latency(os.getenv("NHL_CASSETTE_LATENCY")),
+        )
+    return _cassette
@@ -0,0 +1,98 @@
+"""Durable progress checkpoints for long-running stages.
+
+A stage that walks entities in a stable order (player_stats walks player ids
+ascending) commits its rows every few entities and records the last one it
+finished in `stage_checkpoints` (migration 0005). After a crash or deploy,
+`--resume` starts just past that position instead of from the beginning.
+Rows are upserts, so work redone between the last checkpoint and a crash is
+harmless. A stage that completes clears its checkpoint.
+
+A sharded stage keeps one checkpoint per shard, and each records the id
+range (`span`) the shard was given (migration 0006). A resumed run reuses
+those ranges rather than recomputing them from a table that may have
+changed since.
+"""
+import os
+
+DEFAULT_CHECKPOINT_EVERY = 250
+
+_checkpoint_every = None
+
+
+def set_checkpoint_every(every):
+    global _checkpoint_every
+    if int(every) < 1:
+        raise ValueError(f"checkpoint interval must be at least 1, got {every!r}")
+    _checkpoint_every = int(every)
+
+
+def get_checkpoint_every():
+    """Entities per checkpoint; from `NHL_CHECKPOINT_EVERY` on first use."""
+    if _checkpoint_every is None:
+        set_checkpoint_every(os.getenv("NHL_CHECKPOINT_EVERY", DEFAULT_CHECKPOINT_EVERY))
+    return _checkpoint_every
+
+
+def load_checkpoint(conn, stage):
+    """The last position committed by an unfinished run of `stage`, or None."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT position, updated_at FROM stage_checkpoints WHERE stage = %s", (stage,))
+        row = cur.fetchone()
+    conn.commit()
+    if row is None:
+        return None
+    print(f"Resuming {stage} after {row[0]} (checkpoint from {row[1]:%Y-%m-%d %H:%M}).")
+    return row[0]
+
+
+def save_checkpoint(conn, stage, position, span=None):
+    """Record `position` as the last entity of `stage` whose rows are committed.
+
+    `span` is the (first, last) range of a shard; it is kept once recorded.
+    """
+    with conn.cursor() as cur:
+        if span is None:
+            cur.execute("""
+                INSERT INTO stage_checkpoints (stage, position, updated_at)
+                VALUES (%s, %s, now())
+                ON CONFLICT (stage) DO UPDATE SET
+                    position = EXCLUDED.position,
+                    updated_at = EXCLUDED.updated_at
+            """, (stage, position))
+        else:
+            cur.execute("""
+                INSERT INTO stage_checkpoints (stage, position, first_position, last_position, updated_at)
+                VALUES (%s, %s, %s, %s, now())
+                ON CONFLICT (stage) DO UPDATE SET
+                    position = EXCLUDED.position,
+                    first_position = EXCLUDED.first_position,
+                    last_position = EXCLUDED.last_position,
+                    updated_at = EXCLUDED.updated_at
+            """, (stage, position, span[0], span[1]))
+    conn.commit()
+
+
+def load_span_checkpoints(conn, prefix):
+    """`{stage: (position, first, last)}` for every checkpoint whose stage starts with `prefix`."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT stage, position, first_position, last_position FROM stage_checkpoints "
+            "WHERE left(stage, %s) = %s",
+            (len(prefix), prefix),
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return {stage: (position, first, last) for stage, position, first, last in rows}
+
+
+def clear_checkpoints(conn, prefix):
+    """Delete every checkpoint whose stage starts with `prefix`."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM stage_checkpoints WHERE left(stage, %s) = %s", (len(prefix), prefix))
+    conn.commit()
+
+
+def clear_checkpoint(conn, stage):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM stage_checkpoints WHERE stage = %s", (stage,))
+    conn.commit()
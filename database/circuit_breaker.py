@@ -0,0 +1,133 @@
+"""Per-host circuit breaker for API requests.
+
+Each host gets a failure budget: `failure_budget` failed attempts (exceptions
+or 5xx) within `window` seconds trip its circuit. While the circuit is open,
+`get_with_retry` raises `CircuitOpenError` immediately instead of retrying,
+so stages can stop cleanly rather than grinding through thousands of doomed
+URLs. After `reset_timeout` seconds one half-open probe is let through. A
+successful probe closes the circuit. A failed one reopens it for twice as
+long, up to `max_reset_timeout`.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_BUDGET = 10
+DEFAULT_WINDOW = 60
+DEFAULT_RESET_TIMEOUT = 30
+DEFAULT_MAX_RESET_TIMEOUT = 600
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while a host's circuit is open."""
+
+
+class _HostState:
+    def __init__(self, reset_timeout):
+        self.state = CLOSED
+        self.failures = deque()
+        self.open_until = 0.0
+        self.reset_timeout = reset_timeout
+        self.probe_in_flight = False
+
+
+class CircuitBreaker:
+    def __init__(self, failure_budget=DEFAULT_FAILURE_BUDGET, window=DEFAULT_WINDOW,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, max_reset_timeout=DEFAULT_MAX_RESET_TIMEOUT):
+        self.failure_budget = failure_budget
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.reset_timeout)
+        return state
+
+    def before_request(self, host):
+        """Raise `CircuitOpenError` unless a request to `host` may be sent now."""
+        with self._lock:
+            state = self._host(host)
+            if state.state == CLOSED:
+                return
+            now = time.time()
+            if state.state == OPEN and now >= state.open_until:
+                state.state = HALF_OPEN
+                state.probe_in_flight = False
+            if state.state == HALF_OPEN and not state.probe_in_flight:
+                state.probe_in_flight = True
+                print(f"circuit breaker: probing {host}")
+                return
+            retry_in = max(0.0, state.open_until - now)
+        raise CircuitOpenError(f"circuit open for {host}; next probe in {retry_in:.0f}s")
+
+    def is_open(self, host):
+        with self._lock:
+            return self._host(host).state != CLOSED
+
+    def record_success(self, host):
+        with self._lock:
+            state = self._host(host)
+            if state.state != CLOSED:
+                print(f"circuit breaker: {host} recovered, closing circuit")
+            state.state = CLOSED
+            state.failures.clear()
+            state.reset_timeout = self.reset_timeout
+            state.probe_in_flight = False
+
+    def record_failure(self, host):
+        with self._lock:
+            state = self._host(host)
+            now = time.time()
+            if state.state == HALF_OPEN:
+                state.reset_timeout = min(state.reset_timeout * 2, self.max_reset_timeout)
+                self._trip(host, state, now)
+                return
+            state.failures.append(now)
+            while state.failures and state.failures[0] < now - self.window:
+                state.failures.popleft()
+            if state.state == CLOSED and len(state.failures) >= self.failure_budget:
+                self._trip(host, state, now)
+
+    def _trip(self, host, state, now):
+        state.state = OPEN
+        state.open_until = now + state.reset_timeout
+        state.probe_in_flight = False
+        state.failures.clear()
+        print(f"circuit breaker: {host} tripped, failing fast for {state.reset_timeout}s")
+
+
+_circuit_breaker = None
+_breaker_configured = False
+_breaker_lock = threading.Lock()
+
+
+def configure_circuit_breaker(failure_budget=DEFAULT_FAILURE_BUDGET, window=DEFAULT_WINDOW,
+                              reset_timeout=DEFAULT_RESET_TIMEOUT):
+    """Install a per-host breaker (a budget of 0 disables it)."""
+    global _circuit_breaker, _breaker_configured
+    with _breaker_lock:
+        _circuit_breaker = CircuitBreaker(failure_budget, window, reset_timeout) if failure_budget else None
+        _breaker_configured = True
+    return _circuit_breaker
+
+
+def get_circuit_breaker():
+    """Return the process-wide breaker, configured from `NHL_CIRCUIT_*` on first use."""
+    if not _breaker_configured:
+        configure_circuit_breaker(
+            failure_budget=int(os.getenv("NHL_CIRCUIT_FAILURE_BUDGET", DEFAULT_FAILURE_BUDGET)),
+            window=float(os.getenv("NHL_CIRCUIT_WINDOW", DEFAULT_WINDOW)),
+            reset_timeout=float(os.getenv("NHL_CIRCUIT_RESET_TIMEOUT", DEFAULT_RESET_TIMEOUT)),
+        )
+    return _circuit_breaker
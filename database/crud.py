@@ -1,11 +1,38 @@
 import requests
 import json
 import time
-import psycopg2
+from contextlib import ExitStack, closing
 from datetime import datetime, timedelta
 
-from .db_helpers import get_or_create_conference, get_or_create_division, get_team_id, get_team_season_id_from_team_name
+from .db_helpers import DimensionCache, TeamSeasonIndex
+from .db_utils import DB_ERRORS
 from .http_utils import get_with_retry
+from .json_projection import decode_response_fields
+from .bulk_load import add_counts, empty_counts, format_counts, upsert_rows
+from .roster_fetch import fetch_rosters
+from .circuit_breaker import CircuitOpenError
+from .roster_store import RosterStore
+from .watermarks import ALL_SEASONS
+
+# the only parts of /v1/player/{id}/landing the stats stage reads
+LANDING_FIELDS = ("position", "seasonTotals")
+
+# column order of the rows handed to upsert_rows; key columns first
+SEASON_COLUMNS = (
+    "id", "season_start_year", "season_end_year",
+    "wild_card_in_use", "ties_in_use", "point_for_ot_loss",
+    "regular_season_end_date", "playoff_end_date",
+)
+PLAYER_COLUMNS = ("id", "first_name", "last_name", "birthdate", "country", "shoots_catches")
+ROSTER_COLUMNS = (
+    "team_season_id", "player_id", "jersey_number", "position",
+    "player_height_inches", "player_weight_pounds",
+)
+STANDINGS_COLUMNS = ("team_id", "season_id", "wins", "losses", "ot", "points", "division_id")
+PLAYER_STATS_COLUMNS = (
+    "player_id", "team_season_id", "goals", "assists", "points",
+    "plus_minus", "average_toi", "pim", "games_played",
+)
 
 # database helper functions (moved to database/db_helpers.py):
 # HTTP helper `get_with_retry` moved to database/http_utils.py
@@ -48,31 +75,15 @@ def insert_seasons_into_db(conn, seasons):
     print(f"Attempting to add {len(seasons)} seasons to the database...")
 
     try:
-        for season in seasons:
-            cur.execute("""
-                INSERT INTO seasons (
-                    id, season_start_year, season_end_year,
-                    wild_card_in_use, ties_in_use, point_for_ot_loss,
-                    regular_season_end_date, playoff_end_date
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    season_start_year = EXCLUDED.season_start_year,
-                    season_end_year = EXCLUDED.season_end_year,
-                    wild_card_in_use = EXCLUDED.wild_card_in_use,
-                    ties_in_use = EXCLUDED.ties_in_use,
-                    point_for_ot_loss = EXCLUDED.point_for_ot_loss,
-                    regular_season_end_date = EXCLUDED.regular_season_end_date,
-                    playoff_end_date = EXCLUDED.playoff_end_date;
-            """, (
-                season["id"], season["season_start_year"], season["season_end_year"],
-                season["wild_card_in_use"], season["ties_in_use"], season["point_for_ot_loss"],
-                season["regular_season_end_date"], season["playoff_end_date"]
-            ))
-            print(f"Inserted/Updated season {season['id']}")
-
-            conn.commit()
-    except psycopg2.Error as e:
+        counts = upsert_rows(
+            cur, "seasons", SEASON_COLUMNS,
+            [tuple(season[col] for col in SEASON_COLUMNS) for season in seasons],
+            conflict_columns=("id",), update_columns=SEASON_COLUMNS[1:],
+        )
+        conn.commit()
+        print(f"Seasons: {format_counts(counts)}")
+        return counts
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error: {e}")
     finally:
@@ -118,30 +129,32 @@ def insert_teams_into_db(conn, teams):
     print(f"Attempting to insert {len(teams)} team records...")
 
     try:
-        for team in teams:
-            cur.execute("""
-                INSERT INTO teams (id, name, abbreviation, franchise_id)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (id) DO NOTHING;
-            """, (
-                team["id"], 
-                team["name"], 
-                team["abbreviation"], 
-                team["franchise_id"]
-            ))
+        counts = upsert_rows(
+            cur, "teams", ("id", "name", "abbreviation", "franchise_id"),
+            [(team["id"], team["name"], team["abbreviation"], team["franchise_id"]) for team in teams],
+            conflict_columns=("id",),
+        )
 
         # Commit the transaction once after all inserts/updates
         conn.commit()
-        print("Team insertion complete and committed.")
+        print(f"Team insertion complete and committed: {format_counts(counts)}")
+        return counts
 
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error during team insertion: {e}")
     finally:
         cur.close()
         
-def get_team_seasons_from_api(conn, base_url):
-    """Fetch team-season combinations by querying the DB and validating via API.
+def iter_team_seasons_from_api(conn, base_url, rosters=None, watermarks=None):
+    """Yield team-season combinations by querying the DB and validating via API.
+
+    Pass the run's `RosterStore` as `rosters` so the players and rosters
+    stages can reuse the roster payloads fetched here. With `watermarks`
+    (see `database/watermarks.py`) only stale team-seasons are fetched.
+
+    Raises `CircuitOpenError` if the API's circuit opens; team-seasons
+    yielded before that are complete.
     """
     cur = conn.cursor()
 
@@ -153,31 +166,41 @@ def get_team_seasons_from_api(conn, base_url):
     season_team_pairs = cur.fetchall()
     cur.close()
 
-    processed_team_seasons = []
+    with ExitStack() as stack:
+        if rosters is None:
+            rosters = stack.enter_context(RosterStore(base_url))
 
-    # use a session for connection reuse and to enable retries
-    with requests.Session() as session:
         for season_id, abbreviation, team_id in season_team_pairs:
             # skip Utah until 2025, as there is an entry here but no data in the API
             if season_id < 20242025 and abbreviation == "UTA":
                 print("Skipping UTA prior to 2025")
                 continue
-
-            url = f"{base_url}/v1/roster/{abbreviation}/{season_id}"
-            try:
-                response = get_with_retry(url, session=session)
-            except requests.RequestException as e:
-                print(f"Failed request for {abbreviation} in season {season_id}: {e}")
+            if watermarks is not None and not watermarks.needs(season_id, abbreviation):
                 continue
-            if response.status_code != 200:
-                print(f"Failed request for {abbreviation} in season {season_id} (status {response.status_code})")
+
+            data = rosters.get(abbreviation, season_id)
+            if data is None:
+                # a roster that does not exist is done; a transient failure is retried next run
+                if watermarks is not None and rosters.is_missing(abbreviation, season_id):
+                    watermarks.mark(season_id, abbreviation)
                 continue  # Skip invalid responses
 
-            processed_team_seasons.append({
+            yield {
                 "team_id": team_id,
                 "season_id": season_id
-            })
+            }
+            if watermarks is not None:
+                watermarks.mark(season_id, abbreviation)
 
+def get_team_seasons_from_api(conn, base_url, rosters=None, watermarks=None):
+    """List form of `iter_team_seasons_from_api`; stops early if the circuit opens."""
+    processed_team_seasons = []
+    try:
+        processed_team_seasons.extend(iter_team_seasons_from_api(
+            conn, base_url, rosters=rosters, watermarks=watermarks
+        ))
+    except CircuitOpenError as e:
+        print(f"Stopping team-season fetch early: {e}")
     return processed_team_seasons
     
 def insert_team_seasons_into_db(conn, team_seasons):
@@ -190,34 +213,40 @@ def insert_team_seasons_into_db(conn, team_seasons):
     print(f"Attempting to insert {len(team_seasons)} team season records...")
 
     try:
-        for ts in team_seasons:
-            cur.execute("""
-                INSERT INTO team_seasons (team_id, season_id)
-                VALUES (%s, %s)
-                ON CONFLICT (team_id, season_id) DO NOTHING;
-            """, (
-                ts["team_id"], 
-                ts["season_id"]
-            ))
+        counts = upsert_rows(
+            cur, "team_seasons", ("team_id", "season_id"),
+            [(ts["team_id"], ts["season_id"]) for ts in team_seasons],
+            conflict_columns=("team_id", "season_id"),
+        )
 
         # Commit the transaction once after all inserts
         conn.commit()
-        print("Team seasons insertion complete and committed.")
+        print(f"Team seasons insertion complete and committed: {format_counts(counts)}")
+        return counts
 
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error during team seasons insertion: {e}")
     finally:
         cur.close()
 
-def get_players_from_api(conn, base_url, include_roster_info=False):
+def iter_players_from_api(conn, base_url, include_roster_info=False, concurrency=None, rosters=None, watermarks=None):
     """
-    Fetches players (and optional roster fields) from the external API by
+    Yields players (and optional roster fields) from the external API by
     querying team-season combinations from the database.
 
-    If `include_roster_info` is True, each returned player dict will include
+    If `include_roster_info` is True, each yielded player dict will include
     roster-related fields: `team_season_id`, `jersey_number`, `position`,
     `player_height_inches`, and `player_weight_pounds`.
+
+    If `concurrency` is set, rosters are fetched on the thread pool in
+    `database/roster_fetch.py` with at most that many requests in flight.
+    Otherwise they are fetched one at a time. Pass the run's `RosterStore` as
+    `rosters` to share payloads with the other roster-based stages. With
+    `watermarks`, team-seasons ingested recently are skipped.
+
+    Raises `CircuitOpenError` if the API's circuit opens; players yielded
+    before that are complete.
     """
     print("Querying team-season combinations from the database.")
 
@@ -227,65 +256,88 @@ def get_players_from_api(conn, base_url, include_roster_info=False):
         FROM teams JOIN team_seasons on teams.id = team_seasons.team_id;
         """)
         season_team_pairs = cur.fetchall()
+    if watermarks is not None:
+        season_team_pairs = [
+            (abbreviation, season_id, team_season_id)
+            for abbreviation, season_id, team_season_id in season_team_pairs
+            if watermarks.needs(season_id, abbreviation)
+        ]
 
     print(f"Processing {len(season_team_pairs)} team-season pairs to fetch players.")
 
-    processed_players = []
-
-    with requests.Session() as session:
-        for abbreviation, season_id, team_season_id in season_team_pairs:
-            url = f"{base_url}/v1/roster/{abbreviation}/{season_id}"
-
-            try:
-                response = get_with_retry(url, session=session, timeout=10)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching roster for {abbreviation} in season {season_id}: {e}")
-                continue
-
-            try:
-                data = response.json()
-            except json.JSONDecodeError:
-                print(f"Invalid JSON response for {abbreviation} in season {season_id}")
+    with ExitStack() as stack:
+        if rosters is None:
+            rosters = stack.enter_context(RosterStore(base_url))
+
+        if concurrency:
+            pairs = [(abbreviation, season_id) for abbreviation, season_id, _ in season_team_pairs]
+            payloads = stack.enter_context(closing(fetch_rosters(rosters, pairs, concurrency=concurrency)))
+        else:
+            payloads = (rosters.get(abbreviation, season_id) for abbreviation, season_id, _ in season_team_pairs)
+
+        for (abbreviation, season_id, team_season_id), data in zip(season_team_pairs, payloads):
+            if isinstance(data, CircuitOpenError):
+                raise data
+            if data is None:
+                if watermarks is not None and rosters.is_missing(abbreviation, season_id):
+                    watermarks.mark(season_id, abbreviation)
                 continue
+            yield from _players_from_roster(data, abbreviation, season_id, team_season_id, include_roster_info)
+            # only once every player of the roster has been handed on
+            if watermarks is not None:
+                watermarks.mark(season_id, abbreviation)
 
-            player_data = (
-                data.get("forwards", []) + 
-                data.get("defensemen", []) + 
-                data.get("goalies", [])
-            )
-
-            print(f"Found {len(player_data)} players for {abbreviation} in season {season_id}.")
-
-            for player in player_data:
-                first_name = player.get("firstName")
-                if isinstance(first_name, dict):
-                    first_name = first_name.get("default")
-                last_name = player.get("lastName")
-                if isinstance(last_name, dict):
-                    last_name = last_name.get("default")
-
-                entry = {
-                    "player_id": player.get("id"),
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "birthdate": player.get("birthDate"),
-                    "country": player.get("birthCountry"),
-                    "shoots_catches": player.get("shootsCatches"),
-                }
-
-                if include_roster_info:
-                    entry.update({
-                        "team_season_id": team_season_id,
-                        "jersey_number": player.get("sweaterNumber"),
-                        "position": player.get("positionCode"),
-                        "player_height_inches": player.get("heightInInches"),
-                        "player_weight_pounds": player.get("weightInPounds"),
-                    })
+def get_players_from_api(conn, base_url, include_roster_info=False, concurrency=None, rosters=None, watermarks=None):
+    """List form of `iter_players_from_api`; stops early if the circuit opens."""
+    processed_players = []
+    try:
+        processed_players.extend(iter_players_from_api(
+            conn, base_url, include_roster_info=include_roster_info, concurrency=concurrency,
+            rosters=rosters, watermarks=watermarks,
+        ))
+    except CircuitOpenError as e:
+        print(f"Stopping player fetch early: {e}")
+    return processed_players
 
-                processed_players.append(entry)
+def _players_from_roster(data, abbreviation, season_id, team_season_id, include_roster_info):
+    """Build player (and optional roster) dicts from one roster payload."""
+    player_data = (
+        data.get("forwards", []) + 
+        data.get("defensemen", []) + 
+        data.get("goalies", [])
+    )
+
+    print(f"Found {len(player_data)} players for {abbreviation} in season {season_id}.")
+
+    entries = []
+    for player in player_data:
+        first_name = player.get("firstName")
+        if isinstance(first_name, dict):
+            first_name = first_name.get("default")
+        last_name = player.get("lastName")
+        if isinstance(last_name, dict):
+            last_name = last_name.get("default")
+
+        entry = {
+            "player_id": player.get("id"),
+            "first_name": first_name,
+            "last_name": last_name,
+            "birthdate": player.get("birthDate"),
+            "country": player.get("birthCountry"),
+            "shoots_catches": player.get("shootsCatches"),
+        }
+
+        if include_roster_info:
+            entry.update({
+                "team_season_id": team_season_id,
+                "jersey_number": player.get("sweaterNumber"),
+                "position": player.get("positionCode"),
+                "player_height_inches": player.get("heightInInches"),
+                "player_weight_pounds": player.get("weightInPounds"),
+            })
 
-    return processed_players
+        entries.append(entry)
+    return entries
 
 def insert_players_into_db(conn, players):
     """Inserts a list of player records into the 'players' table."""
@@ -297,32 +349,28 @@ def insert_players_into_db(conn, players):
     print(f"Attempting to insert {len(players)} player records...")
 
     try:
-        for player in players:
-            cur.execute("""
-                INSERT INTO players (
-                    id, first_name, last_name, birthdate, country, shoots_catches
+        counts = upsert_rows(
+            cur, "players", PLAYER_COLUMNS,
+            [
+                (
+                    player["player_id"],
+                    player["first_name"],
+                    player["last_name"],
+                    player["birthdate"],
+                    player["country"],
+                    player["shoots_catches"],
                 )
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    first_name = EXCLUDED.first_name,
-                    last_name = EXCLUDED.last_name,
-                    birthdate = EXCLUDED.birthdate,
-                    country = EXCLUDED.country,
-                        shoots_catches = EXCLUDED.shoots_catches
-            """, (
-                player["player_id"], 
-                player["first_name"], 
-                player["last_name"], 
-                player["birthdate"], 
-                player["country"], 
-                player["shoots_catches"]
-            ))
+                for player in players
+            ],
+            conflict_columns=("id",), update_columns=PLAYER_COLUMNS[1:],
+        )
 
         # Commit the transaction once after all inserts/updates
         conn.commit()
-        print("Player insertion complete and committed.")
+        print(f"Player insertion complete and committed: {format_counts(counts)}")
+        return counts
 
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error during player insertion: {e}")
     finally:
@@ -340,43 +388,32 @@ def insert_rosters_into_db(conn, rosters):
     print(f"Attempting to insert {len(rosters)} roster records...")
     
     try:
-        for roster in rosters:
-            cur.execute("""
-                INSERT INTO rosters (
-                    team_season_id, player_id, jersey_number, position,
-                    player_height_inches, player_weight_pounds
-                )
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (team_season_id, player_id) DO UPDATE SET
-                    jersey_number = EXCLUDED.jersey_number,
-                    position = EXCLUDED.position,
-                    player_height_inches = EXCLUDED.player_height_inches,
-                    player_weight_pounds = EXCLUDED.player_weight_pounds;
-            """, (
-                roster["team_season_id"], 
-                roster["player_id"], 
-                roster["jersey_number"], 
-                roster["position"], 
-                roster["player_height_inches"], 
-                roster["player_weight_pounds"]
-            ))
+        counts = upsert_rows(
+            cur, "rosters", ROSTER_COLUMNS,
+            [tuple(roster[col] for col in ROSTER_COLUMNS) for roster in rosters],
+            conflict_columns=("team_season_id", "player_id"), update_columns=ROSTER_COLUMNS[2:],
+        )
     
         # Commit the transaction once after all inserts/updates
         conn.commit()
-        print("Roster insertion complete and committed.")
+        print(f"Roster insertion complete and committed: {format_counts(counts)}")
+        return counts
     
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error during roster insertion: {e}")
     finally:
         cur.close()
         
-def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/"):
-    """Fetch standings data from the NHL API."""
+def iter_standings_from_api(conn, base_url, standings_endpoint="v1/standings/", watermarks=None):
+    """Yield standings data from the NHL API, one team-season at a time.
+
+    With `watermarks`, seasons whose standings were ingested recently are skipped.
+    Raises `CircuitOpenError` if the API's circuit opens; seasons yielded
+    before that are complete.
+    """
     url = f"{base_url}/{standings_endpoint}"
     
-    standings = []
-    
     cur = conn.cursor()
     cur.execute("SELECT regular_season_end_date, id AS season_id FROM seasons;")
     # Fetch all rows
@@ -390,6 +427,8 @@ def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/"):
     for row in rows:
         season_end_date = row[0]  # regular_season_end_date is already a date object
         season_id = row[1]
+        if watermarks is not None and not watermarks.needs(season_id, "standings"):
+            continue
         
         # Use current date if season end date is after today
         if season_end_date > current_date:
@@ -399,7 +438,13 @@ def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/"):
 
     for date, season_id in regular_season_end_dates:
         seasonUrl = f"{url}{date}"
-        response = requests.get(seasonUrl)
+        try:
+            response = get_with_retry(seasonUrl)
+        except CircuitOpenError:
+            raise
+        except requests.RequestException as e:
+            print(f"Error fetching standings for season {season_id}: {e}")
+            continue
 
         if response.status_code == 200:
             data = response.json()
@@ -414,7 +459,7 @@ def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/"):
                 conference_name = team.get("conferenceName")
                 abbreviation = team["teamAbbrev"]["default"]
                 
-                standings.append({
+                yield {
                     "season_id": season_id,
                     "conference_name": conference_name,
                     "division_name": division_name,
@@ -423,8 +468,19 @@ def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/"):
                     "losses": losses,
                     "ot": ot,
                     "points": points
-                })
+                }
+            if watermarks is not None:
+                watermarks.mark(season_id, "standings")
 
+def get_standings_from_api(conn, base_url, standings_endpoint="v1/standings/", watermarks=None):
+    """List form of `iter_standings_from_api`; stops early if the circuit opens."""
+    standings = []
+    try:
+        standings.extend(iter_standings_from_api(
+            conn, base_url, standings_endpoint=standings_endpoint, watermarks=watermarks
+        ))
+    except CircuitOpenError as e:
+        print(f"Stopping standings fetch early: {e}")
     return standings
 
 def insert_standings_into_db(conn, standings):
@@ -437,117 +493,184 @@ def insert_standings_into_db(conn, standings):
     print(f"Attempting to insert {len(standings)} standings records...")
 
     try:
+        # every conference, division and team is read once; missing ones are created in bulk
+        dimensions = DimensionCache(cur)
+        dimensions.ensure_conferences(cur, [
+            (standing["conference_name"], standing["season_id"])
+            for standing in standings if standing.get("conference_name")
+        ])
+        dimensions.ensure_divisions(cur, [
+            (
+                standing["division_name"],
+                dimensions.conference_id(standing["conference_name"], standing["season_id"])
+                if standing.get("conference_name") else None,  # For seasons like 2020–21
+                standing["season_id"],
+            )
+            for standing in standings
+        ])
+
+        team_season_rows = []
         for standing in standings:
-            print(f"Processing team {standing['team_abbreviation']} for season {standing['season_id']}")
             season_id = standing["season_id"]
-            wins = int(standing["wins"])
-            losses = int(standing["losses"])
-            ot = int(standing["ot"])
-            points = int(standing["points"])    
-            division_name = standing["division_name"]
-            conference_name = standing.get("conference_name")
             abbreviation = standing["team_abbreviation"]
-
-            print(f"Season {season_id}: Conference = {conference_name}")
-
-            # add the conference in to the conferences table if it does not yet exist
-            # add the division to the divisions table if it does not yet exist
-            # add wins, losses, points, ot, and division to the correct team in the team_seasons table
-            if conference_name:
-                conference_id = get_or_create_conference(cur, conference_name, season_id)
-            else:
-                conference_id = None  # For seasons like 2020–21
-
-            division_id = get_or_create_division(cur, division_name, conference_id, season_id)
-            team_id = get_team_id(cur, abbreviation)
+            conference_name = standing.get("conference_name")
+            conference_id = dimensions.conference_id(conference_name, season_id) if conference_name else None
+            division_id = dimensions.division_id(standing["division_name"], conference_id)
+            team_id = dimensions.team_id(abbreviation)
 
             if team_id:
-                cur.execute("""
-                    INSERT INTO team_seasons (team_id, season_id, wins, losses, ot, points, division_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (team_id, season_id) DO UPDATE
-                    SET wins = EXCLUDED.wins,
-                        losses = EXCLUDED.losses,
-                        ot = EXCLUDED.ot,
-                        points = EXCLUDED.points,
-                        division_id = EXCLUDED.division_id
-                """, (team_id, season_id, wins, losses, ot, points, division_id))
+                team_season_rows.append((
+                    team_id, season_id,
+                    int(standing["wins"]), int(standing["losses"]), int(standing["ot"]), int(standing["points"]),
+                    division_id,
+                ))
             else:
                 print(f"Team not found for abbreviation: {abbreviation}")
 
+        if dimensions.created:
+            print(f"Created {dimensions.created} conferences/divisions.")
+
+        counts = upsert_rows(
+            cur, "team_seasons", STANDINGS_COLUMNS, team_season_rows,
+            conflict_columns=("team_id", "season_id"), update_columns=STANDINGS_COLUMNS[2:],
+        )
 
         # Commit the transaction once after all inserts/updates
         conn.commit()
-        print("Standings insertion complete and committed.")
+        print(f"Standings insertion complete and committed: {format_counts(counts)}")
+        return counts
 
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         conn.rollback()
         print(f"Database error during standings insertion: {e}")
     finally:
         cur.close()      
         
 
-def get_player_stats_from_api(conn, base_url):
+def iter_player_stats_from_api(conn, base_url, watermarks=None, start_after=None, until=None):
+    """Yield `(player_id, stats)` for every player, in player id order.
+
+    `stats` is the list of per-season NHL stat dicts for that player (empty
+    when nothing qualified), or None when the request failed. Players are
+    not watermarked here; the caller marks them once their stats are
+    written. `start_after` skips players up to and including that id, for
+    resuming from a checkpoint; `until` stops after that id, for sharding.
+    Raises `CircuitOpenError` if the API's circuit opens; every player
+    yielded before that is complete.
+    """
     cur = conn.cursor()
     
     cur.execute("SELECT MIN(id) FROM seasons")
     season_limit = cur.fetchone()[0]
     
-    cur.execute("SELECT id FROM players")
+    # a stable order, so a checkpoint's position splits done from not done
+    cur.execute("SELECT id FROM players ORDER BY id")
     player_ids = [row[0] for row in cur.fetchall()] # Changed name to avoid conflict
+    if start_after is not None:
+        player_ids = [player for player in player_ids if player > start_after]
+    if until is not None:
+        player_ids = [player for player in player_ids if player <= until]
+
+    if watermarks is not None:
+        # a landing page covers a whole career, so anyone on a current roster
+        # is refetched; everyone else only once their watermark goes stale
+        cur.execute("""
+        SELECT DISTINCT rosters.player_id
+        FROM rosters JOIN team_seasons ON team_seasons.id = rosters.team_season_id
+        WHERE team_seasons.season_id = %s;
+        """, (watermarks.current_season,))
+        active = {row[0] for row in cur.fetchall()}
+        player_ids = [
+            player for player in player_ids
+            if player in active or watermarks.needs(ALL_SEASONS, player)
+        ]
     
-    player_count = 0
-    all_stats_to_return = [] # New list for results
-    
-    for player in player_ids:
-        url = f"{base_url}/v1/player/{player}/landing"
+    team_seasons = TeamSeasonIndex(cur)
+    cur.close()
+    print(f"Fetching stats for {len(player_ids)} players.")
+
+    try:
+        for player in player_ids:
+            yield player, _player_stats_from_landing(base_url, player, season_limit, team_seasons)
+    finally:
+        team_seasons.report_misses()
+
+def _player_stats_from_landing(base_url, player, season_limit, team_seasons):
+    """Fetch one player's landing page and build their per-season stat dicts (None if it failed)."""
+    url = f"{base_url}/v1/player/{player}/landing"
+    try:
         response = get_with_retry(url)
+    except CircuitOpenError:
+        raise
+    except requests.exceptions.RequestException as e:
+        # includes ArchiveMiss when reparsing a player that was never archived
+        print(f"Error fetching landing page for player {player}: {e}")
+        return None
+    
+    if response.status_code != 200:
+        print(f"Failed request for player {player}")
+        return None
         
-        if response.status_code != 200:
-            print(f"Failed request for player {player}")
-            continue
-            
-        data = response.json()
-        # Extract position from the landing data
-        position = data.get("position") 
-        season_stats = data.get("seasonTotals", [])
+    try:
+        data = decode_response_fields(response, LANDING_FIELDS)
+    except json.JSONDecodeError:
+        print(f"Invalid JSON response for player {player}")
+        return None
+    # Extract position from the landing data
+    position = data.get("position") 
+    season_stats = data.get("seasonTotals", [])
+    
+    player_stats = []
+    for season in season_stats:
+        # Assign early so it's always available
+        season_type = int(season.get("gameTypeId", 0)) 
         
-        for season in season_stats:
-            # Assign early so it's always available
-            season_type = int(season.get("gameTypeId", 0)) 
+        # Check conditions
+        if (season.get("leagueAbbrev") == "NHL" and 
+            season.get("season") >= season_limit and 
+            season_type != 1 and 
+            position != "G"):
             
-            # Check conditions
-            if (season.get("leagueAbbrev") == "NHL" and 
-                season.get("season") >= season_limit and 
-                season_type != 1 and 
-                position != "G"):
-                
-                team_name = season["teamName"]["default"]
-                season_id = season["season"]
-                team_seasons = get_team_season_id_from_team_name(cur, team_name, season_id)
-
-                # Parse Time On Ice
-                avg_toi_str = season.get("avgToi", "0:00")
-                minutes, seconds = map(int, avg_toi_str.split(":"))
-                average_toi = timedelta(minutes=minutes, seconds=seconds)
-
-                if team_seasons:
-                    player_count += 1
-                    team_id = team_seasons[0][0]
-                    
-                    all_stats_to_return.append({
-                        "player_id": player,
-                        "team_id": team_id,
-                        "goals": season.get("goals", 0),
-                        "assists": season.get("assists", 0),
-                        "points": season.get("points", 0),
-                        "plus_minus": season.get("plusMinus", 0),
-                        "average_toi": average_toi,
-                        "pim": season.get("pim", 0),
-                        "games_played": season.get("gamesPlayed", 0),
-                        "season_type": season_type
-                    })
-                        
+            team_name = season["teamName"]["default"]
+            season_id = season["season"]
+            team_season_id = team_seasons.resolve(team_name, season_id)
+
+            # Parse Time On Ice
+            avg_toi_str = season.get("avgToi", "0:00")
+            minutes, seconds = map(int, avg_toi_str.split(":"))
+            average_toi = timedelta(minutes=minutes, seconds=seconds)
+
+            if team_season_id:
+                player_stats.append({
+                    "player_id": player,
+                    "team_id": team_season_id,
+                    "goals": season.get("goals", 0),
+                    "assists": season.get("assists", 0),
+                    "points": season.get("points", 0),
+                    "plus_minus": season.get("plusMinus", 0),
+                    "average_toi": average_toi,
+                    "pim": season.get("pim", 0),
+                    "games_played": season.get("gamesPlayed", 0),
+                    "season_type": season_type
+                })
+    return player_stats
+
+def get_player_stats_from_api(conn, base_url, watermarks=None, start_after=None):
+    """List form of `iter_player_stats_from_api`; stops early if the circuit opens.
+
+    Players whose landing page was fetched are marked in `watermarks`; save
+    them only after the returned stats are inserted.
+    """
+    all_stats_to_return = []
+    try:
+        for player, player_stats in iter_player_stats_from_api(conn, base_url, watermarks, start_after):
+            if player_stats is None:
+                continue
+            all_stats_to_return.extend(player_stats)
+            if watermarks is not None:
+                watermarks.mark(ALL_SEASONS, player)
+    except CircuitOpenError as e:
+        print(f"Stopping player stats fetch early: {e}")
     return all_stats_to_return
 
 def insert_player_stats_into_db(conn, player_stats_data):
@@ -555,44 +678,33 @@ def insert_player_stats_into_db(conn, player_stats_data):
     cur = conn.cursor()
     
     try:
+        rows_by_table = {"player_stats": [], "player_stats_playoffs": []}
         for stats in player_stats_data:
-            # 2. Extract values (Ensure keys match the previous function)
-            player_id = stats["player_id"]
-            team_id = stats["team_id"]  # Match the key used in 'get_player_stats_from_api'
-            goals = stats["goals"]
-            assists = stats["assists"]
-            points = stats["points"]
-            plus_minus = stats["plus_minus"]
-            average_toi = stats["average_toi"]
-            pim = stats["pim"]
-            games_played = stats["games_played"]
-            season_type = stats["season_type"]
-
-            # 3. Determine table INSIDE the loop
-            if season_type == 2:
-                table = "player_stats"
-            else:
-                table = "player_stats_playoffs"
+            # Regular season (type 2) and playoff rows live in separate tables
+            table = "player_stats" if stats["season_type"] == 2 else "player_stats_playoffs"
+            rows_by_table[table].append((
+                stats["player_id"],
+                stats["team_id"],  # Match the key used in 'get_player_stats_from_api'
+                stats["goals"],
+                stats["assists"],
+                stats["points"],
+                stats["plus_minus"],
+                stats["average_toi"],
+                stats["pim"],
+                stats["games_played"],
+            ))
 
-            # 4. Execute the query
-            cur.execute(f"""
-                INSERT INTO {table} (
-                    player_id, team_season_id, goals, assists, points, plus_minus, average_toi, pim, games_played
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (player_id, team_season_id) DO UPDATE SET
-                    goals = EXCLUDED.goals,
-                    assists = EXCLUDED.assists,
-                    points = EXCLUDED.points,
-                    plus_minus = EXCLUDED.plus_minus,
-                    average_toi = EXCLUDED.average_toi,
-                    pim = EXCLUDED.pim,
-                    games_played = EXCLUDED.games_played;
-            """, (player_id, team_id, goals, assists, points, plus_minus, average_toi, pim, games_played))
-            
-        # 5. Commit all changes after the loop finishes successfully
+        counts = empty_counts()
+        for table, rows in rows_by_table.items():
+            add_counts(counts, upsert_rows(
+                cur, table, PLAYER_STATS_COLUMNS, rows,
+                conflict_columns=("player_id", "team_season_id"), update_columns=PLAYER_STATS_COLUMNS[2:],
+            ))
+
+        # Commit all changes once every table is written
         conn.commit()
-        print(f"Successfully updated {len(player_stats_data)} records.")
+        print(f"Successfully processed {len(player_stats_data)} records: {format_counts(counts)}")
+        return counts
 
     except Exception as e:
         conn.rollback()
@@ -3,84 +3,219 @@
 These are thin wrappers that operate on a DB cursor and return ids
 or None as appropriate. Kept minimal to stay easy to unit-test.
 """
+import unicodedata
+from collections import Counter
 from typing import Optional
 
+from .bulk_load import insert_values
+from .prepared import execute_prepared, register_statement
+
+# per-row lookups, run as server-side prepared statements
+SELECT_CONFERENCE = register_statement(
+    "select_conference", "SELECT id FROM conferences WHERE name = %s AND season_id = %s"
+)
+INSERT_CONFERENCE = register_statement(
+    "insert_conference", "INSERT INTO conferences (name, season_id) VALUES (%s, %s) RETURNING id"
+)
+SELECT_DIVISION = register_statement(
+    "select_division", "SELECT id FROM divisions WHERE name = %s AND conference_id = %s"
+)
+SELECT_DIVISION_NO_CONFERENCE = register_statement(
+    "select_division_no_conference", "SELECT id FROM divisions WHERE name = %s AND conference_id IS NULL"
+)
+INSERT_DIVISION = register_statement(
+    "insert_division",
+    "INSERT INTO divisions (name, conference_id, season_id) VALUES (%s, %s, %s) RETURNING id",
+)
+INSERT_DIVISION_NO_CONFERENCE = register_statement(
+    "insert_division_no_conference",
+    "INSERT INTO divisions (name, conference_id, season_id) VALUES (%s, NULL, %s) RETURNING id",
+)
+SELECT_TEAM_ID = register_statement("select_team_id", "SELECT id FROM teams WHERE abbreviation = %s")
+SELECT_TEAM_SEASON_BY_NAME = register_statement("select_team_season_by_name", """
+    SELECT ts.id, ts.team_id, ts.season_id, t.name
+    FROM team_seasons ts
+    JOIN teams t ON ts.team_id = t.id
+    WHERE t.name = %s AND ts.season_id = %s
+""")
+
 
 def get_or_create_conference(cur, name: str, season_id: int) -> int:
     print(f"Getting or creating conference: {name} for season_id: {season_id}")
-    cur.execute(
-        """
-        SELECT id FROM conferences WHERE name = %s AND season_id = %s
-        """,
-        (name, season_id),
-    )
+    execute_prepared(cur, SELECT_CONFERENCE, (name, season_id))
     result = cur.fetchone()
     if result:
         return result[0]
-    cur.execute(
-        """
-        INSERT INTO conferences (name, season_id)
-        VALUES (%s, %s)
-        RETURNING id
-        """,
-        (name, season_id),
-    )
+    execute_prepared(cur, INSERT_CONFERENCE, (name, season_id))
     return cur.fetchone()[0]
 
 
 def get_or_create_division(cur, name: str, conference_id: Optional[int], season_id: int) -> int:
     print(f"Getting or creating conference: {name} for season_id: {season_id}")
     if conference_id:
-        cur.execute(
-            """
-            SELECT id FROM divisions WHERE name = %s AND conference_id = %s
-            """,
-            (name, conference_id),
-        )
+        execute_prepared(cur, SELECT_DIVISION, (name, conference_id))
     else:
-        cur.execute(
-            """
-            SELECT id FROM divisions WHERE name = %s AND conference_id IS NULL
-            """,
-            (name,),
-        )
+        execute_prepared(cur, SELECT_DIVISION_NO_CONFERENCE, (name,))
 
     result = cur.fetchone()
     if result:
         return result[0]
 
     if conference_id:
-        cur.execute(
-            """
-            INSERT INTO divisions (name, conference_id, season_id)
-            VALUES (%s, %s, %s)
-            RETURNING id
-            """,
-            (name, conference_id, season_id),
-        )
+        execute_prepared(cur, INSERT_DIVISION, (name, conference_id, season_id))
     else:
-        cur.execute(
-            """
-            INSERT INTO divisions (name, conference_id, season_id)
-            VALUES (%s, NULL, %s)
-            RETURNING id
-            """,
-            (name, season_id),
-        )
+        execute_prepared(cur, INSERT_DIVISION_NO_CONFERENCE, (name, season_id))
 
     return cur.fetchone()[0]
 
 
 def get_team_id(cur, abbreviation: str):
-    cur.execute("SELECT id FROM teams WHERE abbreviation = %s", (abbreviation,))
+    execute_prepared(cur, SELECT_TEAM_ID, (abbreviation,))
     result = cur.fetchone()
     return result[0] if result else None
 
 def get_team_season_id_from_team_name(cur, team_name, season_id):
-    cur.execute("""
-        SELECT ts.id, ts.team_id, ts.season_id, t.name
-        FROM team_seasons ts
-        JOIN teams t ON ts.team_id = t.id
-        WHERE t.name = %s AND ts.season_id = %s
-    """,(team_name, season_id))
+    execute_prepared(cur, SELECT_TEAM_SEASON_BY_NAME, (team_name, season_id))
     return cur.fetchall()
+
+
+class DimensionCache:
+    """Conferences, divisions and teams held in memory for one stage.
+
+    Each table is read once when the cache is built. Missing conferences and
+    divisions are created in bulk with `ensure_conferences` and
+    `ensure_divisions`, and every lookup after that is served from memory.
+    Keys match the lookups in `get_or_create_conference`,
+    `get_or_create_division` and `get_team_id`.
+    """
+
+    def __init__(self, cur):
+        cur.execute("SELECT abbreviation, id FROM teams ORDER BY id")
+        self.teams = {}
+        for abbreviation, team_id in cur.fetchall():
+            self.teams.setdefault(abbreviation, team_id)
+
+        cur.execute("SELECT name, season_id, id FROM conferences ORDER BY id")
+        self.conferences = {}
+        for name, season_id, conference_id in cur.fetchall():
+            self.conferences.setdefault((name, season_id), conference_id)
+
+        cur.execute("SELECT name, conference_id, id FROM divisions ORDER BY id")
+        self.divisions = {}
+        for name, conference_id, division_id in cur.fetchall():
+            self.divisions.setdefault((name, conference_id), division_id)
+
+        self.created = 0
+        print(f"Dimension cache: {len(self.teams)} teams, {len(self.conferences)} conferences, "
+              f"{len(self.divisions)} divisions loaded.")
+
+    def ensure_conferences(self, cur, conferences):
+        """Create every missing (name, season_id) conference in one statement."""
+        missing = sorted({key for key in conferences if key not in self.conferences})
+        if not missing:
+            return
+        created = insert_values(
+            cur, "INSERT INTO conferences (name, season_id) VALUES %s RETURNING name, season_id, id", missing
+        )
+        for name, season_id, conference_id in created:
+            self.conferences[(name, season_id)] = conference_id
+        self.created += len(created)
+
+    def ensure_divisions(self, cur, divisions):
+        """Create every missing (name, conference_id, season_id) division in one statement."""
+        missing = {}
+        for name, conference_id, season_id in divisions:
+            if (name, conference_id) not in self.divisions:
+                missing.setdefault((name, conference_id), season_id)
+        if not missing:
+            return
+        created = insert_values(
+            cur,
+            "INSERT INTO divisions (name, conference_id, season_id) VALUES %s "
+            "RETURNING name, conference_id, id",
+            [(name, conference_id, season_id) for (name, conference_id), season_id in missing.items()],
+        )
+        for name, conference_id, division_id in created:
+            self.divisions[(name, conference_id)] = division_id
+        self.created += len(created)
+
+    def conference_id(self, name: str, season_id: int) -> Optional[int]:
+        return self.conferences.get((name, season_id))
+
+    def division_id(self, name: str, conference_id: Optional[int]) -> Optional[int]:
+        return self.divisions.get((name, conference_id))
+
+    def team_id(self, abbreviation: str) -> Optional[int]:
+        return self.teams.get(abbreviation)
+
+
+# teamName spellings the player landing endpoint uses that differ from
+# teams.name; every name in a group is tried for the same season
+TEAM_NAME_ALIASES = (
+    ("Mighty Ducks of Anaheim", "Anaheim Ducks"),
+    ("Phoenix Coyotes", "Arizona Coyotes"),
+    ("Utah Hockey Club", "Utah Mammoth"),
+)
+
+
+def _normalize_team_name(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of a team name."""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().replace(".", " ").split())
+
+
+class TeamSeasonIndex:
+    """(team name, season) -> team_season_id, loaded once per run.
+
+    Replaces one `get_team_season_id_from_team_name` query per season row.
+    Names are matched after normalization (so "Montreal" finds "Montréal"),
+    then through `TEAM_NAME_ALIASES`. Names that still don't resolve are
+    counted and listed by `report_misses` instead of being dropped silently.
+    """
+
+    def __init__(self, cur, aliases=TEAM_NAME_ALIASES):
+        cur.execute("""
+            SELECT ts.id, ts.season_id, t.name
+            FROM team_seasons ts
+            JOIN teams t ON ts.team_id = t.id
+            ORDER BY ts.id
+        """)
+        self._index = {}
+        for team_season_id, season_id, name in cur.fetchall():
+            self._index.setdefault((_normalize_team_name(name), season_id), team_season_id)
+
+        self._aliases = {}
+        for group in aliases:
+            names = [_normalize_team_name(name) for name in group]
+            for name in names:
+                self._aliases.setdefault(name, []).extend(other for other in names if other != name)
+
+        self.misses = Counter()
+        self.alias_hits = 0
+        print(f"Team-season index: {len(self._index)} team seasons loaded.")
+
+    def resolve(self, team_name: str, season_id: int) -> Optional[int]:
+        name = _normalize_team_name(team_name)
+        team_season_id = self._index.get((name, season_id))
+        if team_season_id is not None:
+            return team_season_id
+        for alias in self._aliases.get(name, ()):
+            team_season_id = self._index.get((alias, season_id))
+            if team_season_id is not None:
+                self.alias_hits += 1
+                return team_season_id
+        self.misses[(team_name, season_id)] += 1
+        return None
+
+    def report_misses(self, limit: int = 20):
+        if self.alias_hits:
+            print(f"Team-season index: {self.alias_hits} season rows resolved through aliases.")
+        if not self.misses:
+            return
+        print(f"Team-season index: {sum(self.misses.values())} season rows for "
+              f"{len(self.misses)} unknown (team, season) pairs were skipped:")
+        for (team_name, season_id), count in self.misses.most_common(limit):
+            print(f"  {team_name} {season_id}: {count} rows")
+        if len(self.misses) > limit:
+            print(f"  ... and {len(self.misses) - limit} more; add spellings to TEAM_NAME_ALIASES")
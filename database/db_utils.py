@@ -1,25 +1,240 @@
 # database/db_utils.py (CORRECTED)
 
 import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
 from dotenv import load_dotenv
 
+try:
+    import psycopg
+except ImportError:  # optional; only needed for the psycopg3 (pipeline) backend
+    psycopg = None
+
 # load environment variables
 load_dotenv()
 
-def get_db_connection():
+PSYCOPG2 = "psycopg2"
+PSYCOPG3 = "psycopg3"
+DB_BACKENDS = (PSYCOPG2, PSYCOPG3)
+
+# catch these instead of psycopg2.Error so either backend's errors are handled
+DB_ERRORS = (psycopg2.Error,) + ((psycopg.Error,) if psycopg is not None else ())
+OPERATIONAL_ERRORS = (psycopg2.OperationalError,) + ((psycopg.OperationalError,) if psycopg is not None else ())
+
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 8
+# connections idle for longer than this are pinged before being handed out
+DEFAULT_CHECK_AFTER = 30
+CONNECT_RETRIES = 3
+
+_db_backend = None
+
+
+def set_db_backend(backend):
+    global _db_backend
+    if backend not in DB_BACKENDS:
+        raise ValueError(f"database backend must be one of {DB_BACKENDS}, got {backend!r}")
+    if backend == PSYCOPG3 and psycopg is None:
+        raise RuntimeError("the psycopg3 backend requires the psycopg package (pip install 'psycopg[binary]')")
+    _db_backend = backend
+
+
+def get_db_backend():
+    if _db_backend is None:
+        set_db_backend(os.getenv("NHL_DB_BACKEND", PSYCOPG2))
+    return _db_backend
+
+
+def is_psycopg3(conn_or_cursor):
+    """True for psycopg 3 connections and cursors."""
+    return psycopg is not None and isinstance(conn_or_cursor, (psycopg.Connection, psycopg.Cursor))
+
+
+def _connect_kwargs():
+    return dict(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT")
+    )
+
+
+def _connect(backend=None, **connect_kwargs):
+    kwargs = connect_kwargs or _connect_kwargs()
+    if (backend or get_db_backend()) == PSYCOPG3:
+        return psycopg.connect(**{key: value for key, value in kwargs.items() if value is not None})
+    return psycopg2.connect(**kwargs)
+
+
+def get_db_connection(backend=None):
     """Establish and return a connection to the PostgreSQL database."""
-    
-    try: 
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+
+    try:
+        conn = _connect(backend)
         return conn
-        
-    except psycopg2.Error as e: 
+
+    except DB_ERRORS as e:
         print(f"Error connecting to the database: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+class ConnectionPool:
+    """Thread-safe pool of health-checked connections.
+
+    Up to `maxconn` connections are open at once, and `minconn` are opened
+    up front. `getconn` blocks while all of them are checked out instead of
+    failing. A connection that sat idle for more than `check_after` seconds
+    is pinged with `SELECT 1` first; a dead one is discarded and replaced.
+    Connecting is retried with backoff, so a database restart mid-run costs
+    a few seconds rather than the stage. Connections come from the
+    configured backend (psycopg2 or psycopg3).
+    """
+
+    def __init__(self, minconn=DEFAULT_POOL_MIN, maxconn=DEFAULT_POOL_MAX,
+                 check_after=DEFAULT_CHECK_AFTER, backend=None, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.check_after = check_after
+        self.backend = backend or get_db_backend()
+        self.pid = os.getpid()
+        self._connect_kwargs = connect_kwargs or _connect_kwargs()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._last_used = {}
+        self.reconnects = 0
+        for _ in range(minconn):
+            self._idle.append(self._retry(self._new_connection))
+
+    def _new_connection(self):
+        return _connect(self.backend, **self._connect_kwargs)
+
+    def _retry(self, connect):
+        for attempt in range(CONNECT_RETRIES + 1):
+            try:
+                return connect()
+            except OPERATIONAL_ERRORS as e:
+                if attempt == CONNECT_RETRIES:
+                    raise
+                wait = 2 ** attempt
+                print(f"Database connection failed ({e}). Retrying in {wait}s...")
+                time.sleep(wait)
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        if time.time() - self._last_used.get(id(conn), 0) < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except DB_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except DB_ERRORS:
+            pass
+
+    def getconn(self):
+        """Check out a live connection, waiting for a free slot if needed."""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._retry(self._new_connection)
+                if self._is_alive(conn):
+                    return conn
+                print("Discarding dead database connection and reconnecting.")
+                self.reconnects += 1
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """Return `conn`; an open transaction is rolled back first."""
+        try:
+            if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except DB_ERRORS:
+            close = True
+        if close or conn.closed:
+            self._discard(conn)
+        else:
+            self._last_used[id(conn)] = time.time()
+            with self._lock:
+                self._idle.append(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """`with pool.connection() as conn:`; rolls back on error, always returns conn."""
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def configure_db_pool(minconn=DEFAULT_POOL_MIN, maxconn=DEFAULT_POOL_MAX, check_after=DEFAULT_CHECK_AFTER):
+    """Install the process-wide connection pool (closing any previous one)."""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None and _db_pool.pid == os.getpid():
+            _db_pool.closeall()
+        _db_pool = ConnectionPool(minconn, maxconn, check_after)
+    return _db_pool
+
+
+def get_db_pool():
+    """Return the process-wide pool, sized from `NHL_DB_POOL_MIN`/`_MAX` on first use.
+
+    A forked worker gets a pool of its own; connections never cross processes.
+    """
+    if _db_pool is None or _db_pool.pid != os.getpid():
+        configure_db_pool(
+            minconn=int(os.getenv("NHL_DB_POOL_MIN", DEFAULT_POOL_MIN)),
+            maxconn=int(os.getenv("NHL_DB_POOL_MAX", DEFAULT_POOL_MAX)),
+        )
+    return _db_pool
+
+
+@contextmanager
+def db_connection():
+    """Borrow a connection from the process-wide pool for the `with` block."""
+    with get_db_pool().connection() as conn:
+        yield conn
+
+
+def close_db_pool():
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None and _db_pool.pid == os.getpid():
+            _db_pool.closeall()
+        _db_pool = None
@@ -1,23 +1,424 @@
 """HTTP utility helpers (requests with retry and backoff).
 
 Extracted from `crud.py` so it can be reused and unit tested separately.
+
+`get_with_retry` can sit behind a persistent response cache (`ResponseCache`).
+The cache stores ETag/Last-Modified so stale entries are revalidated with
+conditional requests. Freshness comes from `cache_ttl_for_url`: closed seasons
+never expire and the current season expires in minutes. Enable it with
+`configure_http_cache(path)` or the `NHL_HTTP_CACHE` environment variable.
+
+Requests also pass through the shared per-host token bucket in
+`rate_limit.py` when one is configured; 429s feed their Retry-After into it.
+With a cassette configured (`cassette.py`) responses are recorded, or served
+back without any network access. With an archive configured (`archive.py`)
+every successful payload is also kept on disk, compressed and addressed by
+content, and an offline archive answers requests itself. A per-host circuit
+breaker (`circuit_breaker.py`) turns a run of failures into an immediate
+`CircuitOpenError` instead of more retries.
+
+Unless a session is passed in, requests share one keep-alive client per
+process (`get_http_client`). It is a pooled `requests.Session`, or an HTTP/2
+`httpx` client when `NHL_HTTP2` is set and httpx is installed.
+`connection_stats` reports how many TLS handshakes that pooling saved.
 """
-import requests
+import json
+import os
+import re
+import sqlite3
+import threading
 import time
+from datetime import date, datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .archive import get_archive
+from .cassette import REPLAY, get_cassette
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .metrics import HTTP_CACHE_HITS, HTTP_CIRCUIT_OPEN, HTTP_LATENCY, HTTP_RATE_LIMITED, HTTP_REQUESTS, HTTP_RETRIES
+from .rate_limit import get_rate_limiter
+
+# TTLs in seconds; None means the entry never expires
+CURRENT_SEASON_TTL = 15 * 60
+REFERENCE_DATA_TTL = 24 * 60 * 60
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# the API is served from two hosts; keep a pool for each plus some slack
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+
+# response headers worth keeping with a cached body
+_CACHED_HEADERS = ("Content-Type", "Content-Encoding", "ETag", "Last-Modified", "Cache-Control", "Date")
+
+_ROSTER_RE = re.compile(r"/v1/roster/[^/]+/(\d{8})/?$")
+_STANDINGS_RE = re.compile(r"/v1/standings/(\d{4}-\d{2}-\d{2})/?$")
+_REFERENCE_RE = re.compile(r"/stats/rest/[^/]+/(season|team)/?$")
+
+
+def _season_is_closed(season_id):
+    """A season is closed once the summer after its playoffs has started."""
+    end_year = int(season_id) % 10000
+    return date.today() >= date(end_year, 8, 1)
+
+
+def cache_ttl_for_url(url, current_ttl=CURRENT_SEASON_TTL):
+    """Return how long a response for `url` stays fresh (None = forever)."""
+    match = _ROSTER_RE.search(url)
+    if match:
+        return None if _season_is_closed(match.group(1)) else current_ttl
+
+    match = _STANDINGS_RE.search(url)
+    if match:
+        # standings for a past date are a fixed snapshot
+        standings_date = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        return None if standings_date < date.today() else current_ttl
+
+    if _REFERENCE_RE.search(url):
+        return REFERENCE_DATA_TTL
+
+    # player landings and anything else may include current-season data
+    return current_ttl
+
+
+class ResponseCache:
+    """On-disk (SQLite) store of successful GET responses keyed by URL.
+
+    Total body size is bounded by `max_bytes`; the least recently used
+    entries are evicted first. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_MAX_BYTES, current_ttl=CURRENT_SEASON_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.current_ttl = current_ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def lookup(self, url):
+        """Return the cached entry for `url` as a dict, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, etag, last_modified, expires_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            with self._db:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+
+        status, headers, body, etag, last_modified, expires_at = row
+        return {
+            "url": url,
+            "status": status,
+            "headers": json.loads(headers),
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires_at": expires_at,
+        }
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry["expires_at"] is None or entry["expires_at"] > time.time()
+
+    def _expires_at(self, url, now):
+        ttl = cache_ttl_for_url(url, self.current_ttl)
+        return None if ttl is None else now + ttl
+
+    def store(self, url, resp):
+        """Save a 200 response, then evict old entries if over budget."""
+        headers = {name: resp.headers[name] for name in _CACHED_HEADERS if name in resp.headers}
+        body = resp.content
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (url, status, headers, body, etag, last_modified, fetched_at, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url, resp.status_code, json.dumps(headers), body,
+                    headers.get("ETag"), headers.get("Last-Modified"),
+                    now, self._expires_at(url, now), now, len(body),
+                ),
+            )
+            self._evict()
+
+    def refresh(self, url):
+        """Extend an entry's lifetime after a 304 Not Modified."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE responses SET fetched_at = ?, expires_at = ?, last_access = ? WHERE url = ?",
+                (now, self._expires_at(url, now), now, url),
+            )
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for url, size in self._db.execute("SELECT url, size FROM responses ORDER BY last_access"):
+            victims.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE url = ?", victims)
+        print(f"http cache: evicted {len(victims)} entries to stay under {self.max_bytes} bytes")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_response_cache = None
+_cache_configured = False
+_cache_lock = threading.Lock()
+
+
+def configure_http_cache(path, max_bytes=DEFAULT_CACHE_MAX_BYTES, current_ttl=CURRENT_SEASON_TTL):
+    """Route `get_with_retry` through an on-disk cache at `path` (None disables it)."""
+    global _response_cache, _cache_configured
+    with _cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        _response_cache = ResponseCache(path, max_bytes, current_ttl) if path else None
+        _cache_configured = True
+    return _response_cache
+
+
+def get_response_cache():
+    """Return the process-wide cache, creating it from `NHL_HTTP_CACHE` on first use."""
+    if not _cache_configured:
+        path = os.getenv("NHL_HTTP_CACHE")
+        max_mb = os.getenv("NHL_HTTP_CACHE_MAX_MB")
+        max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_CACHE_MAX_BYTES
+        configure_http_cache(path, max_bytes=max_bytes)
+    return _response_cache
+
+
+class _Http2Session:
+    """Minimal `requests.Session` lookalike backed by an HTTP/2 `httpx.Client`.
+
+    Every request to a host is multiplexed over one connection. Responses
+    are converted to `requests.Response` and errors to `requests` exceptions,
+    so callers don't need to know which client they got.
+    """
+
+    def __init__(self, pool_maxsize):
+        import httpx
+
+        self._httpx = httpx
+        self._client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+        self._lock = threading.Lock()
+        self.connections = 0
+
+    def _trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+
+    def get(self, url, timeout=None, headers=None):
+        try:
+            r = self._client.get(url, timeout=timeout, headers=headers, extensions={"trace": self._trace})
+        except self._httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except self._httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+
+        resp = requests.Response()
+        resp.status_code = r.status_code
+        resp.headers = CaseInsensitiveDict(r.headers)
+        resp._content = r.content
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = str(r.url)
+        return resp
+
+    def close(self):
+        self._client.close()
+
+
+_http_client = None
+_client_requests = 0
+_client_lock = threading.Lock()
+
+
+def configure_http_client(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, http2=False):
+    """Replace the process-wide keep-alive client used by `get_with_retry`."""
+    global _http_client, _client_requests
+    with _client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _client_requests = 0
+        if http2:
+            try:
+                _http_client = _Http2Session(pool_maxsize)
+            except ImportError:
+                print("http client: httpx[http2] is not installed, falling back to HTTP/1.1 keep-alive")
+        if _http_client is None:
+            _http_client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            _http_client.mount("https://", adapter)
+            _http_client.mount("http://", adapter)
+    return _http_client
+
+
+def get_http_client():
+    """Return the process-wide client, configured from `NHL_HTTP_POOL_*`/`NHL_HTTP2` on first use."""
+    if _http_client is None:
+        configure_http_client(
+            pool_connections=int(os.getenv("NHL_HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS)),
+            pool_maxsize=int(os.getenv("NHL_HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)),
+            http2=os.getenv("NHL_HTTP2", "").lower() in ("1", "true", "yes"),
+        )
+    return _http_client
+
+
+def connection_stats():
+    """Requests sent through the shared client and connections it had to open."""
+    client = _http_client
+    if client is None:
+        return {"requests": 0, "connections": 0, "handshakes_saved": 0}
+    if isinstance(client, _Http2Session):
+        connections = client.connections
+    else:
+        connections = 0
+        # one adapter is mounted for both http:// and https://; count it once
+        adapters = {id(adapter): adapter for adapter in client.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            connections += sum(pools[key].num_connections for key in pools.keys())
+    return {
+        "requests": _client_requests,
+        "connections": connections,
+        "handshakes_saved": max(0, _client_requests - connections),
+    }
+
+
+def _count_client_request():
+    global _client_requests
+    with _client_lock:
+        _client_requests += 1
+
+
+def _cached_response(entry):
+    """Rebuild a `requests.Response` from a cache entry."""
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.headers = CaseInsensitiveDict(entry["headers"])
+    resp._content = entry["body"]
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp.url = entry["url"]
+    resp.from_cache = True
+    return resp
+
+
+def _conditional_headers(entry):
+    headers = {}
+    if entry is None:
+        return headers
+    if entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
 
 
 def get_with_retry(url, session=None, max_retries=5, backoff_factor=1, timeout=10):
     """Simple GET with exponential backoff and Retry-After handling.
 
     Returns the final `requests.Response` (may be non-200 if all retries exhausted).
+    Fresh cached responses are returned without touching the network.
     """
-    sess = session or requests
+    archive = get_archive()
+    if archive is not None and archive.offline:
+        return archive.replay(url)
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == REPLAY:
+        return cassette.replay(url)
+
+    started = time.monotonic()
+    try:
+        resp = _get_with_retry(url, session, max_retries, backoff_factor, timeout)
+    except requests.RequestException as e:
+        if cassette is not None:
+            cassette.record_error(url, e, time.monotonic() - started)
+        raise
+    if cassette is not None:
+        cassette.record(url, resp, time.monotonic() - started)
+    if archive is not None and resp.status_code == 200 and not getattr(resp, "from_cache", False):
+        archive.put(url, resp)
+    return resp
+
+
+def _get_with_retry(url, session, max_retries, backoff_factor, timeout):
+    cache = get_response_cache()
+    entry = cache.lookup(url) if cache else None
+    if entry and cache.is_fresh(entry):
+        print(f"get_with_retry: cache hit {url}")
+        HTTP_CACHE_HITS.inc()
+        return _cached_response(entry)
+    headers = _conditional_headers(entry)
+    limiter = get_rate_limiter()
+    breaker = get_circuit_breaker()
+    host = urlparse(url).hostname
+
+    sess = session or get_http_client()
     for attempt in range(1, max_retries + 1):
         print(f"get_with_retry: attempt {attempt}/{max_retries} GET {url}")
+        if attempt > 1:
+            HTTP_RETRIES.inc(host=host)
+        if breaker:
+            try:
+                breaker.before_request(host)
+            except CircuitOpenError:
+                HTTP_CIRCUIT_OPEN.inc(host=host)
+                raise
+        if limiter:
+            limiter.acquire(host)
+        if sess is _http_client:
+            _count_client_request()
+        sent = time.perf_counter()
         try:
-            resp = sess.get(url, timeout=timeout)
+            resp = sess.get(url, timeout=timeout, headers=headers or None)
         except requests.RequestException as e:
+            HTTP_LATENCY.observe(time.perf_counter() - sent, host=host)
+            HTTP_REQUESTS.inc(host=host, status="error")
             print(f"get_with_retry: request exception on attempt {attempt}: {e}")
+            if breaker:
+                breaker.record_failure(host)
+                if breaker.is_open(host):
+                    raise CircuitOpenError(f"circuit open for {host} after: {e}") from e
             if attempt == max_retries:
                 print("get_with_retry: max retries reached, raising")
                 raise
@@ -25,19 +426,35 @@ def get_with_retry(url, session=None, max_retries=5, backoff_factor=1, timeout=1
             print(f"get_with_retry: sleeping {sleep}s before retry")
             time.sleep(sleep)
             continue
+        HTTP_LATENCY.observe(time.perf_counter() - sent, host=host)
+        HTTP_REQUESTS.inc(host=host, status=str(resp.status_code))
+
+        if breaker:
+            # a 429 still means the host is up; only 5xx count against the budget
+            if 500 <= resp.status_code < 600:
+                breaker.record_failure(host)
+                if breaker.is_open(host):
+                    raise CircuitOpenError(f"circuit open for {host} after status {resp.status_code}")
+            else:
+                breaker.record_success(host)
 
         # Handle rate limit explicitly
         if resp.status_code == 429:
+            HTTP_RATE_LIMITED.inc(host=host)
             retry_after = resp.headers.get("Retry-After")
             try:
                 wait = int(retry_after) if retry_after is not None else backoff_factor * (2 ** (attempt - 1))
             except Exception:
                 wait = backoff_factor * (2 ** (attempt - 1))
             print(f"get_with_retry: 429 received, Retry-After={retry_after}, waiting {wait}s")
+            if limiter:
+                # pause every process sharing the bucket, not just this one
+                limiter.penalize(host, wait)
             if attempt == max_retries:
                 print("get_with_retry: max retries reached after 429, returning response")
                 return resp
-            time.sleep(wait)
+            if not limiter:
+                time.sleep(wait)
             continue
 
         # Retry on server errors
@@ -47,5 +464,13 @@ def get_with_retry(url, session=None, max_retries=5, backoff_factor=1, timeout=1
             time.sleep(sleep)
             continue
 
+        if resp.status_code == 304 and entry:
+            print(f"get_with_retry: not modified, serving cached {url}")
+            cache.refresh(url)
+            return _cached_response(entry)
+
+        if resp.status_code == 200 and cache:
+            cache.store(url, resp)
+
         print(f"get_with_retry: success/terminal response status={resp.status_code}")
         return resp
@@ -0,0 +1,97 @@
+"""Projection decoder for large JSON documents.
+
+`decode_fields` walks a JSON object key by key and keeps only the requested
+paths. Other values are decoded by the C scanner and dropped right away, so
+at most one of them is alive at a time instead of the whole document tree.
+Scanning stops once every requested top-level key has been found. Player
+landing payloads are large (bio, awards, last-5 games, media), but we only
+read a couple of keys from them, and the tail after `seasonTotals` is never
+decoded at all.
+
+Paths are top-level keys ("seasonTotals") or dotted paths into nested
+objects ("featuredStats.regularSeason"). The result has the same nesting as
+the paths; keys missing from the document are left out.
+"""
+import json
+import re
+
+_scan = json.JSONDecoder().raw_decode
+_OPEN = re.compile(r"[ \t\n\r]*\{")
+_CLOSE = re.compile(r"[ \t\n\r]*\}")
+_KEY = re.compile(r'[ \t\n\r]*"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*', re.DOTALL)
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,}])")
+
+
+def _build_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is None:  # a shorter path already asks for the whole value
+                break
+            node = child
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def _decode_object(text, pos, tree, stop_early):
+    """Decode the wanted keys of the object at `pos`; return (result, end)."""
+    match = _OPEN.match(text, pos)
+    if match is None:
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    pos = match.end()
+    result = {}
+    remaining = len(tree)
+
+    match = _CLOSE.match(text, pos)
+    if match:
+        return result, match.end()
+
+    while True:
+        if remaining == 0 and stop_early:
+            return result, None
+
+        match = _KEY.match(text, pos)
+        if match is None:
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key = match.group(1)
+        if "\\" in key:
+            key = json.loads(f'"{key}"')
+        pos = match.end()
+
+        subtree = tree.get(key, False)
+        if subtree is False or key in result:
+            _, pos = _scan(text, pos)
+        elif subtree is None:
+            result[key], pos = _scan(text, pos)
+            remaining -= 1
+        else:
+            if _OPEN.match(text, pos):
+                result[key], pos = _decode_object(text, pos, subtree, stop_early=False)
+            else:
+                _, pos = _scan(text, pos)
+            remaining -= 1
+
+        match = _SEPARATOR.match(text, pos)
+        if match is None:
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, pos)
+        pos = match.end()
+        if match.group(1) == "}":
+            return result, pos
+
+
+def decode_fields(text, paths):
+    """Decode only `paths` from the JSON object in `text`."""
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode("utf-8")
+    result, _ = _decode_object(text, 0, _build_tree(paths), stop_early=True)
+    return result
+
+
+def decode_response_fields(response, paths):
+    """`decode_fields` for a `requests.Response` body."""
+    # decode the bytes directly; response.text may sniff the charset first
+    return decode_fields(response.content, paths)
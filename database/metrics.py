@@ -0,0 +1,233 @@
+"""Run metrics, exported as a Prometheus textfile.
+
+A small in-process registry of counters, gauges and histograms. It covers:
+
+- stage wall time and outcome, and DB time per stage;
+- HTTP requests by host and status, retries, 429s and circuit trips;
+- request latency histograms;
+- rows written per table.
+
+`run_update_sequence` writes everything to a `.prom` file at the end of each
+run, for node_exporter's textfile collector to scrape. The path comes from
+`configure_metrics`, `NHL_METRICS_TEXTFILE` or `--metrics-file`. Without a
+path nothing is written, but the numbers are still collected.
+
+The file is written to a temporary name and renamed into place, so a
+scrape never sees half a file. Worker processes (`--stats-workers`) keep
+their own registry; they return a `snapshot()` that the parent `merge()`s.
+DB time is attributed to the stage set with `stage_context` on the calling
+thread.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+_registry = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Metric:
+    def __init__(self, kind, name, help_text, buckets=None):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values = {}
+        with _lock:
+            _registry[name] = self
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def _update(self, key, value):
+        with _lock:
+            if self.kind == COUNTER:
+                self.values[key] = self.values.get(key, 0) + value
+            elif self.kind == GAUGE:
+                self.values[key] = value
+            else:
+                counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+                counts = [n + (1 if value <= bound else 0) for n, bound in zip(counts, self.buckets)]
+                self.values[key] = (counts, total + value, count + 1)
+
+
+class Counter(_Metric):
+    def __init__(self, name, help_text):
+        super().__init__(COUNTER, name, help_text)
+
+    def inc(self, amount=1, **labels):
+        self._update(self._key(labels), amount)
+
+
+class Gauge(_Metric):
+    def __init__(self, name, help_text):
+        super().__init__(GAUGE, name, help_text)
+
+    def set(self, value, **labels):
+        self._update(self._key(labels), value)
+
+
+class Histogram(_Metric):
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(HISTOGRAM, name, help_text, buckets=tuple(buckets))
+
+    def observe(self, value, **labels):
+        self._update(self._key(labels), value)
+
+
+STAGE_DURATION = Gauge("nhl_stage_duration_seconds", "Wall time of each update stage in the last run.")
+STAGE_SUCCESS = Gauge("nhl_stage_success", "1 if the stage completed in the last run, 0 if it failed or was skipped.")
+STAGE_DB_SECONDS = Counter("nhl_stage_db_seconds_total", "Time spent in upserts and prepared statements, by stage.")
+RUN_DURATION = Gauge("nhl_update_duration_seconds", "Wall time of the last update run.")
+RUN_TIMESTAMP = Gauge("nhl_update_last_run_timestamp_seconds", "Unix time the last update run finished.")
+HTTP_REQUESTS = Counter("nhl_http_requests_total", "API requests sent, by host and status (or 'error').")
+HTTP_RETRIES = Counter("nhl_http_retries_total", "API request attempts after the first, by host.")
+HTTP_RATE_LIMITED = Counter("nhl_http_rate_limited_total", "429 responses, by host.")
+HTTP_CACHE_HITS = Counter("nhl_http_cache_hits_total", "Requests answered from the response cache.")
+HTTP_CIRCUIT_OPEN = Counter("nhl_http_circuit_open_total", "Requests refused by an open circuit, by host.")
+HTTP_LATENCY = Histogram("nhl_http_request_duration_seconds", "API request latency per attempt, by host.")
+DB_ROWS = Counter("nhl_db_rows_total", "Rows upserted, by table and result (inserted, updated, unchanged).")
+DB_WRITE_SECONDS = Counter("nhl_db_write_seconds_total", "Time spent in upserts, by table.")
+
+
+def current_stage():
+    return getattr(_local, "stage", None) or "none"
+
+
+@contextmanager
+def stage_context(stage):
+    """Attribute DB time on this thread to `stage` for the `with` block."""
+    previous = getattr(_local, "stage", None)
+    _local.stage = stage
+    try:
+        yield
+    finally:
+        _local.stage = previous
+
+
+@contextmanager
+def db_timer():
+    """Count the `with` block as DB time of the current stage; nested blocks count once."""
+    depth = getattr(_local, "db_depth", 0)
+    _local.db_depth = depth + 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.db_depth = depth
+        if depth == 0:
+            STAGE_DB_SECONDS.inc(time.perf_counter() - started, stage=current_stage())
+
+
+def snapshot():
+    """Every metric's current values, picklable for handing back from a worker."""
+    with _lock:
+        return {name: dict(metric.values) for name, metric in _registry.items() if metric.values}
+
+
+def reset():
+    """Clear every metric, e.g. before a worker runs its next shard."""
+    with _lock:
+        for metric in _registry.values():
+            metric.values.clear()
+
+
+def merge(values):
+    """Fold a worker's `snapshot()` into this process's metrics."""
+    for name, series in values.items():
+        metric = _registry.get(name)
+        if metric is None:
+            continue
+        with _lock:
+            for key, value in series.items():
+                if metric.kind == COUNTER:
+                    metric.values[key] = metric.values.get(key, 0) + value
+                elif metric.kind == GAUGE:
+                    metric.values[key] = value
+                else:
+                    counts, total, count = metric.values.get(key, ([0] * len(metric.buckets), 0.0, 0))
+                    metric.values[key] = (
+                        [a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]
+                    )
+
+
+def _number(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render():
+    """The registry in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name in sorted(_registry):
+            metric = _registry[name]
+            if not metric.values:
+                continue
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key in sorted(metric.values):
+                value = metric.values[key]
+                if metric.kind != HISTOGRAM:
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+                    continue
+                counts, total, count = value
+                for bound, n in zip(metric.buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(key, [('le', f'{bound:g}')])} {n}")
+                lines.append(f"{name}_bucket{_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+_metrics_path = None
+_metrics_configured = False
+
+
+def configure_metrics(path):
+    """Write the textfile to `path` at the end of each run (None disables it)."""
+    global _metrics_path, _metrics_configured
+    _metrics_path = path
+    _metrics_configured = True
+    return _metrics_path
+
+
+def get_metrics_path():
+    if not _metrics_configured:
+        configure_metrics(os.getenv("NHL_METRICS_TEXTFILE"))
+    return _metrics_path
+
+
+def write_textfile(path=None):
+    """Atomically write the metrics to `path` (default: the configured one)."""
+    path = path or get_metrics_path()
+    if not path:
+        return None
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
+    print(f"Metrics written to {path}")
+    return path
+
@@ -0,0 +1,178 @@
+"""Versioned schema migrations and a sequential-scan check for hot queries.
+
+Migrations are the `NNNN_description.sql` files in `database/migrations/`.
+Pending ones are applied in version order, each in its own transaction.
+Every applied file is recorded in `schema_migrations` with a checksum;
+editing one after it was applied is reported instead of silently ignored.
+
+`check_query_plans` EXPLAINs every hot lookup and upsert with
+`enable_seqscan = off`. With sequential scans off, the planner still picks
+one when no index can answer a query, so any Seq Scan left in a plan means
+an index is missing. An upsert whose ON CONFLICT target has no matching
+unique index fails to plan at all and is reported too.
+"""
+import hashlib
+import json
+import os
+import re
+
+from .bulk_load import row_upsert_sql
+from .crud import (
+    PLAYER_COLUMNS,
+    PLAYER_STATS_COLUMNS,
+    ROSTER_COLUMNS,
+    SEASON_COLUMNS,
+    STANDINGS_COLUMNS,
+)
+from .db_helpers import (
+    SELECT_CONFERENCE,
+    SELECT_DIVISION,
+    SELECT_DIVISION_NO_CONFERENCE,
+    SELECT_TEAM_ID,
+    SELECT_TEAM_SEASON_BY_NAME,
+)
+from .db_utils import DB_ERRORS
+from .prepared import statement_sql
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, name, sql, checksum)] sorted by version."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            sql = f.read()
+        checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        migrations.append((int(match.group(1)), match.group(2), sql, checksum))
+    return migrations
+
+
+def _applied_migrations(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer PRIMARY KEY,
+                name text NOT NULL,
+                checksum text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        applied = dict(cur.fetchall())
+    conn.commit()
+    return applied
+
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """Apply every pending migration; returns the versions applied."""
+    applied = _applied_migrations(conn)
+    done = []
+    for version, name, sql, checksum in load_migrations(directory):
+        if version in applied:
+            if applied[version] != checksum:
+                print(f"Warning: migration {version:04d}_{name} changed after it was applied.")
+            continue
+        print(f"Applying migration {version:04d}_{name}...")
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum),
+                )
+            conn.commit()
+        except DB_ERRORS as e:
+            conn.rollback()
+            print(f"Migration {version:04d}_{name} failed: {e}")
+            raise
+        done.append(version)
+    if not done:
+        print("Schema is up to date.")
+    return done
+
+
+def migration_status(conn, directory=MIGRATIONS_DIR):
+    applied = _applied_migrations(conn)
+    for version, name, _, checksum in load_migrations(directory):
+        if version not in applied:
+            state = "pending"
+        elif applied[version] != checksum:
+            state = "applied (file changed since)"
+        else:
+            state = "applied"
+        print(f"{version:04d}_{name}: {state}")
+
+
+def _upsert(table, columns, conflict_columns, update_columns=None):
+    params = (None,) * len(columns)
+    return row_upsert_sql(table, columns, conflict_columns, update_columns), params
+
+
+# (label, sql, sample params) for every statement that runs once per row
+HOT_QUERIES = [
+    ("select_team_id", statement_sql(SELECT_TEAM_ID), ("TOR",)),
+    ("select_team_season_by_name", statement_sql(SELECT_TEAM_SEASON_BY_NAME), ("Toronto Maple Leafs", 20232024)),
+    ("select_conference", statement_sql(SELECT_CONFERENCE), ("Eastern", 20232024)),
+    ("select_division", statement_sql(SELECT_DIVISION), ("Atlantic", 1)),
+    ("select_division_no_conference", statement_sql(SELECT_DIVISION_NO_CONFERENCE), ("North",)),
+    ("select_team_season_by_team",
+     "SELECT id FROM team_seasons WHERE team_id = %s AND season_id = %s", (10, 20232024)),
+    ("game_team_season", """
+        SELECT team_seasons.id, teams.name
+        FROM team_seasons
+        JOIN teams ON team_seasons.team_id = teams.id
+        WHERE team_seasons.team_id = %s AND team_seasons.season_id = %s
+    """, (10, 20232024)),
+    ("player_stats_add_hit",
+     "UPDATE player_stats SET hits = hits + 1 WHERE team_season_id = %s AND player_id = %s", (1, 8479318)),
+    ("upsert_seasons", *_upsert("seasons", SEASON_COLUMNS, ("id",), SEASON_COLUMNS[1:])),
+    ("upsert_teams", *_upsert("teams", ("id", "name", "abbreviation", "franchise_id"), ("id",))),
+    ("upsert_team_seasons", *_upsert("team_seasons", ("team_id", "season_id"), ("team_id", "season_id"))),
+    ("upsert_standings",
+     *_upsert("team_seasons", STANDINGS_COLUMNS, ("team_id", "season_id"), STANDINGS_COLUMNS[2:])),
+    ("upsert_players", *_upsert("players", PLAYER_COLUMNS, ("id",), PLAYER_COLUMNS[1:])),
+    ("upsert_rosters",
+     *_upsert("rosters", ROSTER_COLUMNS, ("team_season_id", "player_id"), ROSTER_COLUMNS[2:])),
+    ("upsert_player_stats", *_upsert("player_stats", PLAYER_STATS_COLUMNS,
+                                     ("player_id", "team_season_id"), PLAYER_STATS_COLUMNS[2:])),
+    ("upsert_player_stats_playoffs", *_upsert("player_stats_playoffs", PLAYER_STATS_COLUMNS,
+                                              ("player_id", "team_season_id"), PLAYER_STATS_COLUMNS[2:])),
+]
+
+
+def _seq_scans(node):
+    if node.get("Node Type") == "Seq Scan":
+        yield node.get("Relation Name")
+    for child in node.get("Plans", ()):
+        yield from _seq_scans(child)
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """EXPLAIN each hot query; returns [(label, problem)] for the failures."""
+    failures = []
+    for label, sql, params in queries:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL enable_seqscan = off")
+                cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cur.fetchone()[0]
+        except DB_ERRORS as e:
+            failures.append((label, str(e).strip().splitlines()[0]))
+            continue
+        finally:
+            conn.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        tables = sorted(set(_seq_scans(plan[0]["Plan"])))
+        if tables:
+            failures.append((label, f"sequential scan on {', '.join(tables)}"))
+
+    for label, problem in failures:
+        print(f"FAIL {label}: {problem}")
+    print(f"Query plan check: {len(queries) - len(failures)}/{len(queries)} hot queries use indexes.")
+    return failures
@@ -0,0 +1,99 @@
+-- Tables read and written by database/crud.py and the fetch/ scripts.
+-- IF NOT EXISTS so databases created before migrations existed are adopted as-is.
+
+CREATE TABLE IF NOT EXISTS seasons (
+    id integer PRIMARY KEY,
+    season_start_year integer NOT NULL,
+    season_end_year integer NOT NULL,
+    wild_card_in_use boolean,
+    ties_in_use boolean,
+    point_for_ot_loss boolean,
+    regular_season_end_date date,
+    playoff_end_date date
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id integer PRIMARY KEY,
+    name text NOT NULL,
+    abbreviation text,
+    franchise_id integer
+);
+
+CREATE TABLE IF NOT EXISTS conferences (
+    id serial PRIMARY KEY,
+    name text NOT NULL,
+    season_id integer NOT NULL REFERENCES seasons (id)
+);
+
+CREATE TABLE IF NOT EXISTS divisions (
+    id serial PRIMARY KEY,
+    name text NOT NULL,
+    conference_id integer REFERENCES conferences (id),
+    season_id integer NOT NULL REFERENCES seasons (id)
+);
+
+CREATE TABLE IF NOT EXISTS team_seasons (
+    id serial PRIMARY KEY,
+    team_id integer NOT NULL REFERENCES teams (id),
+    season_id integer NOT NULL REFERENCES seasons (id),
+    wins integer,
+    losses integer,
+    ot integer,
+    points integer,
+    division_id integer REFERENCES divisions (id)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    id integer PRIMARY KEY,
+    first_name text,
+    last_name text,
+    birthdate date,
+    country text,
+    shoots_catches text,
+    ameture_league text
+);
+
+CREATE TABLE IF NOT EXISTS rosters (
+    team_season_id integer NOT NULL REFERENCES team_seasons (id),
+    player_id integer NOT NULL REFERENCES players (id),
+    jersey_number integer,
+    position text,
+    player_height_inches integer,
+    player_weight_pounds integer
+);
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id integer NOT NULL REFERENCES players (id),
+    team_season_id integer NOT NULL REFERENCES team_seasons (id),
+    goals integer,
+    assists integer,
+    points integer,
+    plus_minus integer,
+    average_toi interval,
+    pim integer,
+    games_played integer,
+    hits integer NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS player_stats_playoffs (LIKE player_stats INCLUDING DEFAULTS);
+
+CREATE TABLE IF NOT EXISTS games (
+    id bigint PRIMARY KEY,
+    season_id integer NOT NULL REFERENCES seasons (id),
+    date date,
+    home_team_id integer REFERENCES team_seasons (id),
+    away_team_id integer REFERENCES team_seasons (id),
+    home_score integer,
+    away_score integer
+);
+
+CREATE TABLE IF NOT EXISTS game_goals (
+    game_id bigint NOT NULL REFERENCES games (id),
+    team_season_id integer REFERENCES team_seasons (id),
+    goal_order integer NOT NULL,
+    period integer,
+    time_in_period text,
+    situation_code text,
+    home_score integer,
+    away_score integer
+);
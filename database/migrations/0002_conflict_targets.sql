@@ -0,0 +1,11 @@
+-- Unique indexes the ON CONFLICT clauses infer their arbiters from. Without
+-- them every upsert fails with "no unique or exclusion constraint matching".
+-- A duplicate already in the table makes this migration fail; clean it up
+-- and rerun.
+
+CREATE UNIQUE INDEX IF NOT EXISTS team_seasons_team_season_key ON team_seasons (team_id, season_id);
+CREATE UNIQUE INDEX IF NOT EXISTS rosters_team_season_player_key ON rosters (team_season_id, player_id);
+CREATE UNIQUE INDEX IF NOT EXISTS player_stats_player_team_season_key ON player_stats (player_id, team_season_id);
+CREATE UNIQUE INDEX IF NOT EXISTS player_stats_playoffs_player_team_season_key
+    ON player_stats_playoffs (player_id, team_season_id);
+CREATE UNIQUE INDEX IF NOT EXISTS game_goals_game_goal_order_key ON game_goals (game_id, goal_order);
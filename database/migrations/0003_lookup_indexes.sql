@@ -0,0 +1,9 @@
+-- Covering indexes for the per-row lookups (db_helpers.py, fetch/ scripts),
+-- so each is an index-only scan. The (team_id, season_id),
+-- (player_id, team_season_id) and (team_season_id, player_id) lookups are
+-- served by the unique indexes from 0002.
+
+CREATE INDEX IF NOT EXISTS teams_abbreviation_idx ON teams (abbreviation) INCLUDE (id);
+CREATE INDEX IF NOT EXISTS teams_name_idx ON teams (name) INCLUDE (id);
+CREATE INDEX IF NOT EXISTS conferences_name_season_idx ON conferences (name, season_id) INCLUDE (id);
+CREATE INDEX IF NOT EXISTS divisions_name_conference_idx ON divisions (name, conference_id) INCLUDE (id);
@@ -0,0 +1,11 @@
+-- When each (stage, season, entity) was last ingested successfully; drives
+-- `update_data.py --incremental`. entity is a team abbreviation or a player
+-- id; season_id 0 marks entities not tied to one season (player landings).
+
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    stage text NOT NULL,
+    season_id integer NOT NULL,
+    entity text NOT NULL,
+    ingested_at timestamptz NOT NULL,
+    PRIMARY KEY (stage, season_id, entity)
+);
@@ -0,0 +1,8 @@
+-- Progress of long-running stages, for `update_data.py player_stats --resume`.
+-- position is the last entity (e.g. player id) whose rows were committed.
+
+CREATE TABLE IF NOT EXISTS stage_checkpoints (
+    stage text PRIMARY KEY,
+    position bigint NOT NULL,
+    updated_at timestamptz NOT NULL
+);
@@ -0,0 +1,6 @@
+-- The player id range a sharded stage's checkpoint covers, so
+-- `update_data.py player_stats --stats-workers N --resume` resumes every
+-- shard over the range it was given, even if the players table changed.
+
+ALTER TABLE stage_checkpoints ADD COLUMN IF NOT EXISTS first_position bigint;
+ALTER TABLE stage_checkpoints ADD COLUMN IF NOT EXISTS last_position bigint;
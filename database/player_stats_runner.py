@@ -0,0 +1,230 @@
+"""Checkpointed player_stats ingestion, in process or sharded across processes.
+
+`ingest_player_stats` streams `iter_player_stats_from_api` into the
+`player_stats` and `player_stats_playoffs` upserts. Landing pages are
+fetched ahead on a background thread while earlier players are written.
+Rows are committed every `checkpoint_every` players, or sooner once a chunk
+fills, together with a checkpoint (see `database/checkpoints.py`).
+
+Parsing landing JSON and building rows is CPU-bound. One process tops out
+at one core however fast the network is. `run_sharded_player_stats`
+therefore splits the player ids into contiguous ranges, one per worker
+process. Each worker opens its own DB connection and HTTP client and runs
+`ingest_player_stats` over its range with a checkpoint of its own. Every
+shard reports its progress as it commits. Workers are started with
+`spawn`, so they share no sockets, locks or pooled connections with the
+parent. The rate limiter's SQLite bucket still caps the fleet as a whole.
+
+Each shard's checkpoint is written before the workers start and records
+the shard's id range. `--resume` reruns the unfinished shards over exactly
+those ranges, so players added or removed since the interrupted run can't
+shift a boundary past work that was never done.
+"""
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .bulk_load import add_counts, empty_counts, format_counts
+from .cassette import RECORD, get_cassette
+from .checkpoints import (
+    clear_checkpoint,
+    clear_checkpoints,
+    get_checkpoint_every,
+    load_checkpoint,
+    load_span_checkpoints,
+    save_checkpoint,
+)
+from .circuit_breaker import CircuitOpenError
+from .crud import insert_player_stats_into_db, iter_player_stats_from_api
+from .db_utils import get_db_connection
+from .metrics import merge, reset, snapshot, stage_context
+from .profiling import stage_profile
+from .streaming import get_chunk_size, prefetch
+from .watermarks import ALL_SEASONS, stage_watermarks
+
+STAGE = "player_stats"
+SHARD_PREFIX = f"{STAGE}.shard"
+_SHARD_CHECKPOINT = re.compile(rf"^{re.escape(SHARD_PREFIX)}(\d+)of(\d+)$")
+
+
+def ingest_player_stats(conn, base_url, resume=False, first_id=None, last_id=None,
+                        checkpoint_name=STAGE, label=STAGE):
+    """Stream stats for players `first_id`..`last_id` (default: all) into the database.
+
+    Returns `(finished, players, counts)`. `finished` is False when the
+    circuit opened; the checkpoint then marks where `resume` picks up.
+    Insert errors propagate.
+    """
+    watermarks = stage_watermarks(conn, STAGE)
+    start_after = load_checkpoint(conn, checkpoint_name) if resume else None
+    if first_id is not None and (start_after is None or start_after < first_id):
+        start_after = first_id - 1
+    checkpoint_every = get_checkpoint_every()
+    chunk_size = get_chunk_size()
+    pending = []
+    players_pending = 0
+    # players whose landing page was fetched; watermarked once their rows are written
+    fetched = []
+    players = 0
+    last_player = None
+    counts = empty_counts()
+
+    def flush(checkpoint=True):
+        nonlocal pending, players_pending, fetched
+        rows, pending, players_pending = pending, [], 0
+        written, fetched = fetched, []
+        if rows:
+            add_counts(counts, insert_player_stats_into_db(conn, rows))
+        if watermarks is not None:
+            for player in written:
+                watermarks.mark(ALL_SEASONS, player)
+            watermarks.save(conn)
+        if checkpoint and last_player is not None:
+            save_checkpoint(conn, checkpoint_name, last_player)
+            print(f"{label}: committed through player {last_player} ({players} players, {format_counts(counts)}).")
+
+    player_stats = iter_player_stats_from_api(
+        conn, base_url, watermarks=watermarks, start_after=start_after, until=last_id
+    )
+    try:
+        for player, stats in prefetch(player_stats, checkpoint_every):
+            if stats is not None:
+                pending.extend(stats)
+                fetched.append(player)
+            players_pending += 1
+            players += 1
+            last_player = player
+            if players_pending >= checkpoint_every or len(pending) >= chunk_size:
+                flush()
+    except CircuitOpenError as e:
+        print(f"{label}: stopping early: {e}")
+        flush()
+        print(f"{label}: stopped early; rerun with --resume to continue from the last checkpoint.")
+        return False, players, counts
+
+    flush(checkpoint=False)
+    clear_checkpoint(conn, checkpoint_name)
+    print(f"{label}: complete, {players} players: {format_counts(counts)}")
+    return True, players, counts
+
+
+def shard_ranges(player_ids, shards):
+    """Split sorted `player_ids` into at most `shards` contiguous (first, last) ranges."""
+    if not player_ids:
+        return []
+    size = -(-len(player_ids) // max(1, shards))
+    return [
+        (player_ids[start], player_ids[min(start + size, len(player_ids)) - 1])
+        for start in range(0, len(player_ids), size)
+    ]
+
+
+def shard_checkpoint_name(shard, shards):
+    return f"{SHARD_PREFIX}{shard + 1}of{shards}"
+
+
+def _run_shard(shard, shards, first_id, last_id, base_url, resume):
+    """Worker entry point: ingest one id range on a connection of its own.
+
+    Returns the shard's outcome and its metrics snapshot for the parent.
+    """
+    reset()  # a worker process may run several shards
+    label = f"{STAGE} shard {shard + 1}/{shards}"
+    started = time.perf_counter()
+    print(f"{label}: players {first_id}..{last_id}")
+    conn = get_db_connection()
+    if conn is None:
+        return shard, False, 0, empty_counts(), 0.0, snapshot()
+    try:
+        name = shard_checkpoint_name(shard, shards)
+        with stage_context(STAGE), stage_profile(name):
+            finished, players, counts = ingest_player_stats(
+                conn, base_url, resume=resume, first_id=first_id, last_id=last_id,
+                checkpoint_name=name, label=label,
+            )
+    except Exception as e:
+        print(f"❌ {label} failed: {e}")
+        finished, players, counts = False, 0, empty_counts()
+    finally:
+        conn.close()
+    return shard, finished, players, counts, time.perf_counter() - started, snapshot()
+
+
+def _resumed_shards(conn):
+    """`[(shard, shards, first_id, last_id)]` left unfinished by an interrupted run, or None."""
+    checkpoints = load_span_checkpoints(conn, SHARD_PREFIX)
+    if not checkpoints:
+        return None
+    plan = []
+    for name, (_, first_id, last_id) in checkpoints.items():
+        match = _SHARD_CHECKPOINT.match(name)
+        if match is None or first_id is None or last_id is None:
+            raise RuntimeError(f"checkpoint {name} has no recorded player range; rerun without --resume")
+        plan.append((int(match.group(1)) - 1, int(match.group(2)), first_id, last_id))
+    if len({shards for _, shards, _, _ in plan}) > 1:
+        raise RuntimeError("shard checkpoints come from runs with different worker counts; "
+                           "rerun without --resume")
+    return sorted(plan)
+
+
+def _new_shards(conn, workers):
+    """Split the current players into `workers` ranges, checkpointed before any shard starts."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM players ORDER BY id")
+        player_ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    ranges = shard_ranges(player_ids, workers)
+    clear_checkpoints(conn, SHARD_PREFIX)
+    plan = [(shard, len(ranges), first_id, last_id) for shard, (first_id, last_id) in enumerate(ranges)]
+    for shard, shards, first_id, last_id in plan:
+        save_checkpoint(conn, shard_checkpoint_name(shard, shards), first_id - 1, span=(first_id, last_id))
+    if plan:
+        print(f"Sharding {len(player_ids)} players across {len(plan)} worker processes.")
+    return plan
+
+
+def run_sharded_player_stats(conn, base_url, workers, resume=False, initializer=None):
+    """Ingest player stats across `workers` processes; True if every shard finished.
+
+    `initializer` runs first in each worker, to re-apply the parent's
+    settings (write mode, backend, rate limiter, ...) that spawn does not
+    carry over. With `resume`, the unfinished shards of the interrupted run
+    are rerun over their recorded ranges, whatever `workers` is now.
+    """
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == RECORD:
+        # worker processes can't append to the parent's cassette
+        print("Recording a cassette; running player_stats in a single process.")
+        finished, _, _ = ingest_player_stats(conn, base_url, resume=resume)
+        return finished
+
+    plan = _resumed_shards(conn) if resume else None
+    if plan is not None:
+        print(f"Resuming {len(plan)} unfinished shard(s) of {plan[0][1]} over their recorded player ranges.")
+    else:
+        plan = _new_shards(conn, workers)
+        resume = False  # nothing to resume; the new checkpoints only mark where each shard starts
+    if not plan:
+        print("No players to fetch stats for.")
+        return True
+
+    counts = empty_counts()
+    finished_all = True
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(plan), mp_context=context, initializer=initializer) as executor:
+        futures = [
+            executor.submit(_run_shard, shard, shards, first_id, last_id, base_url, resume)
+            for shard, shards, first_id, last_id in plan
+        ]
+        for future in as_completed(futures):
+            shard, finished, players, shard_counts, elapsed, shard_metrics = future.result()
+            merge(shard_metrics)
+            add_counts(counts, shard_counts)
+            finished_all = finished_all and finished
+            status = "done" if finished else "incomplete"
+            print(f"{STAGE} shard {shard + 1}/{plan[0][1]} {status}: {players} players in {elapsed:.1f}s, "
+                  f"{format_counts(shard_counts)}")
+
+    print(f"{STAGE}: all shards {'finished' if finished_all else 'did not finish'}: {format_counts(counts)}")
+    return finished_all
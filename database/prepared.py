@@ -0,0 +1,151 @@
+"""Registry of server-side prepared statements.
+
+Statements that run once per row are registered by name with their usual
+`%s` SQL. `execute_prepared` sends `PREPARE name AS ...` the first time a
+name is used on a connection, then `EXECUTE name (...)` every time after.
+Postgres then parses the statement once per connection. After a few
+executions it keeps a generic plan and stops replanning.
+
+To show whether this pays off, each statement's planning time is sampled
+with `EXPLAIN (SUMMARY)`. The plain SQL is sampled on first use and the
+prepared form once its plan is cached. `report_prepared` prints the
+estimated planning time saved over the run. Disable with
+`set_prepare_enabled(False)` or `NHL_DB_PREPARE=0`, e.g. behind a
+transaction-pooling pgbouncer, which cannot keep prepared statements.
+On the psycopg3 backend statements are prepared by the driver itself
+(`prepare=True`) and only executions are counted.
+"""
+import os
+import re
+import threading
+
+from .db_utils import is_psycopg3
+from .metrics import db_timer
+
+# executions after which Postgres has settled on a generic plan (it tries
+# custom plans for the first five)
+PLAN_CACHE_WARMUP = 6
+
+_statements = {}
+_prepared_on = {}
+_stats = {}
+_lock = threading.Lock()
+_enabled = None
+
+
+def set_prepare_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def prepare_enabled():
+    if _enabled is None:
+        set_prepare_enabled(os.getenv("NHL_DB_PREPARE", "1").lower() not in ("0", "false", "no", "off"))
+    return _enabled
+
+
+class _StatementStats:
+    def __init__(self):
+        self.executions = 0
+        self.plain_planning_ms = None
+        self.prepared_planning_ms = None
+
+
+def register_statement(name, sql):
+    """Register `sql` (with `%s` placeholders) under `name`; returns `name`."""
+    with _lock:
+        existing = _statements.get(name)
+        if existing is not None and existing != sql:
+            raise ValueError(f"prepared statement {name!r} is already registered with different SQL")
+        _statements[name] = sql
+        _stats.setdefault(name, _StatementStats())
+    return name
+
+
+def statement_sql(name):
+    return _statements[name]
+
+
+def _positional(sql):
+    count = 0
+
+    def number(_):
+        nonlocal count
+        count += 1
+        return f"${count}"
+
+    return re.sub(r"%s", number, sql), count
+
+
+def _connection_key(conn):
+    # a reconnect gets a new backend, which has none of our statements
+    return id(conn), conn.info.backend_pid
+
+
+def _planning_ms(cur, sql, params):
+    cur.execute(f"EXPLAIN (SUMMARY) {sql}", params)
+    for (line,) in cur.fetchall():
+        if line.startswith("Planning Time:"):
+            return float(line.split(":")[1].split()[0])
+    return None
+
+
+def execute_prepared(cur, name, params=()):
+    """Execute the registered statement `name` with `params` on `cur`."""
+    with db_timer():
+        _execute_prepared(cur, name, params)
+
+
+def _execute_prepared(cur, name, params):
+    sql = _statements[name]
+    if not prepare_enabled():
+        cur.execute(sql, params)
+        return
+
+    stats = _stats[name]
+    if is_psycopg3(cur):
+        # psycopg 3 prepares natively; EXECUTE can't take bound parameters there
+        with _lock:
+            stats.executions += 1
+        cur.execute(sql, params, prepare=True)
+        return
+
+    key = _connection_key(cur.connection)
+    with _lock:
+        prepared = _prepared_on.setdefault(key, set())
+        first_use = name not in prepared
+        stats.executions += 1
+        sample_plain = stats.plain_planning_ms is None
+        sample_prepared = stats.prepared_planning_ms is None and stats.executions >= PLAN_CACHE_WARMUP
+
+    if sample_plain:
+        stats.plain_planning_ms = _planning_ms(cur, sql, params)
+    if first_use:
+        positional, _ = _positional(sql)
+        cur.execute(f"PREPARE {name} AS {positional}")
+        with _lock:
+            prepared.add(name)
+
+    placeholders = ", ".join(["%s"] * len(params))
+    execute = f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}"
+    if sample_prepared:
+        stats.prepared_planning_ms = _planning_ms(cur, execute, params)
+    cur.execute(execute, params)
+
+
+def report_prepared():
+    """Print executions and estimated planning time saved per statement."""
+    used = [(name, stats) for name, stats in sorted(_stats.items()) if stats.executions]
+    if not used or not prepare_enabled():
+        return
+    print("Prepared statements:")
+    total = 0.0
+    for name, stats in used:
+        if stats.plain_planning_ms is None or stats.prepared_planning_ms is None:
+            print(f"  {name}: {stats.executions} executions (too few to estimate planning savings)")
+            continue
+        saved = max(0.0, stats.plain_planning_ms - stats.prepared_planning_ms) * stats.executions
+        total += saved
+        print(f"  {name}: {stats.executions} executions, planning {stats.plain_planning_ms:.3f} ms "
+              f"-> {stats.prepared_planning_ms:.3f} ms, ~{saved:,.0f} ms saved")
+    print(f"  total planning time saved: ~{total / 1000:.2f}s")
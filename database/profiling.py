@@ -0,0 +1,245 @@
+"""Per-stage profiling for `update_data.py --profile`.
+
+Each stage is profiled two ways while it runs:
+
+- `cProfile`, saved as `<stage>.pstats` for `python -m pstats` or snakeviz.
+- A wall-clock stack sampler, saved as `<stage>.collapsed`: one
+  `frame;frame;... count` line per distinct stack, ready for flamegraph.pl
+  or speedscope. Sampling also sees time spent blocked in socket reads and
+  queue waits, which cProfile attributes poorly.
+
+The sampled stacks are bucketed into HTTP, JSON decoding, DB, waiting and
+plain Python (row building). The bucket is chosen by the innermost frame that
+belongs to one of them. `write_summary` prints each stage's split and its top
+cumulative functions and saves them to `summary.txt`.
+
+Helper threads that work for a stage, like the prefetch thread in
+`database/streaming.py`, join it with `attach_thread`. `--stats-workers`
+processes profile their shards into the same directory.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 15
+
+# (category, path fragments); the innermost frame matching any of them decides
+CATEGORIES = (
+    ("json", ("/json/", "json_projection.py")),
+    ("db", ("psycopg", "bulk_load.py", "prepared.py")),
+    ("http", ("requests/", "urllib3/", "httpx/", "httpcore/", "http/client.py", "socket.py", "ssl.py",
+              "http_utils.py", "rate_limit.py", "roster_store.py")),
+    ("wait", ("threading.py", "queue.py", "concurrent/futures/")),
+)
+
+
+def _short_path(filename):
+    """The last two components of `filename`, e.g. "requests/models.py"."""
+    return "/".join(filename.replace("\\", "/").split("/")[-2:])
+
+
+def _frame_label(code):
+    return f"{_short_path(code.co_filename)}:{code.co_name}"
+
+
+def categorize(stack):
+    """The category of a collapsed stack (root first), or "python"."""
+    for label in reversed(stack):
+        path = label.rsplit(":", 1)[0]
+        for category, fragments in CATEGORIES:
+            if any(fragment in "/" + path for fragment in fragments):
+                return category
+    return "python"
+
+
+class Profiler:
+    def __init__(self, directory, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._samples = {}
+        self._profiles = {}
+        self._sampler = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident, stage in threads.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                with self._lock:
+                    self._samples.setdefault(stage, Counter())[";".join(reversed(stack))] += 1
+
+    def _start_sampler(self):
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+                self._sampler.start()
+
+    def stage_of(self, ident):
+        with self._lock:
+            return self._threads.get(ident)
+
+    @contextmanager
+    def thread(self, stage):
+        """Profile the current thread as part of `stage` for the `with` block."""
+        self._start_sampler()
+        ident = threading.get_ident()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process; the sampler still covers this thread
+            profile = None
+        with self._lock:
+            self._threads[ident] = stage
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                self._threads.pop(ident, None)
+                if profile is not None:
+                    self._profiles.setdefault(stage, []).append(profile)
+
+    def write_stage(self, stage):
+        """Write `<stage>.pstats` and `<stage>.collapsed` for everything recorded so far."""
+        with self._lock:
+            profiles = self._profiles.pop(stage, [])
+            samples = self._samples.pop(stage, Counter())
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.directory, f"{stage}.pstats"))
+        if samples:
+            with open(os.path.join(self.directory, f"{stage}.collapsed"), "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+
+
+_profiler = None
+_profiler_configured = False
+_profiler_lock = threading.Lock()
+
+
+def configure_profiling(directory, interval=DEFAULT_SAMPLE_INTERVAL):
+    """Profile every stage into `directory` (None disables profiling)."""
+    global _profiler, _profiler_configured
+    with _profiler_lock:
+        _profiler = Profiler(directory, interval) if directory else None
+        _profiler_configured = True
+    return _profiler
+
+
+def get_profiler():
+    """Return the process-wide profiler, from `NHL_PROFILE_DIR` on first use."""
+    if not _profiler_configured:
+        configure_profiling(os.getenv("NHL_PROFILE_DIR"))
+    return _profiler
+
+
+@contextmanager
+def stage_profile(stage):
+    """Profile the `with` block as `stage` and write its files when it ends."""
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+        return
+    try:
+        with profiler.thread(stage):
+            yield
+    finally:
+        profiler.write_stage(stage)
+
+
+def thread_stage():
+    """The stage the current thread is profiled under, if any."""
+    profiler = get_profiler()
+    return profiler.stage_of(threading.get_ident()) if profiler is not None else None
+
+
+@contextmanager
+def attach_thread(stage):
+    """Profile a helper thread as part of `stage` (a no-op when `stage` is None)."""
+    profiler = get_profiler()
+    if profiler is None or stage is None:
+        yield
+        return
+    with profiler.thread(stage):
+        yield
+
+
+def _category_split(path):
+    totals = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            totals[categorize(stack.split(";"))] += int(count)
+    return totals
+
+
+def _top_functions(path, limit):
+    stats = pstats.Stats(path, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    lines = [f"  {'cumtime':>9} {'tottime':>9} {'ncalls':>9}  function"]
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows:
+        where = f"{_short_path(filename)}:{line}" if line else filename
+        lines.append(f"  {cumtime:9.3f} {tottime:9.3f} {ncalls:9d}  {name} ({where})")
+    return lines
+
+
+def write_summary(limit=TOP_FUNCTIONS):
+    """Print and save a per-stage summary of this run's profiles; returns its path."""
+    profiler = get_profiler()
+    if profiler is None:
+        return None
+    directory = profiler.directory
+    stages = sorted({
+        os.path.splitext(name)[0] for name in os.listdir(directory)
+        if name.endswith((".pstats", ".collapsed"))
+        and os.path.getmtime(os.path.join(directory, name)) >= profiler.started_at
+    })
+    lines = []
+    for stage in stages:
+        collapsed = os.path.join(directory, f"{stage}.collapsed")
+        stats_path = os.path.join(directory, f"{stage}.pstats")
+        lines.append(f"== {stage} ==")
+        if os.path.exists(collapsed):
+            split = _category_split(collapsed)
+            total = sum(split.values())
+            share = ", ".join(f"{category} {count / total:.0%}" for category, count in split.most_common())
+            lines.append(f"sampled time ({total} samples, ~{total * profiler.interval:.1f} thread-seconds): {share}")
+        if os.path.exists(stats_path):
+            lines.append(f"top {limit} functions by cumulative time:")
+            lines.extend(_top_functions(stats_path, limit))
+        lines.append("")
+
+    path = os.path.join(directory, "summary.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    print("\n".join(lines))
+    print(f"Profiles written to {directory} (<stage>.pstats, <stage>.collapsed, summary.txt)")
+    return path
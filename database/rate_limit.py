@@ -0,0 +1,139 @@
+"""Token-bucket rate limiter shared by every ingestion process on a host.
+
+Each API host has its own bucket, stored in a small SQLite file. Every
+process (and thread) draws tokens from the same row inside an immediate
+transaction, so the fleet as a whole stays under the limit. A 429's
+Retry-After pauses the bucket for everyone and halves its refill rate. The
+rate then climbs back to the configured value over `RECOVERY_SECONDS`.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_RATE = 5.0  # tokens (requests) per second per host
+DEFAULT_BURST = 10
+RECOVERY_SECONDS = 60
+MIN_RATE_FRACTION = 0.1
+
+
+class RateLimiter:
+    def __init__(self, path, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.path = path
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                host TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                rate REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+        """)
+
+    def _connect(self):
+        # sqlite connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _load(self, db, host, now):
+        row = db.execute(
+            "SELECT tokens, rate, updated, blocked_until FROM buckets WHERE host = ?", (host,)
+        ).fetchone()
+        if row is None:
+            return self.burst, self.rate, now, 0.0
+        tokens, rate, updated, blocked_until = row
+        # while blocked `updated` sits in the future, so nothing refills
+        elapsed = max(0.0, now - updated)
+        rate = min(self.rate, rate + elapsed * self.rate / RECOVERY_SECONDS)
+        tokens = min(self.burst, tokens + elapsed * rate)
+        return tokens, rate, max(now, updated), blocked_until
+
+    def _save(self, db, host, tokens, rate, updated, blocked_until):
+        db.execute(
+            """
+            INSERT OR REPLACE INTO buckets (host, tokens, rate, updated, blocked_until)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (host, tokens, rate, updated, blocked_until),
+        )
+
+    def _try_acquire(self, host):
+        """Take a token if one is available; otherwise return seconds to wait."""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            tokens, rate, updated, blocked_until = self._load(db, host, now)
+            if now < blocked_until:
+                db.execute("COMMIT")
+                return blocked_until - now
+            if tokens >= 1:
+                self._save(db, host, tokens - 1, rate, updated, blocked_until)
+                db.execute("COMMIT")
+                return 0.0
+            self._save(db, host, tokens, rate, updated, blocked_until)
+            db.execute("COMMIT")
+            return (1 - tokens) / rate
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def acquire(self, host):
+        """Block until a request to `host` is allowed."""
+        while True:
+            wait = self._try_acquire(host)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def penalize(self, host, retry_after):
+        """Feed a 429's Retry-After back into the shared bucket."""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            _, rate, _, blocked_until = self._load(db, host, now)
+            blocked_until = max(blocked_until, now + retry_after)
+            rate = max(self.rate * MIN_RATE_FRACTION, rate / 2)
+            self._save(db, host, 0.0, rate, blocked_until, blocked_until)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        print(f"rate limiter: {host} paused {retry_after}s, rate now {rate:.2f}/s")
+
+
+_rate_limiter = None
+_limiter_configured = False
+_limiter_lock = threading.Lock()
+
+
+def configure_rate_limiter(path, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    """Share a token bucket through the SQLite file at `path` (None disables it)."""
+    global _rate_limiter, _limiter_configured
+    with _limiter_lock:
+        _rate_limiter = RateLimiter(path, rate, burst) if path else None
+        _limiter_configured = True
+    return _rate_limiter
+
+
+def get_rate_limiter():
+    """Return the process-wide limiter, creating it from `NHL_RATE_LIMIT_DB` on first use."""
+    if not _limiter_configured:
+        configure_rate_limiter(
+            os.getenv("NHL_RATE_LIMIT_DB"),
+            rate=float(os.getenv("NHL_RATE_LIMIT_RPS", DEFAULT_RATE)),
+            burst=float(os.getenv("NHL_RATE_LIMIT_BURST", DEFAULT_BURST)),
+        )
+    return _rate_limiter
@@ -0,0 +1,35 @@
+"""Concurrent fan-out for roster requests.
+
+Roster lookups go through a `RosterStore`, whose fetch is blocking, so they
+run on a thread pool of `concurrency` workers. Results come back in the
+same order as the requested pairs, each as soon as it and every earlier
+one are done, so callers can start parsing before the last request returns.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from .circuit_breaker import CircuitOpenError
+
+DEFAULT_CONCURRENCY = 8
+
+
+def _fetch_roster(rosters, pair):
+    abbreviation, season_id = pair
+    try:
+        return rosters.get(abbreviation, season_id)
+    except CircuitOpenError as e:
+        return e
+
+
+def fetch_rosters(rosters, team_season_pairs, concurrency=DEFAULT_CONCURRENCY):
+    """Yield the roster for every (abbreviation, season_id) pair through `rosters`.
+
+    Payloads are yielded in the order of `team_season_pairs`; failed
+    requests yield None. Requests refused by an open circuit yield their
+    `CircuitOpenError` so the caller can stop cleanly. Closing the generator
+    early cancels the requests that have not started yet.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="roster")
+    try:
+        yield from executor.map(lambda pair: _fetch_roster(rosters, pair), team_season_pairs)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,89 @@
+"""Run-scoped coalescing of `/v1/roster/{abbr}/{season}` requests.
+
+The team_seasons, players and rosters stages all read the same roster
+payloads. A `RosterStore` created once per run fetches and parses each
+team-season's roster at most once. Concurrent callers asking for a roster
+that is already in flight wait for that request instead of sending their own.
+Failures are remembered too, so a missing roster is only requested once.
+A 404 is recorded as missing (`is_missing`); any other failure is
+transient, so callers can tell the two apart. An open circuit is not
+remembered: `CircuitOpenError` propagates to the caller and the roster can
+be requested again once the host recovers.
+"""
+import json
+import threading
+from concurrent.futures import Future
+
+import requests
+
+from .circuit_breaker import CircuitOpenError
+from .http_utils import get_with_retry
+
+
+class RosterStore:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._missing = set()
+        self.requests = 0
+        self.hits = 0
+
+    def get(self, abbreviation, season_id):
+        """Return the decoded roster payload, or None if it could not be fetched."""
+        key = (abbreviation, season_id)
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+                self.requests += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(self._fetch(abbreviation, season_id))
+            except BaseException as e:
+                if isinstance(e, CircuitOpenError):
+                    with self._lock:
+                        del self._futures[key]
+                future.set_exception(e)
+        return future.result()
+
+    def is_missing(self, abbreviation, season_id):
+        """True if the API answered 404 for this roster, i.e. it does not exist."""
+        with self._lock:
+            return (abbreviation, season_id) in self._missing
+
+    def _fetch(self, abbreviation, season_id):
+        url = f"{self.base_url}/v1/roster/{abbreviation}/{season_id}"
+        try:
+            response = get_with_retry(url, timeout=10)
+        except CircuitOpenError:
+            raise
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching roster for {abbreviation} in season {season_id}: {e}")
+            return None
+        if response.status_code == 404:
+            with self._lock:
+                self._missing.add((abbreviation, season_id))
+        if response.status_code != 200:
+            print(f"Failed request for {abbreviation} in season {season_id} (status {response.status_code})")
+            return None
+
+        try:
+            return response.json()
+        except json.JSONDecodeError:
+            print(f"Invalid JSON response for {abbreviation} in season {season_id}")
+            return None
+
+    def close(self):
+        print(f"Roster store: {self.requests} roster requests, {self.hits} served from memory.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,104 @@
+"""Dependency-aware stage scheduler.
+
+Stages are declared as a graph of `name -> names it depends on`.
+`select_stages` picks the stages to run: a target alone, or a target plus
+everything it depends on. `run_stages` runs them on a bounded thread pool.
+A stage starts as soon as all of its selected dependencies have succeeded.
+Dependents of a failed stage are skipped, while independent branches keep
+running.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+DEFAULT_WORKERS = 2
+
+
+def _topological(dependencies, names):
+    """`names` in dependency order (ties keep declaration order)."""
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"stage dependency cycle through {name!r}")
+        visiting.add(name)
+        for dependency in dependencies[name]:
+            if dependency in names:
+                visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(name)
+
+    for name in dependencies:
+        if name in names:
+            visit(name)
+    return ordered
+
+
+def select_stages(dependencies, targets, with_deps=False):
+    """Return the stages to run for `targets`, in dependency order."""
+    unknown = [target for target in targets if target not in dependencies]
+    if unknown:
+        raise KeyError(f"unknown stage(s): {', '.join(unknown)}")
+    selected = set(targets)
+    if with_deps:
+        stack = list(targets)
+        while stack:
+            for dependency in dependencies[stack.pop()]:
+                if dependency not in selected:
+                    selected.add(dependency)
+                    stack.append(dependency)
+    return _topological(dependencies, selected)
+
+
+def run_stages(dependencies, stages, run_stage, max_workers=DEFAULT_WORKERS):
+    """Run `run_stage(name)` for each of `stages`, respecting dependencies.
+
+    Only dependencies that are themselves in `stages` are waited for; the
+    rest are assumed to be in the database already. `run_stage` returns
+    True on success. Returns {name: OK | FAILED | SKIPPED}.
+    """
+    max_workers = max(1, int(max_workers))
+    status = {}
+    pending = list(stages)
+    running = {}
+    timings = {}
+
+    def timed(name):
+        started = time.perf_counter()
+        try:
+            return run_stage(name)
+        finally:
+            timings[name] = time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as executor:
+        while pending or running:
+            for name in list(pending):
+                waits_on = [dependency for dependency in dependencies[name] if dependency in stages]
+                blocked = [dependency for dependency in waits_on if status.get(dependency) in (FAILED, SKIPPED)]
+                if blocked:
+                    pending.remove(name)
+                    status[name] = SKIPPED
+                    print(f"⏭️  Skipping {name}: {', '.join(blocked)} did not complete.")
+                elif all(status.get(dependency) == OK for dependency in waits_on) and len(running) < max_workers:
+                    pending.remove(name)
+                    running[executor.submit(timed, name)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"❌ Stage {name} raised: {e}")
+                    ok = False
+                status[name] = OK if ok else FAILED
+                print(f"Stage {name} {status[name]} in {timings.get(name, 0):.1f}s")
+    return status
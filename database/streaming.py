@@ -0,0 +1,120 @@
+"""Stream records from a fetch generator into the database in chunks.
+
+The `iter_*_from_api` functions in `database/crud.py` yield records as they
+are fetched. `stream_into_db` runs such a generator on a background thread
+and hands its records to an `insert_*_into_db` function `chunk_size` at a
+time. The next chunk is fetched while the current one is written, and memory
+holds at most a couple of chunks rather than the whole dataset.
+
+The generator reads its own inputs from the database before yielding
+anything, and nothing is written until the first record arrives, so the
+two threads never use the connection at the same time for setup. Each
+chunk is committed by its inserter. An exception in the generator, such as
+`CircuitOpenError`, reaches the caller once the records fetched before it
+have been written.
+"""
+import os
+import queue
+import threading
+
+from .bulk_load import add_counts, empty_counts, format_counts
+from .profiling import attach_thread, thread_stage
+
+DEFAULT_CHUNK_SIZE = 2000
+# chunks fetched ahead of the one being written
+PREFETCH_CHUNKS = 2
+
+_chunk_size = None
+_DONE = object()
+
+
+def set_chunk_size(chunk_size):
+    global _chunk_size
+    if int(chunk_size) < 1:
+        raise ValueError(f"chunk size must be at least 1, got {chunk_size!r}")
+    _chunk_size = int(chunk_size)
+
+
+def get_chunk_size():
+    if _chunk_size is None:
+        set_chunk_size(os.getenv("NHL_STREAM_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+    return _chunk_size
+
+
+def prefetch(records, depth):
+    """Iterate `records` on a background thread, at most `depth` items ahead."""
+    buffer = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    stage = thread_stage()
+
+    def produce():
+        try:
+            with attach_thread(stage):
+                for record in records:
+                    if stop.is_set():
+                        return
+                    buffer.put(record)
+            buffer.put(_DONE)
+        except BaseException as e:
+            buffer.put(e)
+        finally:
+            close = getattr(records, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # unblock a producer stuck on a full queue, then let it wind down
+        stop.set()
+        while producer.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+
+def stream_into_db(conn, records, insert, chunk_size=None, label="records"):
+    """Write the records yielded by `records` with `insert(conn, chunk)`.
+
+    Returns the summed inserted/updated/unchanged counts. If `records`
+    raises, the records it yielded before that are still written, then the
+    exception propagates. Raises if a chunk fails to insert; chunks committed
+    before the failure stay written.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    counts = empty_counts()
+    total = 0
+
+    def write(chunk):
+        nonlocal total
+        result = insert(conn, chunk)
+        if result is None:
+            raise RuntimeError(f"inserting a chunk of {len(chunk)} {label} failed")
+        add_counts(counts, result)
+        total += len(chunk)
+
+    chunk = []
+    try:
+        for record in prefetch(records, chunk_size * PREFETCH_CHUNKS):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                pending, chunk = chunk, []
+                write(pending)
+    except Exception:
+        if chunk:
+            write(chunk)
+        raise
+    if chunk:
+        write(chunk)
+    print(f"Streamed {total} {label} in chunks of {chunk_size}: {format_counts(counts)}")
+    return counts
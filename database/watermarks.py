@@ -0,0 +1,110 @@
+"""Per-entity ingest watermarks for incremental updates.
+
+`ingest_watermarks` (migration 0004) records when each (stage, season,
+entity) was last ingested successfully. With incremental mode on, a stage
+only fetches:
+
+- the current season,
+- entities with no watermark yet, and
+- entities whose watermark is older than `stale_after`.
+
+Everything else is assumed unchanged since it was last loaded. The first
+incremental run therefore behaves like a full one.
+
+A stage builds a `StageWatermarks` from `stage_watermarks(conn, stage)`,
+which returns None when incremental mode is off. It asks `needs()` before
+fetching, calls `mark()` for every entity whose rows it has written (or
+that the API says does not exist), and calls `save()` once those rows are
+committed. A stage that fails records nothing,
+so the next run retries it.
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .bulk_load import upsert_rows
+
+# season_id for entities that span seasons, e.g. a player's landing page
+ALL_SEASONS = 0
+DEFAULT_STALE_AFTER_DAYS = 7
+
+WATERMARK_COLUMNS = ("stage", "season_id", "entity", "ingested_at")
+
+_stale_after = None
+_incremental_configured = False
+_incremental_lock = threading.Lock()
+
+
+def configure_incremental(stale_after_days=DEFAULT_STALE_AFTER_DAYS):
+    """Turn incremental mode on (None turns it off)."""
+    global _stale_after, _incremental_configured
+    with _incremental_lock:
+        _stale_after = timedelta(days=float(stale_after_days)) if stale_after_days is not None else None
+        _incremental_configured = True
+    return _stale_after
+
+
+def get_incremental():
+    """Return the staleness window, or None when every stage should run in full.
+
+    Configured from `NHL_INCREMENTAL_STALE_DAYS` on first use.
+    """
+    if not _incremental_configured:
+        configure_incremental(os.getenv("NHL_INCREMENTAL_STALE_DAYS"))
+    return _stale_after
+
+
+class StageWatermarks:
+    def __init__(self, conn, stage, stale_after):
+        self.stage = stage
+        self.cutoff = datetime.now(timezone.utc) - stale_after
+        with conn.cursor() as cur:
+            cur.execute("SELECT MAX(id) FROM seasons")
+            self.current_season = cur.fetchone()[0]
+            cur.execute(
+                "SELECT season_id, entity, ingested_at FROM ingest_watermarks WHERE stage = %s",
+                (stage,),
+            )
+            self._ingested = {(season_id, entity): ingested_at for season_id, entity, ingested_at in cur.fetchall()}
+        self._marked = set()
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.skipped = 0
+
+    def needs(self, season_id, entity):
+        """True if (season_id, entity) should be fetched on this run."""
+        if season_id == self.current_season:
+            return True
+        ingested_at = self._ingested.get((season_id, str(entity)))
+        if ingested_at is None or ingested_at < self.cutoff:
+            return True
+        self.skipped += 1
+        return False
+
+    def mark(self, season_id, entity):
+        with self._lock:
+            self._marked.add((season_id, str(entity)))
+
+    def save(self, conn):
+        """Record every entity marked since the last save as ingested now; commits."""
+        with self._lock:
+            marked, self._marked = self._marked, set()
+        if marked:
+            now = datetime.now(timezone.utc)
+            with conn.cursor() as cur:
+                upsert_rows(
+                    cur, "ingest_watermarks", WATERMARK_COLUMNS,
+                    [(self.stage, season_id, entity, now) for season_id, entity in sorted(marked)],
+                    conflict_columns=WATERMARK_COLUMNS[:3], update_columns=WATERMARK_COLUMNS[3:],
+                )
+            conn.commit()
+            self.saved += len(marked)
+        print(f"Incremental {self.stage}: {self.saved} fetched, {self.skipped} up to date and skipped.")
+
+
+def stage_watermarks(conn, stage):
+    """A `StageWatermarks` for `stage`, or None when incremental mode is off."""
+    stale_after = get_incremental()
+    if stale_after is None:
+        return None
+    return StageWatermarks(conn, stage, stale_after)
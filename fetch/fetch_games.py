@@ -1,12 +1,14 @@
 from datetime import datetime
-import requests
-import psycopg2
 import sys
 import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.connection import get_connection
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
-conn = get_connection()
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 print("Connected to database!")
 
@@ -28,7 +30,7 @@ def get_team_season_id(cur, team_id, season_id):
     return cur.fetchone()
 
 # fetch game data from a teams schedule to insert data for game scoring, results and player stats
-response = requests.get(url)
+response = get_with_retry(url)
 
 if response.status_code == 200:
     print("connected to game at url ", url)
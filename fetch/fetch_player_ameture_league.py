@@ -1,7 +1,11 @@
-import requests
-import psycopg2
 import os
+import sys
 from dotenv import load_dotenv
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.json_projection import decode_response_fields
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
 load_dotenv()
 
@@ -10,13 +14,9 @@ base_url = os.getenv("NHL_API_URL")
 # go through all players in the players table
 # add all stats but hits to player stats
 
-conn = psycopg2.connect(
-    dbname=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST"),
-    port=os.getenv("DB_PORT")
-)
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 print("Connected to database")
 
@@ -34,13 +34,13 @@ seasons = [row[0] for row in cur.fetchall()]
 
 for player in players:
     url = f"{base_url}/v1/player/{str(player)}/landing"
-    response = requests.get(url)
+    response = get_with_retry(url)
 
     if response.status_code != 200:
         print(f"Failed request for {url}") 
         continue  
     else:
-        data = response.json()
+        data = decode_response_fields(response, ["seasonTotals"])
         season_stats = data.get("seasonTotals", [])
 
         previous_team = "N/A"
@@ -5,21 +5,20 @@
 from dotenv import load_dotenv
 from datetime import datetime
 import os
-import requests
-import psycopg2
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
 load_dotenv()
 
 base_url = os.getenv("NHL_API_URL")
 
 # Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST"),
-    port=os.getenv("DB_PORT")
-)
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 print("Connected to database")
 
@@ -39,7 +38,7 @@ for season_id, abbreviation, team_id in season_team_pairs:
         continue 
 
     url = f"{base_url}/v1/roster/{abbreviation}/{season_id}"
-    response = requests.get(url)
+    response = get_with_retry(url)
 
     if response.status_code != 200:
         print(f"Failed request for {url}") # Some requests should fail, for EX UTA ans SEA
@@ -4,60 +4,14 @@
 from dotenv import load_dotenv
 from datetime import datetime
 import os
-import requests
-import psycopg2
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-load_dotenv()
-
-# functions
-def get_or_create_conference(cur, name, season_id):
-    cur.execute("""
-        SELECT id FROM conferences WHERE name = %s AND season_id = %s
-    """, (name, season_id))
-    result = cur.fetchone()
-    if result:
-        return result[0]
-    cur.execute("""
-        INSERT INTO conferences (name, season_id)
-        VALUES (%s, %s)
-        RETURNING id
-    """, (name, season_id))
-    return cur.fetchone()[0]
-
-def get_or_create_division(cur, name, conference_id, season_id):
-    if conference_id:
-        cur.execute("""
-            SELECT id FROM divisions WHERE name = %s AND conference_id = %s
-        """, (name, conference_id))
-    else:
-        cur.execute("""
-            SELECT id FROM divisions WHERE name = %s AND conference_id IS NULL
-        """, (name,))
-    
-    result = cur.fetchone()
-    if result:
-        return result[0]
-
-    if conference_id:
-        cur.execute("""
-            INSERT INTO divisions (name, conference_id, season_id)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        """, (name, conference_id, season_id))
-    else:
-        cur.execute("""
-            INSERT INTO divisions (name, conference_id, season_id)
-            VALUES (%s, NULL)
-            RETURNING id
-        """, (name,))
-    
-    return cur.fetchone()[0]
-
-def get_team_id(cur, abbreviation):
-    cur.execute("SELECT id FROM teams WHERE abbreviation = %s", (abbreviation,))
-    result = cur.fetchone()
-    return result[0] if result else None
+from database.db_helpers import get_or_create_conference, get_or_create_division, get_team_id
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
+load_dotenv()
 
 # API path
 base_url = os.getenv("NHL_API_URL")
@@ -67,13 +21,9 @@ url = f"{base_url}/{standingsEndpoint}"
 print(url)
 
 # Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname= os.getenv("DB_NAME"),
-    user= os.getenv("DB_USER"),
-    password= os.getenv("DB_PASSWORD"),
-    host= os.getenv("DB_HOST"),
-    port= os.getenv("DB_PORT")
-)
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 
 # Get the seasons table
@@ -99,7 +49,7 @@ for row in rows:
 
 for date, season_id in regular_season_end_dates:
     seasonUrl = f"{url}{date}"
-    response = requests.get(seasonUrl)
+    response = get_with_retry(seasonUrl)
 
     if response.status_code == 200:
         data = response.json()
@@ -1,14 +1,15 @@
 from dotenv import load_dotenv
 from datetime import datetime
 import os
-import requests
-import psycopg2
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.connection import get_connection
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
-conn = get_connection()
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 print("Connected to database!")
 base_url = os.getenv("NHL_API_URL")
@@ -27,7 +28,7 @@ for season in seasons:
     teams = [row[3] for row in rows]
     for team in teams:
         team_url = f"{base_url}/v1/club-stats/{team}/{season}/2"
-        response = requests.get(team_url)
+        response = get_with_retry(team_url)
         if(response.status_code == 200):
             # team existed this year
             print("connected to ", team_url)
@@ -1,13 +1,16 @@
 from datetime import datetime
 from datetime import timedelta
-import requests
-import psycopg2
 import sys
 import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.connection import get_connection
+from database.db_helpers import get_team_season_id_from_team_name
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
-conn = get_connection()
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 print("Connected to database!")
 base_url = os.getenv("NHL_API_URL")
@@ -23,15 +26,6 @@ players = [row[0] for row in cur.fetchall()]
 
 player_count = 0
 
-def get_team_season_id_from_team_name(team_name, season_id):
-    cur.execute("""
-        SELECT ts.id, ts.team_id, ts.season_id, t.name
-        FROM team_seasons ts
-        JOIN teams t ON ts.team_id = t.id
-        WHERE t.name = %s AND ts.season_id = %s
-    """,(team_name, season_id))
-    return cur.fetchall()
-
 def add_player_stats_for_season(player_id, team_season_id, goals, assists, points, plus_minus, average_toi, pim, games_played, season_type):
     if season_type == 2:
         table = "player_stats"
@@ -55,7 +49,7 @@ def add_player_stats_for_season(player_id, team_season_id, goals, assists, point
 
 for player in players:
     url = f"{base_url}/v1/player/{player}/landing"
-    response = requests.get(url)
+    response = get_with_retry(url)
     player_count += 1
 
     if(response.status_code == 200):
@@ -69,7 +63,7 @@ for player in players:
             if season["leagueAbbrev"] == "NHL" and season["season"] >= season_limit and season_type != 1 and position != "G":
                 team_name = season["teamName"]["default"]
                 season_id = season["season"]
-                team_seasons = get_team_season_id_from_team_name(team_name, season_id)
+                team_seasons = get_team_season_id_from_team_name(cur, team_name, season_id)
 
                 goals = season["goals"]
                 assists = season["assists"]
@@ -3,8 +3,11 @@
 
 from dotenv import load_dotenv
 import os
-import requests
-import psycopg2
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.db_utils import get_db_connection
+from database.http_utils import get_with_retry
 
 load_dotenv()
 
@@ -14,17 +17,13 @@ endpoint = "stats/rest/en/team"
 url = f"{base_url}/{endpoint}"
 
 # Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname= os.getenv("DB_NAME"),
-    user= os.getenv("DB_USER"),
-    password= os.getenv("DB_PASSWORD"),
-    host= os.getenv("DB_HOST"),
-    port= os.getenv("DB_PORT")
-)
+conn = get_db_connection()
+if conn is None:
+    sys.exit(1)  # get_db_connection already printed why
 cur = conn.cursor()
 
 # Fetch standings data from NHL API
-response = requests.get(url)
+response = get_with_retry(url)
 teams_data = response.json()["data"]
 
 for team in teams_data:
@@ -0,0 +1,102 @@
+# scripts/bench_bulk_load.py
+#
+# Compares rows/s of the upsert write modes (copy, batch, row, and pipeline
+# on the psycopg3 backend) in database/bulk_load.py against a temporary
+# table shaped like player_stats. Each mode loads the rows once into an
+# empty table (inserts) and once more over them (updates); nothing is left
+# behind in the database.
+#
+#   python -m scripts.bench_bulk_load --rows 50000
+#   python -m scripts.bench_bulk_load --rows 50000 --db-backend psycopg3
+
+import argparse
+import random
+import time
+
+from database.bulk_load import PIPELINE, WRITE_MODES, upsert_rows
+from database.crud import PLAYER_STATS_COLUMNS
+from database.db_utils import DB_BACKENDS, get_db_connection, is_psycopg3, set_db_backend
+
+BENCH_TABLE = "bench_player_stats"
+
+
+def synthetic_rows(count, rng):
+    return [
+        (
+            8470000 + i // 4, i % 4 + 1,
+            rng.randint(0, 50), rng.randint(0, 60), rng.randint(0, 110),
+            rng.randint(-30, 30), f"{rng.randint(5, 25)}:{rng.randint(0, 59):02d}",
+            rng.randint(0, 120), rng.randint(1, 82),
+        )
+        for i in range(count)
+    ]
+
+
+def create_bench_table(cur):
+    cur.execute(f"""
+        CREATE TEMP TABLE {BENCH_TABLE} (
+            player_id integer NOT NULL,
+            team_season_id integer NOT NULL,
+            goals integer, assists integer, points integer, plus_minus integer,
+            average_toi text, pim integer, games_played integer,
+            UNIQUE (player_id, team_season_id)
+        )
+    """)
+
+
+def timed_upsert(conn, rows, mode):
+    cur = conn.cursor()
+    started = time.perf_counter()
+    upsert_rows(
+        cur, BENCH_TABLE, PLAYER_STATS_COLUMNS, rows,
+        conflict_columns=("player_id", "team_season_id"), update_columns=PLAYER_STATS_COLUMNS[2:],
+        mode=mode,
+    )
+    conn.commit()
+    cur.close()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bulk upsert write modes.")
+    parser.add_argument("--rows", type=int, default=20000, help="synthetic player_stats rows per load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-backend", choices=DB_BACKENDS, default=None,
+                        help="database driver; psycopg3 adds the pipeline mode")
+    args = parser.parse_args(argv)
+    if args.db_backend:
+        set_db_backend(args.db_backend)
+
+    conn = get_db_connection()
+    if conn is None:
+        return
+
+    rows = synthetic_rows(args.rows, random.Random(args.seed))
+    results = {}
+    try:
+        cur = conn.cursor()
+        create_bench_table(cur)
+        conn.commit()
+        for mode in WRITE_MODES:
+            if mode == PIPELINE and not is_psycopg3(conn):
+                continue
+            cur.execute(f"TRUNCATE {BENCH_TABLE}")
+            conn.commit()
+            insert = timed_upsert(conn, rows, mode)
+            update = timed_upsert(conn, rows, mode)
+            results[mode] = (insert, update)
+        cur.close()
+    finally:
+        conn.close()
+
+    print(f"\n{len(rows)} rows per load")
+    for mode, (insert, update) in results.items():
+        print(f"{mode:>5}: insert {len(rows) / insert:10,.0f} rows/s, update {len(rows) / update:10,.0f} rows/s")
+    row_total = sum(results["row"])
+    for mode, timings in results.items():
+        if mode != "row":
+            print(f"{mode} is {row_total / sum(timings):.1f}x the row-at-a-time path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# scripts/bench_landing_decode.py
+#
+# Compares full `json.loads` against the projection decoder for player
+# landing payloads: CPU time and peak Python memory per player.
+#
+#   python -m scripts.bench_landing_decode --players 5000
+#   python -m scripts.bench_landing_decode --cassette runs/full.jsonl.gz
+
+import argparse
+import gzip
+import json
+import random
+import time
+import tracemalloc
+
+from database.crud import LANDING_FIELDS
+from database.json_projection import decode_fields
+
+
+def synthetic_landing(player_id, rng):
+    """A document shaped like /v1/player/{id}/landing, with realistic bulk."""
+    def name(text):
+        return {"default": text, "cs": text, "fi": text, "sk": text}
+
+    def season_row(season, league):
+        return {
+            "season": season, "gameTypeId": rng.choice([2, 2, 3]), "leagueAbbrev": league,
+            "teamName": name("Toronto Maple Leafs"), "sequence": 1,
+            "gamesPlayed": rng.randint(1, 82), "goals": rng.randint(0, 50),
+            "assists": rng.randint(0, 60), "points": rng.randint(0, 110),
+            "plusMinus": rng.randint(-30, 30), "pim": rng.randint(0, 120),
+            "avgToi": f"{rng.randint(5, 25)}:{rng.randint(0, 59):02d}",
+            "powerPlayGoals": rng.randint(0, 15), "shots": rng.randint(0, 300),
+            "shootingPctg": rng.random(), "faceoffWinningPctg": rng.random(),
+        }
+
+    def game_row():
+        return {
+            "gameId": rng.randint(2010020001, 2024021312), "gameDate": "2024-04-01",
+            "opponentAbbrev": "MTL", "homeRoadFlag": "H", "goals": rng.randint(0, 3),
+            "assists": rng.randint(0, 3), "points": rng.randint(0, 4), "plusMinus": 0,
+            "shots": rng.randint(0, 8), "pim": 0, "shifts": rng.randint(10, 30), "toi": "18:32",
+            "opponentCommonName": name("Canadiens"),
+        }
+
+    stat_block = {"gamesPlayed": 82, "goals": 40, "assists": 45, "points": 85, "plusMinus": 10, "pim": 20}
+    return {
+        "playerId": player_id, "isActive": True, "currentTeamId": 10, "currentTeamAbbrev": "TOR",
+        "fullTeamName": name("Toronto Maple Leafs"), "firstName": name("Auston"), "lastName": name("Matthews"),
+        "teamLogo": "https://assets.nhle.com/logos/nhl/svg/TOR_light.svg", "sweaterNumber": 34,
+        "position": rng.choice(["C", "L", "R", "D", "G"]),
+        "headshot": f"https://assets.nhle.com/mugs/nhl/20232024/TOR/{player_id}.png",
+        "heroImage": "https://assets.nhle.com/mugs/actionshots/1296x729/8479318.jpg",
+        "heightInInches": 75, "weightInPounds": 208, "birthDate": "1997-09-17",
+        "birthCity": name("San Ramon"), "birthStateProvince": name("California"), "birthCountry": "USA",
+        "shootsCatches": "L", "draftDetails": {"year": 2016, "teamAbbrev": "TOR", "round": 1, "pickInRound": 1},
+        "playerSlug": f"auston-matthews-{player_id}", "inTop100AllTime": 0, "inHHOF": 0,
+        "featuredStats": {"season": 20232024, "regularSeason": {"subSeason": stat_block, "career": stat_block}},
+        "careerTotals": {"regularSeason": stat_block, "playoffs": stat_block},
+        "shopLink": "https://shop.nhl.com/toronto-maple-leafs/auston-matthews",
+        "twitterLink": "https://twitter.com/search?q=%23mapleleafs", "watchLink": "https://www.nhl.com/video/",
+        "last5Games": [game_row() for _ in range(5)],
+        "seasonTotals": [
+            season_row(year * 10000 + year + 1, rng.choice(["NHL", "NHL", "AHL", "USHL", "WJC-A"]))
+            for year in range(2005, 2025)
+            for _ in range(rng.randint(1, 2))
+        ],
+        "awards": [
+            {"trophy": name("Maurice Richard Trophy"), "seasons": [{"seasonId": 20202021, **stat_block}] * 3}
+            for _ in range(rng.randint(0, 4))
+        ],
+        "currentTeamRoster": [
+            {"playerId": 8470000 + i, "lastName": name("Player"), "firstName": name("Some"),
+             "playerSlug": f"some-player-{i}", "headshot": "https://assets.nhle.com/mugs/nhl/x.png"}
+            for i in range(rng.randint(20, 30))
+        ],
+    }
+
+
+def load_landings(args):
+    if args.cassette:
+        bodies = []
+        with gzip.open(args.cassette, "rt", encoding="utf-8") as f:
+            for line in f:
+                interaction = json.loads(line)
+                if interaction["url"].endswith("/landing") and interaction.get("status") == 200 \
+                        and not interaction.get("b64"):
+                    bodies.append(interaction["body"])
+        return bodies
+    rng = random.Random(args.seed)
+    return [json.dumps(synthetic_landing(8470000 + i, rng)) for i in range(args.players)]
+
+
+def full_decode(body):
+    data = json.loads(body)
+    return {field: data[field] for field in LANDING_FIELDS if field in data}
+
+
+def projection_decode(body):
+    return decode_fields(body, LANDING_FIELDS)
+
+
+def measure_cpu(decode, bodies, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        for body in bodies:
+            decode(body)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_peak(decode, bodies):
+    """Mean and max of the per-document peak allocation while decoding."""
+    peaks = []
+    tracemalloc.start()
+    for body in bodies:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = decode(body)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        del result
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks), max(peaks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark player landing decoding.")
+    parser.add_argument("--players", type=int, default=5000, help="synthetic landings to generate")
+    parser.add_argument("--cassette", default=None, help="use landing bodies from a recorded cassette")
+    parser.add_argument("--repeat", type=int, default=3, help="CPU timing repetitions (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = load_landings(args)
+    if not bodies:
+        print("No landing payloads to benchmark.")
+        return
+    for body in bodies:
+        assert projection_decode(body) == full_decode(body)
+
+    size = sum(len(body) for body in bodies) / len(bodies)
+    print(f"{len(bodies)} landing payloads, mean {size / 1024:.1f} KiB, fields {list(LANDING_FIELDS)}")
+
+    results = {}
+    for label, decode in (("json.loads", full_decode), ("projection", projection_decode)):
+        cpu = measure_cpu(decode, bodies, args.repeat)
+        mean_peak, max_peak = measure_peak(decode, bodies)
+        results[label] = (cpu, mean_peak)
+        print(f"{label:>11}: {cpu / len(bodies) * 1e6:8.1f} us/player CPU, "
+              f"peak {mean_peak / 1024:7.1f} KiB/player (max {max_peak / 1024:.1f} KiB)")
+
+    (full_cpu, full_peak), (proj_cpu, proj_peak) = results["json.loads"], results["projection"]
+    print(f"saved per player: {(full_cpu - proj_cpu) / len(bodies) * 1e6:.1f} us CPU "
+          f"({(1 - proj_cpu / full_cpu) * 100:.0f}%), "
+          f"{(full_peak - proj_peak) / 1024:.1f} KiB peak ({(1 - proj_peak / full_peak) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# scripts/migrate.py
+#
+# Applies pending schema migrations from database/migrations/ and checks
+# that every hot query is served by an index.
+#
+#   python -m scripts.migrate                 # apply pending migrations
+#   python -m scripts.migrate --status
+#   python -m scripts.migrate --check-plans   # exit 1 if a hot query seq-scans
+
+import argparse
+import sys
+
+from database.db_utils import get_db_connection
+from database.migrate import check_query_plans, migrate, migration_status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations and check query plans.")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="after migrating, EXPLAIN the hot queries and fail on sequential scans")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    if conn is None:
+        return 1
+    try:
+        if args.status:
+            migration_status(conn)
+            return 0
+        migrate(conn)
+        if args.check_plans and check_query_plans(conn):
+            return 1
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+# scripts/reparse.py
+#
+# Rebuilds stage output from the raw payload archive instead of the API:
+# every request made by the update stages is answered from the archive
+# (see database/archive.py), so parsing fixes can be applied to the whole
+# history at disk speed.
+#
+#   python -m scripts.reparse player_stats --archive archive/
+#   python -m scripts.reparse --archive archive/ --as-of 2025-01-31
+
+import argparse
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from database.archive import configure_archive
+from scripts.update_data import run_update_sequence
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run update stages from archived API payloads.")
+    parser.add_argument("target", nargs="?", type=str.lower,
+                        help="stage to rebuild (default: full update sequence)")
+    parser.add_argument("--archive", metavar="DIR", default=None,
+                        help="archive directory (default: $NHL_ARCHIVE_DIR)")
+    parser.add_argument("--as-of", default=None, metavar="ISO_DATETIME",
+                        help="use payloads fetched at or before this time (default: latest)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_dotenv()
+    archive_dir = args.archive or os.getenv("NHL_ARCHIVE_DIR")
+    if not archive_dir:
+        raise SystemExit("No archive directory given (use --archive or set NHL_ARCHIVE_DIR).")
+    as_of = datetime.fromisoformat(args.as_of).timestamp() if args.as_of else None
+    configure_archive(archive_dir, offline=True, as_of=as_of)
+    run_update_sequence(args.target)
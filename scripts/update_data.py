@@ -1,25 +1,45 @@
 # scripts/update_data.py (CORRECTED)
 
 from dotenv import load_dotenv
+import argparse
 import os
-import sys
+import time
+from functools import partial
 
 # Import helper functions
-from database.db_utils import get_db_connection
+from database.db_utils import DB_BACKENDS, close_db_pool, get_db_pool, set_db_backend
+from database.roster_store import RosterStore
+from database import metrics
+from database.profiling import DEFAULT_PROFILE_DIR, configure_profiling, stage_profile, write_summary
+from database.http_utils import (
+    DEFAULT_POOL_MAXSIZE,
+    configure_http_cache,
+    configure_http_client,
+    connection_stats,
+)
+from database.archive import configure_archive
+from database.prepared import report_prepared, set_prepare_enabled
+from database.scheduler import DEFAULT_WORKERS, OK, run_stages, select_stages
+from database.bulk_load import DEFAULT_PAGE_SIZE, WRITE_MODES, check_write_mode, set_page_size, set_write_mode
+from database.cassette import RECORD, REPLAY, configure_cassette, parse_latency
+from database.rate_limit import DEFAULT_RATE, configure_rate_limiter
+from database.checkpoints import DEFAULT_CHECKPOINT_EVERY, set_checkpoint_every
+from database.circuit_breaker import CircuitOpenError
+from database.streaming import DEFAULT_CHUNK_SIZE, set_chunk_size, stream_into_db
+from database.player_stats_runner import ingest_player_stats, run_sharded_player_stats
+from database.watermarks import DEFAULT_STALE_AFTER_DAYS, configure_incremental, stage_watermarks
 from database.crud import (
     get_seasons_from_api, 
     insert_seasons_into_db,
     get_teams_from_api, 
     insert_teams_into_db,
-    get_team_seasons_from_api,
+    iter_team_seasons_from_api,
     insert_team_seasons_into_db,
-    get_players_from_api,
+    iter_players_from_api,
     insert_players_into_db,
     insert_rosters_into_db,
-    get_standings_from_api,
-    insert_standings_into_db,
-    get_player_stats_from_api,
-    insert_player_stats_into_db
+    iter_standings_from_api,
+    insert_standings_into_db
 )
 
 def update_seasons(conn, base_url):
@@ -28,8 +48,8 @@ def update_seasons(conn, base_url):
         print("\n--- Starting Seasons Update ---")
         seasons_data = get_seasons_from_api(base_url)
         print(f"API fetched {len(seasons_data)} eligible season records.")
-        insert_seasons_into_db(conn, seasons_data)
-        return True
+        result = insert_seasons_into_db(conn, seasons_data)
+        return insert_succeeded(seasons_data, result)
     except Exception as e:
         print(f"❌ Error updating seasons: {e}")
         # Note: Rollback is handled inside insert_seasons_into_db
@@ -41,59 +61,117 @@ def update_teams(conn, base_url):
         print("\n--- Starting Teams Update ---")
         teams_data = get_teams_from_api(base_url)
         print(f"API fetched {len(teams_data)} team records.")
-        insert_teams_into_db(conn, teams_data)
-        return True
+        result = insert_teams_into_db(conn, teams_data)
+        return insert_succeeded(teams_data, result)
     except Exception as e:
         print(f"❌ Error updating teams: {e}")
         # Note: Rollback is handled inside insert_teams_into_db
         return False
     
-def update_team_seasons(conn, base_url):
+def insert_succeeded(data, result):
+    """Whether an `insert_*_into_db` call wrote `data`.
+
+    Inserters return None on failure, and also when there was nothing to write.
+    """
+    return not data or result is not None
+
+def save_watermarks(conn, watermarks, data, result):
+    """Record a stage's watermarks once its rows are in (or there were none)."""
+    if watermarks is not None and insert_succeeded(data, result):
+        watermarks.save(conn)
+
+def fetch_until_circuit_opens(records):
+    """Return `(records, error)`: what an `iter_*_from_api` generator yielded
+    and the `CircuitOpenError` that cut it short, or None if it finished.
+    """
+    data = []
+    try:
+        data.extend(records)
+    except CircuitOpenError as e:
+        return data, e
+    return data, None
+
+def update_team_seasons(conn, base_url, rosters=None):
     """Inserts team seasons based on existing teams and seasons in the database."""
     try:
         print("\n--- Starting Team Season Update ---")
-        team_seasons_data = get_team_seasons_from_api(conn, base_url)
+        watermarks = stage_watermarks(conn, "team_seasons")
+        team_seasons_data, stopped = fetch_until_circuit_opens(
+            iter_team_seasons_from_api(conn, base_url, rosters=rosters, watermarks=watermarks)
+        )
+        if stopped is not None:
+            print(f"Stopping team-season fetch early: {stopped}")
         print(f"Processing {len(team_seasons_data)} team-season records.")
-        insert_team_seasons_into_db(conn, team_seasons_data)
-        return True
+        result = insert_team_seasons_into_db(conn, team_seasons_data)
+        save_watermarks(conn, watermarks, team_seasons_data, result)
+        if stopped is not None:
+            print("Team seasons stage stopped early; its dependents will be skipped.")
+            return False
+        return insert_succeeded(team_seasons_data, result)
     except Exception as e:
         print(f"❌ Error updating team seasons: {e}")
         return False
 
-def update_players(conn, base_url):
-    """Fetches and processes player data from the API."""
+def update_players(conn, base_url, concurrency=None, rosters=None):
+    """Fetches player data from the API and streams it into the database."""
     try:
         print("\n--- Starting Players Update ---")
-        players_data = get_players_from_api(conn, base_url)
-        print(f"API fetched {len(players_data)} eligible player records.")
-        insert_players_into_db(conn, players_data)
+        watermarks = stage_watermarks(conn, "players")
+        players = iter_players_from_api(
+            conn, base_url, concurrency=concurrency, rosters=rosters, watermarks=watermarks
+        )
+        try:
+            stream_into_db(conn, players, insert_players_into_db, label="player records")
+        except CircuitOpenError as e:
+            # keep the progress made so far, but don't let dependents run on a partial load
+            print(f"Stopping player fetch early: {e}")
+            if watermarks is not None:
+                watermarks.save(conn)
+            print("Players stage stopped early; its dependents will be skipped.")
+            return False
+        if watermarks is not None:
+            watermarks.save(conn)
         return True
     except Exception as e:
         print(f"❌ Error updating players: {e}")
         return False
 
-def update_rosters(conn, base_url):
-    """Fetches and processes roster data from the API."""
+def _roster_entries(players_with_rosters):
+    """Roster-specific fields expected by insert_rosters_into_db."""
+    for p in players_with_rosters:
+        # Only include entries that have team_season_id and player_id
+        if p.get("team_season_id") and p.get("player_id"):
+            yield {
+                "team_season_id": p.get("team_season_id"),
+                "player_id": p.get("player_id"),
+                "jersey_number": p.get("jersey_number"),
+                "position": p.get("position"),
+                "player_height_inches": p.get("player_height_inches"),
+                "player_weight_pounds": p.get("player_weight_pounds"),
+            }
+
+def update_rosters(conn, base_url, concurrency=None, rosters=None):
+    """Fetches roster data from the API and streams it into the database."""
     try:
         print("\n--- Starting Rosters Update ---")
-        # Reuse consolidated get_players_from_api with roster info included
-        players_with_rosters = get_players_from_api(conn, base_url, include_roster_info=True)
-        # Extract roster-specific fields expected by insert_rosters_into_db
-        rosters_data = []
-        for p in players_with_rosters:
-            # Only include entries that have team_season_id and player_id
-            if p.get("team_season_id") and p.get("player_id"):
-                rosters_data.append({
-                    "team_season_id": p.get("team_season_id"),
-                    "player_id": p.get("player_id"),
-                    "jersey_number": p.get("jersey_number"),
-                    "position": p.get("position"),
-                    "player_height_inches": p.get("player_height_inches"),
-                    "player_weight_pounds": p.get("player_weight_pounds"),
-                })
-
-        print(f"API fetched {len(rosters_data)} eligible roster records.")
-        insert_rosters_into_db(conn, rosters_data)
+        # Reuse consolidated iter_players_from_api with roster info included
+        watermarks = stage_watermarks(conn, "rosters")
+        players_with_rosters = iter_players_from_api(
+            conn, base_url, include_roster_info=True, concurrency=concurrency, rosters=rosters,
+            watermarks=watermarks,
+        )
+        try:
+            stream_into_db(conn, _roster_entries(players_with_rosters), insert_rosters_into_db,
+                           label="roster records")
+        except CircuitOpenError as e:
+            # keep the progress made so far, but don't let dependents run on a partial load
+            print(f"Stopping roster fetch early: {e}")
+            if watermarks is not None:
+                watermarks.save(conn)
+            print("Rosters stage stopped early; its dependents will be skipped.")
+            return False
+        if watermarks is not None:
+            watermarks.save(conn)
         return True
     except Exception as e:
         print(f"❌ Error updating rosters: {e}")
@@ -102,83 +180,273 @@ def update_rosters(conn, base_url):
 def update_standings(conn, base_url):
     """Fetches and processes standing data from the API."""
     try:
-        standings_data = get_standings_from_api(conn, base_url)
+        watermarks = stage_watermarks(conn, "standings")
+        standings_data, stopped = fetch_until_circuit_opens(
+            iter_standings_from_api(conn, base_url, watermarks=watermarks)
+        )
+        if stopped is not None:
+            print(f"Stopping standings fetch early: {stopped}")
         print(f"API fetched {len(standings_data)} eligible standing records.")
-        insert_standings_into_db(conn, standings_data)
-        return True
+        result = insert_standings_into_db(conn, standings_data)
+        save_watermarks(conn, watermarks, standings_data, result)
+        if stopped is not None:
+            print("Standings stage stopped early.")
+            return False
+        return insert_succeeded(standings_data, result)
     except Exception as e:
         print(f"❌ Error updating standings: {e}")
         return False
     
-def update_player_stats(conn, base_url):
-    """Fetches and processes player stats data from the API."""
+def update_player_stats(conn, base_url, resume=False, workers=1, worker_init=None):
+    """Fetches player stats from the API and streams them into the database.
+
+    Stats are committed in checkpointed chunks; `resume` continues after the
+    last checkpoint of an unfinished run. With `workers` above 1 the player
+    ids are sharded across that many processes, each set up by `worker_init`.
+    """
     try:
-        player_stats_data = get_player_stats_from_api(conn, base_url)
-        print(f"API fetched stats for {len(player_stats_data)} players.")
-        insert_player_stats_into_db(conn, player_stats_data)
-        return True
+        if workers > 1:
+            return run_sharded_player_stats(conn, base_url, workers, resume=resume, initializer=worker_init)
+        finished, _, _ = ingest_player_stats(conn, base_url, resume=resume)
+        return finished
     except Exception as e:
         print(f"❌ Error updating player stats: {e}")
         return False
 
-def run_update_sequence(target=None):
+# Each stage and the stages whose rows it reads. Seasons and teams are
+# independent; players and rosters share the team_seasons roster payloads.
+STAGE_DEPENDENCIES = {
+    'seasons': (),
+    'teams': (),
+    'team_seasons': ('seasons', 'teams'),
+    'players': ('team_seasons',),
+    'rosters': ('team_seasons', 'players'),
+    'standings': ('team_seasons',),
+    'player_stats': ('team_seasons', 'players'),
+}
+
+# the full update sequence; standings only runs when targeted
+DEFAULT_STAGES = ('seasons', 'teams', 'team_seasons', 'players', 'rosters', 'player_stats')
+
+
+def run_update_sequence(target=None, concurrency=None, with_deps=False, workers=DEFAULT_WORKERS, resume=False,
+                        stats_workers=1, worker_init=None):
     """
-    Manages connection/cleanup and runs selected data updates.
-    ... (rest of the docstring) ...
+    Manages connections/cleanup and runs selected data updates.
+
+    Without a `target` the full sequence runs. With one, only that stage runs,
+    or that stage and everything it depends on when `with_deps` is set.
+    Stages run as a DAG (`STAGE_DEPENDENCIES`) with up to `workers` at once,
+    each on its own pooled connection and commit boundary. A failed stage
+    skips its dependents.
+
+    With incremental mode on (`--incremental`), every stage after seasons
+    and teams only fetches what its watermarks say is missing or stale.
+    `resume` makes player_stats continue from its last checkpoint, and
+    `stats_workers` shards it across that many processes (each set up by
+    calling `worker_init`).
+
+    Stage timings, HTTP and DB metrics are written to the Prometheus
+    textfile configured with `--metrics-file` at the end of every run.
+    With `--profile`, each stage also gets pstats and collapsed-stack files
+    and the run ends with a summary of where the time went.
+
+    `concurrency` enables the concurrent roster fetcher for the players and
+    rosters stages with that many requests in flight. All roster-based stages
+    share one `RosterStore`, so each roster is requested once per run.
     """
     
     print(f"Starting update process. Target: {target if target else 'ALL'}")
+    run_started = time.perf_counter()
     load_dotenv()
     base_url = os.getenv("NHL_API_URL_2")
     base_url_2 = os.getenv("NHL_API_URL")
-    
-    conn = get_db_connection()
-    if conn is None:
+
+    try:
+        stages = select_stages(STAGE_DEPENDENCIES, [target], with_deps) if target else list(DEFAULT_STAGES)
+    except KeyError:
+        print(f"🛑 Error: Unknown update target '{target}'. Must be one of: {list(STAGE_DEPENDENCIES)} or left blank.")
         return
+    if not target:
+        print("No specific target provided. Running full update sequence.")
+    if resume and 'player_stats' not in stages:
+        print("--resume only applies to the player_stats stage; ignoring it.")
+    print(f"Stages: {', '.join(stages)} (up to {workers} at a time)")
 
-    # A mapping of possible command arguments to their respective functions
-    # These names are now defined above.
-    update_map = {
-        'seasons': update_seasons,
-        'teams': update_teams,
-        'team_seasons': update_team_seasons,
-        'players': update_players,
-        'rosters': update_rosters,
-        'standings': update_standings,
-        'player_stats': update_player_stats
+    try:
+        db_pool = get_db_pool()
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        return
+
+    rosters = RosterStore(base_url_2)
+    stage_calls = {
+        'seasons': lambda conn: update_seasons(conn, base_url),
+        'teams': lambda conn: update_teams(conn, base_url),
+        'team_seasons': lambda conn: update_team_seasons(conn, base_url_2, rosters=rosters),
+        'players': lambda conn: update_players(conn, base_url_2, concurrency=concurrency, rosters=rosters),
+        'rosters': lambda conn: update_rosters(conn, base_url_2, concurrency=concurrency, rosters=rosters),
+        'standings': lambda conn: update_standings(conn, base_url_2),
+        'player_stats': lambda conn: update_player_stats(
+            conn, base_url_2, resume=resume, workers=stats_workers, worker_init=worker_init
+        ),
     }
-    
+
+    def run_stage(name):
+        started = time.perf_counter()
+        try:
+            with metrics.stage_context(name), stage_profile(name), db_pool.connection() as conn:
+                return stage_calls[name](conn)
+        finally:
+            metrics.STAGE_DURATION.set(time.perf_counter() - started, stage=name)
 
     try:
-        if target and target in update_map:
-            # Run only the specified function
-            update_map[target](conn, base_url_2)
-        elif target is None:
-            # Run ALL functions sequentially (default behavior)
-            print("No specific target provided. Running full update sequence.")
-            update_seasons(conn, base_url)
-            update_teams(conn, base_url)
-            update_team_seasons(conn, base_url_2)
-            update_players(conn, base_url_2)
-            update_rosters(conn, base_url_2)
-            update_player_stats(conn, base_url_2)
-        else:
-            print(f"🛑 Error: Unknown update target '{target}'. Must be one of: {list(update_map.keys())} or left blank.")
+        status = run_stages(STAGE_DEPENDENCIES, stages, run_stage, max_workers=workers)
+        print("Stage results: " + ", ".join(f"{name}={status.get(name)}" for name in stages))
+        for name in stages:
+            metrics.STAGE_SUCCESS.set(1 if status.get(name) == OK else 0, stage=name)
 
     except Exception as e:
         print(f"\n❌ A critical, unexpected error occurred: {e}")
-        if conn:
-            conn.rollback()
 
     finally:
-        if conn:
-            conn.close()
-            print("\n✅ Database connection closed. Update process finished.")
+        rosters.close()
+        stats = connection_stats()
+        print(f"HTTP: {stats['requests']} requests over {stats['connections']} connections "
+              f"({stats['handshakes_saved']} handshakes saved by keep-alive).")
+        report_prepared()
+        close_db_pool()
+        if db_pool.reconnects:
+            print(f"Database: replaced {db_pool.reconnects} dead connection(s) during the run.")
+        metrics.RUN_DURATION.set(time.perf_counter() - run_started)
+        metrics.RUN_TIMESTAMP.set(time.time())
+        try:
+            metrics.write_textfile()
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+        write_summary()
+        print("\n✅ Database connections closed. Update process finished.")
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch NHL data and update the database.")
+    parser.add_argument("target", nargs="?", type=str.lower,
+                        help="run a single stage (default: full update sequence)")
+    parser.add_argument("--with-deps", action="store_true",
+                        help="also run every stage the target depends on (e.g. 'standings --with-deps')")
+    parser.add_argument("--workers", type=positive_int, default=DEFAULT_WORKERS,
+                        help=f"stages run in parallel when their dependencies allow (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="max in-flight roster requests for the players/rosters stages")
+    parser.add_argument("--http-cache", metavar="PATH", default=None,
+                        help="on-disk HTTP response cache (default: $NHL_HTTP_CACHE, off if unset)")
+    parser.add_argument("--rate-limit-db", metavar="PATH", default=None,
+                        help="SQLite file holding the token buckets shared by all ingestion processes")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE, metavar="RPS",
+                        help=f"requests per second per host across all processes (default: {DEFAULT_RATE})")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help=f"keep-alive connections per API host (default: {DEFAULT_POOL_MAXSIZE}, "
+                             "or --concurrency if larger)")
+    parser.add_argument("--http2", action="store_true",
+                        help="multiplex requests over HTTP/2 (requires httpx[http2])")
+    parser.add_argument("--archive", metavar="DIR", default=None,
+                        help="keep every raw API payload in a compressed archive (default: $NHL_ARCHIVE_DIR)")
+    parser.add_argument("--write-mode", choices=WRITE_MODES, default=None,
+                        help="how rows are upserted: COPY into a staging table, multi-row INSERTs, "
+                             "one INSERT per row, or pipelined row INSERTs (psycopg3 backend only) "
+                             "(default: $NHL_DB_WRITE_MODE or copy)")
+    parser.add_argument("--db-backend", choices=DB_BACKENDS, default=None,
+                        help="database driver (default: $NHL_DB_BACKEND or psycopg2); "
+                             "psycopg3 enables --write-mode pipeline")
+    parser.add_argument("--page-size", type=positive_int, default=None,
+                        help=f"rows per statement in batch write mode (default: $NHL_DB_PAGE_SIZE or {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--no-prepare", action="store_true",
+                        help="send per-row SQL as plain statements instead of server-side prepared ones")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch the current season and entities whose ingest watermark is missing or stale")
+    parser.add_argument("--stale-after", type=float, default=DEFAULT_STALE_AFTER_DAYS, metavar="DAYS",
+                        help=f"with --incremental, refetch entities ingested more than DAYS ago "
+                             f"(default: {DEFAULT_STALE_AFTER_DAYS})")
+    parser.add_argument("--chunk-size", type=positive_int, default=None, metavar="N",
+                        help=f"records written per commit while streaming players, rosters and player stats "
+                             f"(default: $NHL_STREAM_CHUNK_SIZE or {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--metrics-file", metavar="PATH", default=None,
+                        help="write run metrics to this Prometheus textfile, e.g. in node_exporter's "
+                             "textfile directory (default: $NHL_METRICS_TEXTFILE)")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_PROFILE_DIR, default=None, metavar="DIR",
+                        help=f"profile each stage into DIR (default: {DEFAULT_PROFILE_DIR}): <stage>.pstats, "
+                             "<stage>.collapsed flamegraph stacks and a summary.txt of the top functions")
+    parser.add_argument("--stats-workers", type=positive_int, default=1, metavar="N",
+                        help="shard player_stats across N processes, each with its own HTTP client "
+                             "and database connection (default: 1, in process)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue player_stats after the last checkpoint of an unfinished run")
+    parser.add_argument("--checkpoint-every", type=positive_int, default=None, metavar="N",
+                        help=f"commit player_stats and checkpoint every N players "
+                             f"(default: $NHL_CHECKPOINT_EVERY or {DEFAULT_CHECKPOINT_EVERY})")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--record", metavar="PATH", default=None,
+                          help="record every API response to a cassette file")
+    cassette.add_argument("--replay", metavar="PATH", default=None,
+                          help="serve API responses from a recorded cassette (no network)")
+    parser.add_argument("--replay-latency", default=None, metavar="MS|recorded",
+                        help="simulated latency per replayed response, in ms or 'recorded'")
+    return parser.parse_args(argv)
+
+def apply_args(args):
+    """Apply the parsed command-line settings to this process.
+
+    Also runs at the start of every --stats-workers process, which does not
+    inherit the parent's configuration.
+    """
+    if args.pool_size or args.concurrency or args.http2:
+        pool_size = args.pool_size or max(DEFAULT_POOL_MAXSIZE, args.concurrency or 0)
+        configure_http_client(pool_maxsize=pool_size, http2=args.http2)
+    if args.http_cache:
+        configure_http_cache(args.http_cache)
+    if args.rate_limit_db:
+        configure_rate_limiter(args.rate_limit_db, rate=args.rate_limit)
+    if args.archive:
+        configure_archive(args.archive)
+    if args.db_backend:
+        set_db_backend(args.db_backend)
+    if args.write_mode:
+        set_write_mode(args.write_mode)
+    check_write_mode()
+    if args.page_size:
+        set_page_size(args.page_size)
+    if args.no_prepare:
+        set_prepare_enabled(False)
+    if args.profile:
+        configure_profiling(args.profile)
+    if args.metrics_file:
+        metrics.configure_metrics(args.metrics_file)
+    if args.chunk_size:
+        set_chunk_size(args.chunk_size)
+    if args.checkpoint_every:
+        set_checkpoint_every(args.checkpoint_every)
+    if args.incremental:
+        configure_incremental(args.stale_after)
+    if args.record:
+        configure_cassette(args.record, RECORD)
+    elif args.replay:
+        configure_cassette(args.replay, REPLAY, latency=parse_latency(args.replay_latency))
 
 # --- ENTRY POINT ---
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        target_name = sys.argv[1].lower()
-        run_update_sequence(target_name)
-    else:
-        run_update_sequence()
\ No newline at end of file
+    args = parse_args()
+    try:
+        apply_args(args)
+    except ValueError as e:
+        # settings that conflict are rejected before any stage runs
+        raise SystemExit(f"🛑 Error: {e}")
+    run_update_sequence(
+        args.target, concurrency=args.concurrency, with_deps=args.with_deps, workers=args.workers,
+        resume=args.resume, stats_workers=args.stats_workers, worker_init=partial(apply_args, args),
+    )
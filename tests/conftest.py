@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import `database.*` the same way the scripts do, from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
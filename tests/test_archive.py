@@ -0,0 +1,73 @@
+import os
+
+import pytest
+import requests
+
+from database import archive, crud
+from database.archive import ArchiveMiss, ResponseArchive
+from database.circuit_breaker import CircuitOpenError
+
+URL = "https://api.example.com/v1/player/8478402/landing"
+
+
+def response(body, status=200):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers["Content-Type"] = "application/json"
+    resp._content = body
+    return resp
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(archive.time, "time", lambda: now[0])
+    return now
+
+
+def objects(root):
+    return [name for _, _, names in os.walk(os.path.join(root, "objects")) for name in names]
+
+
+def test_put_then_replay_round_trips(tmp_path, clock):
+    store = ResponseArchive(str(tmp_path))
+    store.put(URL, response(b'{"position": "C"}'))
+    replayed = ResponseArchive(str(tmp_path), offline=True).replay(URL)
+    assert replayed.status_code == 200
+    assert replayed.content == b'{"position": "C"}'
+    assert replayed.headers["Content-Type"] == "application/json"
+
+
+def test_identical_bodies_are_stored_once(tmp_path, clock):
+    store = ResponseArchive(str(tmp_path))
+    store.put(URL, response(b"{}"))
+    store.put(URL.replace("8478402", "8471214"), response(b"{}"))
+    assert len(objects(str(tmp_path))) == 1
+
+
+def test_replay_serves_the_latest_payload_as_of(tmp_path, clock):
+    store = ResponseArchive(str(tmp_path))
+    store.put(URL, response(b'{"v": 1}'))
+    clock[0] += 100
+    store.put(URL, response(b'{"v": 2}'))
+    assert ResponseArchive(str(tmp_path), offline=True).replay(URL).content == b'{"v": 2}'
+    assert ResponseArchive(str(tmp_path), offline=True, as_of=1050.0).replay(URL).content == b'{"v": 1}'
+    with pytest.raises(ArchiveMiss):
+        ResponseArchive(str(tmp_path), offline=True, as_of=999.0).replay(URL)
+
+
+def test_missing_landing_page_is_a_failed_fetch(monkeypatch):
+    def get_with_retry(url):
+        raise ArchiveMiss(f"archive has no payload for {url}")
+
+    monkeypatch.setattr(crud, "get_with_retry", get_with_retry)
+    assert crud._player_stats_from_landing("https://api.example.com", 8478402, 20202021, None) is None
+
+
+def test_open_circuit_still_stops_the_landing_fetch(monkeypatch):
+    def get_with_retry(url):
+        raise CircuitOpenError("circuit open")
+
+    monkeypatch.setattr(crud, "get_with_retry", get_with_retry)
+    with pytest.raises(CircuitOpenError):
+        crud._player_stats_from_landing("https://api.example.com", 8478402, 20202021, None)
@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from database import bulk_load
+from database.bulk_load import BATCH, PIPELINE, check_write_mode
+from database.db_utils import PSYCOPG2, PSYCOPG3
+
+
+@pytest.mark.parametrize("mode, backend, ok", [
+    (PIPELINE, PSYCOPG3, True),
+    (PIPELINE, PSYCOPG2, False),
+    (BATCH, PSYCOPG2, True),
+])
+def test_check_write_mode(monkeypatch, mode, backend, ok):
+    monkeypatch.setattr(bulk_load, "_write_mode", mode)
+    monkeypatch.setattr(bulk_load, "get_db_backend", lambda: backend)
+    if ok:
+        check_write_mode()
+    else:
+        with pytest.raises(ValueError):
+            check_write_mode()
+
+
+@pytest.mark.parametrize("value, text", [
+    (None, r"\N"),
+    (True, "t"),
+    (False, "f"),
+    (0, "0"),
+    (date(2024, 4, 18), "2024-04-18"),
+    (datetime(2024, 4, 18, 19, 30), "2024-04-18T19:30:00"),
+    (timedelta(minutes=18, seconds=5), "0:18:05"),
+    ("O'Reilly", "O'Reilly"),
+    ("a\tb\nc\rd\\e", r"a\tb\nc\rd\\e"),
+    (r"\N", r"\\N"),  # a literal backslash-N must not read back as NULL
+])
+def test_copy_value_escapes_for_copy_text_format(value, text):
+    assert bulk_load._copy_value(value) == text
+
+
+class RecordingCursor:
+    """Stands in for a psycopg2 cursor; records SQL and the COPY payload."""
+
+    def __init__(self, results=()):
+        self.statements = []
+        self.copied = None
+        self.results = list(results)
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    def copy_expert(self, sql, buf):
+        self.statements.append(sql)
+        self.copied = buf.read()
+
+    def fetchall(self):
+        return self.results
+
+
+def test_copy_upsert_stages_rows_in_order_and_keeps_the_last_duplicate():
+    cur = RecordingCursor(results=[(True,), (False,)])
+    written = bulk_load._copy_upsert(
+        cur, "teams", ("id", "name"), [(1, "Toronto"), (2, None), (1, "Maple Leafs")],
+        conflict_columns=("id",), update_columns=("name",),
+    )
+    assert written == [True, False]
+    assert cur.copied == "1\tToronto\t0\n2\t\\N\t1\n1\tMaple Leafs\t2\n"
+    upsert = next(sql for sql in cur.statements if sql.startswith("INSERT INTO teams"))
+    assert "SELECT DISTINCT ON (id) id, name FROM _staging_teams ORDER BY id, _staging_ord DESC" in upsert
+    assert cur.statements[-1] == "DROP TABLE _staging_teams"
+
+
+ROWS = [(1, "a"), (2, "b"), (1, "c")]
+
+
+def test_dedupe_keeps_the_last_row_per_key_for_do_update():
+    assert bulk_load._dedupe(("id", "name"), ROWS, ("id",), ("name",)) == [(1, "c"), (2, "b")]
+
+
+def test_dedupe_keeps_the_first_row_per_key_for_do_nothing():
+    assert bulk_load._dedupe(("id", "name"), ROWS, ("id",), ()) == [(1, "a"), (2, "b")]
+
+
+def test_dedupe_uses_every_conflict_column():
+    rows = [(1, 2024, "a"), (1, 2025, "b"), (1, 2024, "c")]
+    assert bulk_load._dedupe(("team_id", "season_id", "x"), rows, ("team_id", "season_id"), ("x",)) == [
+        (1, 2024, "c"), (1, 2025, "b"),
+    ]
+
+
+def test_batch_upsert_sends_deduplicated_rows_in_pages(monkeypatch):
+    calls = []
+
+    def insert_values(cur, sql, rows, page_size=None):
+        calls.append((" ".join(sql.split()), rows, page_size))
+        return [(True,) for _ in rows]
+
+    monkeypatch.setattr(bulk_load, "insert_values", insert_values)
+    written = bulk_load._batch_upsert(None, "teams", ("id", "name"), ROWS, ("id",), ("name",), page_size=50)
+    assert written == [True, True]
+    [(sql, rows, page_size)] = calls
+    assert sql.startswith("INSERT INTO teams (id, name) VALUES %s ON CONFLICT (id) DO UPDATE")
+    assert rows == [(1, "c"), (2, "b")]
+    assert page_size == 50
+
+
+def test_page_size_must_be_positive():
+    with pytest.raises(ValueError):
+        bulk_load.set_page_size(0)
+
+
+def test_conflict_clause_skips_unchanged_rows():
+    clause = " ".join(bulk_load._conflict_clause("teams", ("id",), ("name", "city")).split())
+    assert clause == (
+        "ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, city = EXCLUDED.city "
+        "WHERE ROW(teams.name, teams.city) IS DISTINCT FROM ROW(EXCLUDED.name, EXCLUDED.city) "
+        "RETURNING (xmax = 0)"
+    )
+
+
+def test_conflict_clause_without_update_columns_does_nothing():
+    assert bulk_load._conflict_clause("teams", ("id", "season_id"), ()) == (
+        "ON CONFLICT (id, season_id) DO NOTHING RETURNING (xmax = 0)"
+    )
+
+
+def test_upsert_rows_counts_inserted_updated_and_unchanged(monkeypatch):
+    # two of four rows were written: one fresh insert, one update
+    monkeypatch.setitem(bulk_load._UPSERTS, BATCH, lambda cur, *args: [True, False])
+    counts = bulk_load.upsert_rows(None, "teams", ("id",), [(1,), (2,), (3,), (4,)], ("id",), mode=BATCH)
+    assert counts == {"inserted": 1, "updated": 1, "unchanged": 2}
+
+
+def test_upsert_rows_with_no_rows_writes_nothing(monkeypatch):
+    monkeypatch.setitem(bulk_load._UPSERTS, BATCH, lambda cur, *args: pytest.fail("should not write"))
+    assert bulk_load.upsert_rows(None, "teams", ("id",), [], ("id",), mode=BATCH) == bulk_load.empty_counts()
+
+
+def test_add_and_format_counts():
+    total = bulk_load.add_counts(bulk_load.empty_counts(), {"inserted": 2, "updated": 1, "unchanged": 4})
+    assert bulk_load.format_counts(total) == "2 inserted, 1 updated, 4 unchanged"
@@ -0,0 +1,78 @@
+import pytest
+import requests
+
+from database import cassette
+from database.cassette import RECORD, RECORDED_LATENCY, REPLAY, Cassette, CassetteMiss, parse_latency
+
+URL = "https://api-web.nhle.com/v1/roster/TOR/20232024"
+
+
+def response(body, status=200):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers["Content-Type"] = "application/json"
+    resp._content = body
+    return resp
+
+
+def record(path, interactions):
+    tape = Cassette(path, RECORD)
+    for url, item in interactions:
+        if isinstance(item, Exception):
+            tape.record_error(url, item, 0.25)
+        else:
+            tape.record(url, item, 0.25)
+    tape.close()
+
+
+def test_round_trip_in_recorded_order(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [
+        (URL, response(b'{"v": 1}')),
+        (URL, response(b'{"v": 2}', status=503)),
+    ])
+    tape = Cassette(path, REPLAY)
+    first, second, again = tape.replay(URL), tape.replay(URL), tape.replay(URL)
+    assert (first.status_code, first.content) == (200, b'{"v": 1}')
+    assert (second.status_code, second.content) == (503, b'{"v": 2}')
+    assert again.content == b'{"v": 2}'  # the last recording repeats
+    assert first.headers["content-type"] == "application/json"
+
+
+def test_binary_bodies_survive_the_round_trip(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [(URL, response(b"\xff\x00\xfe"))])
+    assert Cassette(path, REPLAY).replay(URL).content == b"\xff\x00\xfe"
+
+
+def test_recorded_errors_are_raised_again(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [(URL, requests.ConnectionError("reset by peer"))])
+    with pytest.raises(requests.ConnectionError, match="reset by peer"):
+        Cassette(path, REPLAY).replay(URL)
+
+
+def test_unrecorded_url_is_a_miss(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [])
+    with pytest.raises(CassetteMiss):
+        Cassette(path, REPLAY).replay(URL)
+
+
+def test_replay_sleeps_the_recorded_latency(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [(URL, response(b"{}"))])
+    slept = []
+    monkeypatch.setattr(cassette.time, "sleep", slept.append)
+    Cassette(path, REPLAY, latency=RECORDED_LATENCY).replay(URL)
+    assert slept == [0.25]
+
+
+@pytest.mark.parametrize("value, latency", [
+    (None, None),
+    ("", None),
+    ("250", 0.25),
+    ("recorded", RECORDED_LATENCY),
+])
+def test_parse_latency(value, latency):
+    assert parse_latency(value) == latency
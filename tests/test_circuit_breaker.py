@@ -0,0 +1,81 @@
+import pytest
+
+from database import circuit_breaker
+from database.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+HOST = "api.example.com"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "time", lambda: now[0])
+    return now
+
+
+def state(breaker):
+    return breaker._hosts[HOST]
+
+
+def test_trips_once_the_failure_budget_is_spent(clock):
+    breaker = CircuitBreaker(failure_budget=3, window=60, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure(HOST)
+    breaker.before_request(HOST)
+    breaker.record_failure(HOST)
+    assert state(breaker).state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(HOST)
+
+
+def test_failures_outside_the_window_do_not_count(clock):
+    breaker = CircuitBreaker(failure_budget=2, window=60, reset_timeout=30)
+    breaker.record_failure(HOST)
+    clock[0] += 61
+    breaker.record_failure(HOST)
+    assert not breaker.is_open(HOST)
+
+
+def test_success_clears_failures(clock):
+    breaker = CircuitBreaker(failure_budget=2, window=60, reset_timeout=30)
+    breaker.record_failure(HOST)
+    breaker.record_success(HOST)
+    breaker.record_failure(HOST)
+    assert not breaker.is_open(HOST)
+
+
+def test_lets_one_probe_through_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_budget=1, window=60, reset_timeout=30)
+    breaker.record_failure(HOST)
+    clock[0] += 30
+    breaker.before_request(HOST)
+    assert state(breaker).state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(HOST)
+
+
+def test_successful_probe_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_budget=1, window=60, reset_timeout=30)
+    breaker.record_failure(HOST)
+    clock[0] += 30
+    breaker.before_request(HOST)
+    breaker.record_success(HOST)
+    assert state(breaker).state == CLOSED
+    breaker.before_request(HOST)
+
+
+def test_failed_probe_reopens_for_twice_as_long(clock):
+    breaker = CircuitBreaker(failure_budget=1, window=60, reset_timeout=30, max_reset_timeout=45)
+    breaker.record_failure(HOST)
+    clock[0] += 30
+    breaker.before_request(HOST)
+    breaker.record_failure(HOST)
+    assert state(breaker).state == OPEN
+    assert state(breaker).open_until == clock[0] + 45  # doubled, capped at max_reset_timeout
+    clock[0] += 44
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(HOST)
+
+
+def test_zero_budget_disables_the_breaker():
+    assert circuit_breaker.configure_circuit_breaker(failure_budget=0) is None
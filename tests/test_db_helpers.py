@@ -0,0 +1,58 @@
+import pytest
+
+from database.db_helpers import TeamSeasonIndex, _normalize_team_name
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+TEAM_SEASONS = [
+    (101, 20232024, "Montréal Canadiens"),
+    (102, 20232024, "St. Louis Blues"),
+    (103, 20052006, "Mighty Ducks of Anaheim"),
+    (104, 20232024, "Anaheim Ducks"),
+]
+
+
+@pytest.mark.parametrize("name, normalized", [
+    ("Montréal Canadiens", "montreal canadiens"),
+    ("St. Louis Blues", "st louis blues"),
+    ("  TAMPA   Bay Lightning ", "tampa bay lightning"),
+])
+def test_normalize_team_name(name, normalized):
+    assert _normalize_team_name(name) == normalized
+
+
+def test_resolves_names_after_normalization():
+    index = TeamSeasonIndex(FakeCursor(TEAM_SEASONS))
+    assert index.resolve("Montreal Canadiens", 20232024) == 101
+    assert index.resolve("St Louis Blues", 20232024) == 102
+    assert index.alias_hits == 0
+
+
+def test_resolves_through_aliases_for_the_same_season():
+    index = TeamSeasonIndex(FakeCursor(TEAM_SEASONS))
+    assert index.resolve("Anaheim Ducks", 20052006) == 103
+    assert index.resolve("Mighty Ducks of Anaheim", 20232024) == 104
+    assert index.alias_hits == 2
+
+
+def test_unknown_names_are_counted_as_misses():
+    index = TeamSeasonIndex(FakeCursor(TEAM_SEASONS))
+    assert index.resolve("Hartford Whalers", 20232024) is None
+    assert index.resolve("Hartford Whalers", 20232024) is None
+    assert index.resolve("Montreal Canadiens", 19961997) is None
+    assert index.misses == {("Hartford Whalers", 20232024): 2, ("Montreal Canadiens", 19961997): 1}
+
+
+def test_first_team_season_wins_for_duplicate_names():
+    index = TeamSeasonIndex(FakeCursor([(7, 20232024, "Utah Hockey Club"), (8, 20232024, "Utah Hockey Club")]))
+    assert index.resolve("Utah Mammoth", 20232024) == 7
@@ -0,0 +1,108 @@
+from datetime import date
+
+import pytest
+import requests
+
+from database import http_utils
+from database.http_utils import CURRENT_SEASON_TTL, REFERENCE_DATA_TTL, ResponseCache, cache_ttl_for_url
+
+
+class FakePool:
+    def __init__(self, num_connections):
+        self.num_connections = num_connections
+
+
+class FakeAdapter:
+    def __init__(self, *connections):
+        self.poolmanager = type("PoolManager", (), {})()
+        self.poolmanager.pools = {index: FakePool(n) for index, n in enumerate(connections)}
+
+
+class FakeSession:
+    def __init__(self, adapters):
+        self.adapters = adapters
+
+
+def test_connection_stats_counts_a_shared_adapter_once(monkeypatch):
+    adapter = FakeAdapter(1)
+    monkeypatch.setattr(http_utils, "_http_client", FakeSession({"https://": adapter, "http://": adapter}))
+    monkeypatch.setattr(http_utils, "_client_requests", 5)
+    assert http_utils.connection_stats() == {"requests": 5, "connections": 1, "handshakes_saved": 4}
+
+
+def test_connection_stats_sums_distinct_adapters(monkeypatch):
+    adapters = {"https://": FakeAdapter(2, 1), "http://": FakeAdapter(1)}
+    monkeypatch.setattr(http_utils, "_http_client", FakeSession(adapters))
+    monkeypatch.setattr(http_utils, "_client_requests", 3)
+    assert http_utils.connection_stats() == {"requests": 3, "connections": 4, "handshakes_saved": 0}
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2025, 1, 15)
+
+
+@pytest.fixture
+def today(monkeypatch):
+    monkeypatch.setattr(http_utils, "date", FixedDate)
+
+
+@pytest.mark.parametrize("url, ttl", [
+    ("https://api-web.nhle.com/v1/roster/TOR/20222023", None),  # closed season never changes
+    ("https://api-web.nhle.com/v1/roster/TOR/20242025", CURRENT_SEASON_TTL),
+    ("https://api-web.nhle.com/v1/standings/2024-04-18", None),  # a past date is a snapshot
+    ("https://api-web.nhle.com/v1/standings/2025-01-15", CURRENT_SEASON_TTL),
+    ("https://api.nhle.com/stats/rest/en/season", REFERENCE_DATA_TTL),
+    ("https://api.nhle.com/stats/rest/en/team", REFERENCE_DATA_TTL),
+    ("https://api-web.nhle.com/v1/player/8478402/landing", CURRENT_SEASON_TTL),
+])
+def test_cache_ttl_for_url(today, url, ttl):
+    assert cache_ttl_for_url(url) == ttl
+
+
+def response(body, etag=None):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers["Content-Type"] = "application/json"
+    if etag:
+        resp.headers["ETag"] = etag
+    resp._content = body
+    return resp
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_utils.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_round_trips_a_response_with_its_validators(tmp_path, clock, today):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    url = "https://api-web.nhle.com/v1/roster/TOR/20242025"
+    cache.store(url, response(b"{}", etag='"abc"'))
+    entry = cache.lookup(url)
+    assert entry["body"] == b"{}"
+    assert cache.is_fresh(entry)
+    assert http_utils._conditional_headers(entry) == {"If-None-Match": '"abc"'}
+    cached = http_utils._cached_response(entry)
+    assert cached.from_cache and cached.content == b"{}"
+
+    clock[0] += CURRENT_SEASON_TTL + 1
+    assert not cache.is_fresh(cache.lookup(url))
+    cache.refresh(url)  # a 304 extends it
+    assert cache.is_fresh(cache.lookup(url))
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path, clock, today):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=20)
+    for name in ("a", "b"):
+        cache.store(f"https://example.com/{name}", response(b"x" * 10))
+        clock[0] += 1
+    cache.lookup("https://example.com/a")  # a is now more recent than b
+    clock[0] += 1
+    cache.store("https://example.com/c", response(b"x" * 10))
+    assert cache.lookup("https://example.com/b") is None
+    assert cache.lookup("https://example.com/a") is not None
+    assert cache.lookup("https://example.com/c") is not None
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from database.json_projection import decode_fields
+
+LANDING = json.dumps({
+    "playerId": 8478402,
+    "position": "C",
+    "featuredStats": {"regularSeason": {"subSeason": {"goals": 32}}, "season": 20232024},
+    "seasonTotals": [{"season": 20232024, "goals": 32}],
+    "last5Games": [{"gameId": 1}],
+})
+
+
+def test_keeps_only_the_requested_keys():
+    assert decode_fields(LANDING, ["position", "seasonTotals"]) == {
+        "position": "C",
+        "seasonTotals": [{"season": 20232024, "goals": 32}],
+    }
+
+
+def test_dotted_paths_keep_their_nesting():
+    assert decode_fields(LANDING, ["featuredStats.season"]) == {"featuredStats": {"season": 20232024}}
+
+
+def test_missing_keys_are_left_out():
+    assert decode_fields(LANDING, ["position", "draftDetails"]) == {"position": "C"}
+
+
+def test_accepts_bytes_and_escaped_keys():
+    assert decode_fields(b'{"a\\u0062": 1, "c": 2}', ["ab"]) == {"ab": 1}
+
+
+def test_stops_before_a_malformed_tail():
+    assert decode_fields('{"position": "C", "rest": [1, 2,', ["position"]) == {"position": "C"}
+
+
+def test_rejects_malformed_documents():
+    with pytest.raises(json.JSONDecodeError):
+        decode_fields('{"position" "C"}', ["position"])
@@ -0,0 +1,68 @@
+import pytest
+
+from database import metrics
+from database.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+REQUESTS = Counter("test_requests_total", "Requests sent.")
+DURATION = Gauge("test_duration_seconds", "Wall time.")
+LATENCY = Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+
+def test_render_counters_and_gauges_with_labels():
+    REQUESTS.inc(host="api", status="200")
+    REQUESTS.inc(2, host="api", status="200")
+    DURATION.set(1.5, stage='say "hi"\n')
+    text = metrics.render()
+    assert "# TYPE test_requests_total counter\n" in text
+    assert 'test_requests_total{host="api",status="200"} 3\n' in text
+    assert 'test_duration_seconds{stage="say \\"hi\\"\\n"} 1.5\n' in text
+
+
+def test_render_histogram_buckets_are_cumulative():
+    for value in (0.05, 0.5, 5.0):
+        LATENCY.observe(value, host="api")
+    lines = [line for line in metrics.render().splitlines() if line.startswith("test_latency_seconds")]
+    assert lines == [
+        'test_latency_seconds_bucket{host="api",le="0.1"} 1',
+        'test_latency_seconds_bucket{host="api",le="1"} 2',
+        'test_latency_seconds_bucket{host="api",le="+Inf"} 3',
+        'test_latency_seconds_sum{host="api"} 5.55',
+        'test_latency_seconds_count{host="api"} 3',
+    ]
+
+
+def test_unused_metrics_are_left_out():
+    assert "test_requests_total" not in metrics.render()
+
+
+def test_merge_adds_counters_and_histograms_and_replaces_gauges():
+    REQUESTS.inc(host="api")
+    DURATION.set(1.0)
+    LATENCY.observe(0.05)
+    worker = metrics.snapshot()  # what a worker process would hand back
+
+    metrics.merge(worker)
+    assert REQUESTS.values == {(("host", "api"),): 2}
+    assert DURATION.values == {(): 1.0}
+    assert LATENCY.values[()] == ([2, 2], 0.1, 2)
+
+
+def test_merge_ignores_unknown_metrics():
+    metrics.merge({"test_not_registered": {(): 1}})
+    assert metrics.snapshot() == {}
+
+
+def test_write_textfile_replaces_the_file(tmp_path):
+    REQUESTS.inc(host="api")
+    path = tmp_path / "nhl.prom"
+    assert metrics.write_textfile(str(path)) == str(path)
+    assert 'test_requests_total{host="api"} 1' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ["nhl.prom"]
@@ -0,0 +1,159 @@
+import pytest
+
+from database import player_stats_runner
+from database.circuit_breaker import CircuitOpenError
+from database.player_stats_runner import ingest_player_stats, shard_ranges
+from database.watermarks import ALL_SEASONS
+
+
+def test_shard_ranges_split_evenly():
+    assert shard_ranges([1, 2, 3, 4, 5, 6], 3) == [(1, 2), (3, 4), (5, 6)]
+
+
+def test_shard_ranges_last_shard_takes_the_remainder():
+    assert shard_ranges([10, 20, 30, 40, 50], 2) == [(10, 30), (40, 50)]
+
+
+def test_shard_ranges_never_more_shards_than_players():
+    assert shard_ranges([7, 8], 5) == [(7, 7), (8, 8)]
+
+
+def test_shard_ranges_empty_and_single():
+    assert shard_ranges([], 4) == []
+    assert shard_ranges([1, 2, 3], 0) == [(1, 3)]
+
+
+class FakeWatermarks:
+    def __init__(self, log):
+        self.log = log
+
+    def mark(self, season_id, entity):
+        self.log.append(("mark", season_id, entity))
+
+    def save(self, conn):
+        self.log.append(("save",))
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    log = []
+    monkeypatch.setattr(player_stats_runner, "stage_watermarks", lambda conn, stage: FakeWatermarks(log))
+    monkeypatch.setattr(player_stats_runner, "load_checkpoint", lambda conn, name: None)
+    monkeypatch.setattr(player_stats_runner, "save_checkpoint",
+                        lambda conn, name, player: log.append(("checkpoint", player)))
+    monkeypatch.setattr(player_stats_runner, "clear_checkpoint", lambda conn, name: log.append(("clear",)))
+    monkeypatch.setattr(player_stats_runner, "get_checkpoint_every", lambda: 100)
+
+    def insert(conn, rows):
+        log.append(("insert", [row["player_id"] for row in rows]))
+        return {"inserted": len(rows), "updated": 0, "unchanged": 0}
+
+    monkeypatch.setattr(player_stats_runner, "insert_player_stats_into_db", insert)
+
+    def run(results):
+        def iter_stats(conn, base_url, **kwargs):
+            for item in results:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+
+        monkeypatch.setattr(player_stats_runner, "iter_player_stats_from_api", iter_stats)
+        return ingest_player_stats(None, "http://api"), log
+
+    return run
+
+
+def test_players_are_watermarked_after_their_stats_are_inserted(ingest):
+    (finished, players, counts), log = ingest([
+        (1, [{"player_id": 1}]),
+        (2, None),  # request failed: retried next run
+        (3, []),  # fetched, nothing qualified
+    ])
+    assert finished and players == 3 and counts["inserted"] == 1
+    assert log == [
+        ("insert", [1]),
+        ("mark", ALL_SEASONS, 1),
+        ("mark", ALL_SEASONS, 3),
+        ("save",),
+        ("clear",),
+    ]
+
+
+def test_open_circuit_checkpoints_what_was_written(ingest):
+    (finished, players, _), log = ingest([
+        (1, [{"player_id": 1}]),
+        CircuitOpenError("circuit open"),
+    ])
+    assert not finished and players == 1
+    assert log == [
+        ("insert", [1]),
+        ("mark", ALL_SEASONS, 1),
+        ("save",),
+        ("checkpoint", 1),
+    ]
+
+
+class FakeCursor:
+    def __init__(self, player_ids):
+        self.player_ids = player_ids
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return [(player,) for player in self.player_ids]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, player_ids=()):
+        self.player_ids = player_ids
+
+    def cursor(self):
+        return FakeCursor(self.player_ids)
+
+    def commit(self):
+        pass
+
+
+def test_new_shards_checkpoint_their_ranges_before_starting(monkeypatch):
+    saved, cleared = [], []
+    monkeypatch.setattr(player_stats_runner, "clear_checkpoints", lambda conn, prefix: cleared.append(prefix))
+    monkeypatch.setattr(player_stats_runner, "save_checkpoint",
+                        lambda conn, name, position, span=None: saved.append((name, position, span)))
+    plan = player_stats_runner._new_shards(FakeConnection([1, 2, 3, 4, 5]), 2)
+    assert plan == [(0, 2, 1, 3), (1, 2, 4, 5)]
+    assert cleared == ["player_stats.shard"]
+    assert saved == [
+        ("player_stats.shard1of2", 0, (1, 3)),
+        ("player_stats.shard2of2", 3, (4, 5)),
+    ]
+
+
+def test_resume_reuses_the_recorded_ranges_of_unfinished_shards(monkeypatch):
+    # shard 2 of 3 finished and cleared its checkpoint
+    monkeypatch.setattr(player_stats_runner, "load_span_checkpoints", lambda conn, prefix: {
+        "player_stats.shard3of3": (250, 201, 300),
+        "player_stats.shard1of3": (40, 1, 100),
+    })
+    assert player_stats_runner._resumed_shards(FakeConnection()) == [(0, 3, 1, 100), (2, 3, 201, 300)]
+
+
+def test_resume_without_shard_checkpoints_starts_over(monkeypatch):
+    monkeypatch.setattr(player_stats_runner, "load_span_checkpoints", lambda conn, prefix: {})
+    assert player_stats_runner._resumed_shards(FakeConnection()) is None
+
+
+@pytest.mark.parametrize("checkpoints", [
+    {"player_stats.shard1of2": (40, None, None)},  # written before ranges were recorded
+    {"player_stats.shard1of2": (40, 1, 100), "player_stats.shard3of4": (250, 201, 300)},
+])
+def test_resume_refuses_checkpoints_it_cannot_trust(monkeypatch, checkpoints):
+    monkeypatch.setattr(player_stats_runner, "load_span_checkpoints", lambda conn, prefix: checkpoints)
+    with pytest.raises(RuntimeError):
+        player_stats_runner._resumed_shards(FakeConnection())
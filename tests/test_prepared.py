@@ -0,0 +1,76 @@
+import pytest
+
+from database import prepared
+from database.prepared import _positional, execute_prepared, register_statement
+
+
+@pytest.mark.parametrize("sql, positional, count", [
+    ("SELECT 1", "SELECT 1", 0),
+    ("SELECT id FROM teams WHERE abbreviation = %s", "SELECT id FROM teams WHERE abbreviation = $1", 1),
+    ("INSERT INTO t (a, b, c) VALUES (%s, %s, %s)", "INSERT INTO t (a, b, c) VALUES ($1, $2, $3)", 3),
+])
+def test_positional(sql, positional, count):
+    assert _positional(sql) == (positional, count)
+
+
+def test_register_statement_rejects_conflicting_sql():
+    register_statement("test_register_twice", "SELECT 1")
+    assert register_statement("test_register_twice", "SELECT 1") == "test_register_twice"
+    with pytest.raises(ValueError):
+        register_statement("test_register_twice", "SELECT 2")
+
+
+class FakeConnection:
+    def __init__(self, backend_pid):
+        self.info = type("Info", (), {"backend_pid": backend_pid})()
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return [("Planning Time: 0.123 ms",)]
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(prepared, "_enabled", True)
+    monkeypatch.setattr(prepared, "_prepared_on", {})
+    return register_statement("test_select_team", "SELECT id FROM teams WHERE abbreviation = %s")
+
+
+def executed(cur):
+    return [sql for sql, _ in cur.statements if not sql.startswith("EXPLAIN")]
+
+
+def test_prepares_once_per_connection_then_executes(fresh_registry):
+    cur = FakeCursor(FakeConnection(backend_pid=1))
+    execute_prepared(cur, fresh_registry, ("TOR",))
+    execute_prepared(cur, fresh_registry, ("MTL",))
+    assert executed(cur) == [
+        "PREPARE test_select_team AS SELECT id FROM teams WHERE abbreviation = $1",
+        "EXECUTE test_select_team (%s)",
+        "EXECUTE test_select_team (%s)",
+    ]
+    assert cur.statements[-1][1] == ("MTL",)
+
+
+def test_a_reconnected_backend_is_prepared_again(fresh_registry):
+    conn = FakeConnection(backend_pid=1)
+    execute_prepared(FakeCursor(conn), fresh_registry, ("TOR",))
+    conn.info.backend_pid = 2
+    cur = FakeCursor(conn)
+    execute_prepared(cur, fresh_registry, ("TOR",))
+    assert executed(cur)[0].startswith("PREPARE test_select_team")
+
+
+def test_disabled_registry_runs_the_plain_sql(fresh_registry, monkeypatch):
+    monkeypatch.setattr(prepared, "_enabled", False)
+    cur = FakeCursor(FakeConnection(backend_pid=1))
+    execute_prepared(cur, fresh_registry, ("TOR",))
+    assert cur.statements == [("SELECT id FROM teams WHERE abbreviation = %s", ("TOR",))]
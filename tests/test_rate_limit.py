@@ -0,0 +1,45 @@
+import pytest
+
+from database import rate_limit
+from database.rate_limit import MIN_RATE_FRACTION, RateLimiter
+
+HOST = "api.example.com"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+def test_burst_then_refill_at_the_configured_rate(tmp_path, clock):
+    limiter = RateLimiter(str(tmp_path / "buckets.db"), rate=2, burst=3)
+    assert [limiter._try_acquire(HOST) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter._try_acquire(HOST) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert limiter._try_acquire(HOST) == 0.0
+
+
+def test_buckets_are_shared_through_the_file(tmp_path, clock):
+    path = str(tmp_path / "buckets.db")
+    first, second = RateLimiter(path, rate=1, burst=1), RateLimiter(path, rate=1, burst=1)
+    assert first._try_acquire(HOST) == 0.0
+    assert second._try_acquire(HOST) == pytest.approx(1.0)
+
+
+def test_penalize_pauses_and_halves_the_rate(tmp_path, clock):
+    limiter = RateLimiter(str(tmp_path / "buckets.db"), rate=4, burst=4)
+    limiter.penalize(HOST, retry_after=10)
+    assert limiter._try_acquire(HOST) == pytest.approx(10)
+    clock[0] += 10
+    # refill restarts from empty at half the rate
+    assert limiter._try_acquire(HOST) == pytest.approx(0.5)
+
+
+def test_rate_never_drops_below_the_floor(tmp_path, clock):
+    limiter = RateLimiter(str(tmp_path / "buckets.db"), rate=10, burst=1)
+    for _ in range(10):
+        limiter.penalize(HOST, retry_after=0)
+    _, rate, _, _ = limiter._load(limiter._connect(), HOST, clock[0])
+    assert rate == pytest.approx(10 * MIN_RATE_FRACTION)
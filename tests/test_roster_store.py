@@ -0,0 +1,63 @@
+import pytest
+import requests
+
+from database import roster_store
+from database.circuit_breaker import CircuitOpenError
+from database.roster_store import RosterStore
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def store(monkeypatch):
+    calls = []
+    responses = {
+        "TOR": FakeResponse(200, {"forwards": []}),
+        "ARI": FakeResponse(404),
+        "MTL": FakeResponse(503),
+    }
+
+    def get_with_retry(url, timeout=None):
+        abbreviation = url.split("/")[-2]
+        calls.append(abbreviation)
+        if abbreviation == "BOS":
+            raise requests.exceptions.ConnectionError("reset")
+        if abbreviation == "EDM":
+            raise CircuitOpenError("circuit open")
+        return responses[abbreviation]
+
+    monkeypatch.setattr(roster_store, "get_with_retry", get_with_retry)
+    return RosterStore("http://api"), calls
+
+
+def test_each_roster_is_requested_once(store):
+    rosters, calls = store
+    assert rosters.get("TOR", 20232024) == {"forwards": []}
+    assert rosters.get("TOR", 20232024) == {"forwards": []}
+    assert calls == ["TOR"]
+    assert (rosters.requests, rosters.hits) == (1, 1)
+
+
+def test_404_is_missing_but_transient_failures_are_not(store):
+    rosters, _ = store
+    for abbreviation in ("ARI", "MTL", "BOS"):
+        assert rosters.get(abbreviation, 20232024) is None
+    assert rosters.is_missing("ARI", 20232024)
+    assert not rosters.is_missing("MTL", 20232024)
+    assert not rosters.is_missing("BOS", 20232024)
+    assert not rosters.is_missing("TOR", 20232024)
+
+
+def test_open_circuit_is_not_remembered(store):
+    rosters, calls = store
+    for _ in range(2):
+        with pytest.raises(CircuitOpenError):
+            rosters.get("EDM", 20232024)
+    assert calls == ["EDM", "EDM"]
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from database.scheduler import FAILED, OK, SKIPPED, run_stages, select_stages
+
+DEPENDENCIES = {
+    'seasons': (),
+    'teams': (),
+    'team_seasons': ('seasons', 'teams'),
+    'players': ('team_seasons',),
+    'standings': ('team_seasons',),
+}
+
+
+def test_select_stages_target_alone():
+    assert select_stages(DEPENDENCIES, ['players']) == ['players']
+
+
+def test_select_stages_with_deps_in_dependency_order():
+    assert select_stages(DEPENDENCIES, ['players'], with_deps=True) == [
+        'seasons', 'teams', 'team_seasons', 'players',
+    ]
+
+
+def test_select_stages_unknown_target():
+    with pytest.raises(KeyError):
+        select_stages(DEPENDENCIES, ['nope'])
+
+
+def test_run_stages_skips_dependents_of_failed_stage():
+    ran = []
+
+    def run_stage(name):
+        ran.append(name)
+        return name != 'teams'
+
+    status = run_stages(DEPENDENCIES, list(DEPENDENCIES), run_stage, max_workers=2)
+    assert status == {
+        'seasons': OK,
+        'teams': FAILED,
+        'team_seasons': SKIPPED,
+        'players': SKIPPED,
+        'standings': SKIPPED,
+    }
+    assert sorted(ran) == ['seasons', 'teams']
+
+
+def test_run_stages_treats_exceptions_as_failures():
+    def run_stage(name):
+        if name == 'seasons':
+            raise RuntimeError("boom")
+        return True
+
+    status = run_stages(DEPENDENCIES, ['seasons', 'teams'], run_stage)
+    assert status == {'seasons': FAILED, 'teams': OK}
+
+
+def test_run_stages_waits_only_for_selected_dependencies():
+    status = run_stages(DEPENDENCIES, ['players', 'standings'], lambda name: True)
+    assert status == {'players': OK, 'standings': OK}
+
+
+def test_run_stages_bounds_concurrency():
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def run_stage(name):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return True
+
+    independent = {name: () for name in 'abcdef'}
+    status = run_stages(independent, list(independent), run_stage, max_workers=2)
+    assert set(status.values()) == {OK}
+    assert peak == 2
+
+
+@pytest.mark.parametrize("workers", [0, -3])
+def test_run_stages_clamps_non_positive_workers(workers):
+    status = run_stages(DEPENDENCIES, ['seasons', 'teams'], lambda name: True, max_workers=workers)
+    assert status == {'seasons': OK, 'teams': OK}
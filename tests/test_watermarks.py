@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database import watermarks
+from database.watermarks import StageWatermarks
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def execute(self, sql, params=None):
+        if "MAX(id) FROM seasons" in sql:
+            self.result = [(self.conn.current_season,)]
+        else:
+            self.result = list(self.conn.watermarks)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, current_season, watermarks=()):
+        self.current_season = current_season
+        self.watermarks = watermarks
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def upserts(monkeypatch):
+    calls = []
+    monkeypatch.setattr(watermarks, "upsert_rows", lambda cur, table, columns, rows, **kwargs: calls.append(rows))
+    return calls
+
+
+def test_needs_missing_stale_and_current_season():
+    now = datetime.now(timezone.utc)
+    conn = FakeConnection(20242025, [
+        (20222023, "TOR", now - timedelta(days=1)),
+        (20212022, "TOR", now - timedelta(days=30)),
+        (20242025, "TOR", now),
+    ])
+    marks = StageWatermarks(conn, "players", timedelta(days=7))
+    assert not marks.needs(20222023, "TOR")
+    assert marks.needs(20212022, "TOR")  # stale
+    assert marks.needs(20232024, "TOR")  # never ingested
+    assert marks.needs(20242025, "TOR")  # current season is always refetched
+    assert marks.skipped == 1
+
+
+def test_entities_are_compared_as_strings():
+    conn = FakeConnection(20242025, [(0, "8478402", datetime.now(timezone.utc))])
+    marks = StageWatermarks(conn, "player_stats", timedelta(days=7))
+    assert not marks.needs(0, 8478402)
+
+
+def test_save_writes_marked_entities_once(upserts):
+    conn = FakeConnection(20242025)
+    marks = StageWatermarks(conn, "players", timedelta(days=7))
+    marks.mark(20222023, "TOR")
+    marks.mark(20222023, "TOR")
+    marks.mark(20222023, "MTL")
+    marks.save(conn)
+    assert [[row[:3] for row in rows] for rows in upserts] == [
+        [("players", 20222023, "MTL"), ("players", 20222023, "TOR")],
+    ]
+    assert conn.commits == 1
+    assert marks.saved == 2
+
+    marks.save(conn)  # nothing new marked
+    assert len(upserts) == 1
+    assert conn.commits == 1
+
+
+def test_stage_watermarks_is_none_when_incremental_is_off(monkeypatch):
+    monkeypatch.setattr(watermarks, "_stale_after", None)
+    monkeypatch.setattr(watermarks, "_incremental_configured", True)
+    assert watermarks.stage_watermarks(FakeConnection(20242025), "players") is None